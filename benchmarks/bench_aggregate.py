@@ -0,0 +1,89 @@
+"""
+Benchmark aggregate.aggregate_data() against materializing the raw series
+(all blocks concatenated) and resampling it, for monthly statistics
+of 10 years of 6-minute water_level data served by a local stand-in for the
+NOAA CO-OPS API (py_noaa.testing.StandInServer).
+
+Reports the wall time, the number of blocks requested and the peak memory
+traced by tracemalloc (in a separate run, which also warms the cache of the
+server) of each method, and of aggregate_data() with the mean only and
+interval='auto', which requests hourly_height instead of 6-minute
+water_level.
+
+Run from the repository root with: python -m benchmarks.bench_aggregate
+"""
+from __future__ import print_function
+
+import multiprocessing
+import time
+import tracemalloc
+
+import pandas as pd
+
+from py_noaa import aggregate, coops
+from py_noaa.testing import StandInServer
+
+BEGIN_DATE, END_DATE = '20060101', '20151231'
+
+
+def serve(urls, stop):
+    with StandInServer(cache=True) as server:
+        urls.put(server.api_url)
+        stop.wait()
+
+
+def resample():
+    data_urls, num_request_blocks = coops.build_block_urls(
+        BEGIN_DATE, END_DATE, '9447130', 'water_level', 'MLLW')
+    df = pd.concat(coops.fetch_blocks(data_urls, 'water_level',
+                                      num_request_blocks, max_workers=8))
+    df = coops.normalize_columns(df, 'water_level').set_index('date_time')
+    df = df['water_level'].resample('M').agg(['min', 'max', 'mean', 'count'])
+    df.attrs['metrics'] = {'blocks': num_request_blocks}
+    return df
+
+
+def aggregate_all():
+    return aggregate.aggregate_data(
+        BEGIN_DATE, END_DATE, '9447130', 'water_level', 'M',
+        columns=['water_level'], datum='MLLW', max_workers=8)
+
+
+def aggregate_mean():
+    return aggregate.aggregate_data(
+        BEGIN_DATE, END_DATE, '9447130', 'water_level', 'M', stats=('mean',),
+        columns=['water_level'], datum='MLLW', interval='auto',
+        max_workers=8)
+
+
+def main():
+    urls, stop = multiprocessing.Queue(), multiprocessing.Event()
+    process = multiprocessing.Process(target=serve, args=(urls, stop))
+    process.start()
+    coops.API_URL = urls.get()
+
+    try:
+        print('{:>22} {:>7} {:>9} {:>10}'.format(
+            'method', 'blocks', 'wall (s)', 'peak (MB)'))
+        for name, func in [('concat + resample', resample),
+                           ('aggregate_data', aggregate_all),
+                           ('aggregate_data (mean)', aggregate_mean)]:
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            df = func()
+            wall_time = time.perf_counter() - start
+
+            print('{:>22} {:>7} {:>9.2f} {:>10.1f}'.format(
+                name, df.attrs['metrics']['blocks'], wall_time,
+                peak / 1024. ** 2))
+    finally:
+        stop.set()
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
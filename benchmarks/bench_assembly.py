@@ -0,0 +1,74 @@
+"""
+Benchmark the assembly of block dataframes into a single dataframe, as done
+by coops.get_data() for long requests.
+
+Simulates 6-minute water_level data fetched in 31 day blocks (7440 rows per
+block) for 1 to 30 years, and times coops.concat_blocks() against the
+DataFrame.append() accumulation loop it replaced (when the installed pandas
+still provides DataFrame.append()).
+
+Run from the repository root with: python -m benchmarks.bench_assembly
+"""
+from __future__ import print_function
+
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops
+
+ROWS_PER_BLOCK = 31 * 24 * 10  # 31 days of 6-minute data
+
+
+def make_blocks(num_years):
+    """Build raw (unformatted) water_level block dataframes."""
+    num_blocks = int(np.ceil(num_years * 365 / 31.))
+    times = pd.date_range('1990-01-01', periods=num_blocks * ROWS_PER_BLOCK,
+                          freq='6min').strftime('%Y-%m-%d %H:%M')
+    values = np.char.mod('%.3f', np.random.randn(len(times)))
+
+    return [pd.DataFrame({'t': times[i:i + ROWS_PER_BLOCK],
+                          'v': values[i:i + ROWS_PER_BLOCK],
+                          's': '0.010', 'f': '0,0,0,0', 'q': 'v'})
+            for i in range(0, len(times), ROWS_PER_BLOCK)]
+
+
+def append_blocks(dfs):
+    """The quadratic accumulation loop previously used by get_data()."""
+    df = pd.DataFrame([])
+    for df_new in dfs:
+        df = df.append(df_new)
+    return df
+
+
+def best_time(func, dfs, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(dfs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    warnings.simplefilter('ignore', FutureWarning)
+    has_append = hasattr(pd.DataFrame, 'append')
+
+    print('{:>6} {:>8} {:>10} {:>12} {:>16} {:>12}'.format(
+        'years', 'blocks', 'rows', 'concat (s)', 'concat (us/row)',
+        'append (s)'))
+    for num_years in (1, 5, 10, 20, 30):
+        dfs = make_blocks(num_years)
+        rows = sum(len(df) for df in dfs)
+        concat_time = best_time(coops.concat_blocks, dfs)
+        append_time = (best_time(append_blocks, dfs, repeat=1)
+                       if has_append else float('nan'))
+        print('{:>6} {:>8} {:>10} {:>12.3f} {:>16.3f} {:>12.3f}'.format(
+            num_years, len(dfs), rows, concat_time, 1e6 * concat_time / rows,
+            append_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark the memory saved by get_data(..., compact=True).
+
+For each product, builds a raw frame of 1 million rows of synthetic API
+data (py_noaa.testing.synthetic_columns()), formats it with
+coops.format_data() with and without compact=True (without resampling, so
+every row is kept) and reports the deep memory usage of both frames.
+
+Run from the repository root with: python -m benchmarks.bench_compact
+"""
+from __future__ import print_function
+
+import pandas as pd
+
+from py_noaa import coops
+from py_noaa.testing import synthetic_columns
+
+NUM_ROWS = 10 ** 6
+
+PRODUCTS = [
+    ('water_level', {}),
+    ('hourly_height', {}),
+    ('high_low', {'layout': 'long'}),
+    ('predictions', {'hilo': True}),
+    ('currents', {'bin_num': 1}),
+    ('wind', {}),
+    ('air_pressure', {}),
+    ('water_temperature', {}),
+    ('salinity', {}),
+]
+
+
+def raw_frame(product, bin_num=None, hilo=False):
+    times = pd.date_range('1990-01-01', periods=NUM_ROWS, freq='6min')
+    fields, columns = synthetic_columns(product, times, bin_num, hilo)
+    return pd.DataFrame(dict(zip(fields, columns)))
+
+
+def memory(df):
+    return (df.memory_usage(deep=True).sum()) / 1024. ** 2
+
+
+def main():
+    print('{:>18} {:>12} {:>13} {:>8}'.format(
+        'product', 'default (MB)', 'compact (MB)', 'saving'))
+    for product, kwargs in PRODUCTS:
+        layout = kwargs.pop('layout', 'wide')
+        raw = raw_frame(product, **kwargs)
+
+        # water_level is resampled hourly by format_data(), format it as
+        # another product with the same columns to keep every row
+        name = 'hourly_height' if product == 'water_level' else product
+        df = coops.format_data(raw.copy(), name, layout=layout)
+        df_compact = coops.format_data(raw, name, layout=layout,
+                                       compact=True)
+
+        default_size, compact_size = memory(df), memory(df_compact)
+        print('{:>18} {:>12.1f} {:>13.1f} {:>7.0%}'.format(
+            product, default_size, compact_size,
+            1 - compact_size / default_size))
+
+
+if __name__ == '__main__':
+    main()
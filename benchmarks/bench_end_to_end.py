@@ -0,0 +1,129 @@
+"""
+End-to-end benchmark of coops.get_data() against a local stand-in for the
+NOAA CO-OPS API (py_noaa.testing.StandInServer), so it runs without network
+access and gives repeatable numbers.
+
+For a short (2 days), 1-year and 30-year water_level request, reports the
+wall time, the throughput (rows per second), the per-block latency (median
+and 95th percentile of coops.url2pandas() calls), the total time spent
+parsing responses (coops.bytes2pandas(), summed over the worker threads)
+and the peak memory traced by tracemalloc (measured in a separate run, as
+tracing slows everything down).
+
+The server runs in a separate process, so that it does not compete with the
+client for the GIL, and caches its responses: the tracemalloc run comes
+first and warms the cache, so the timed run measures the client and the
+configured latency rather than the generation of the synthetic data.
+
+Run from the repository root with: python -m benchmarks.bench_end_to_end
+Options: --latency seconds added to each response by the server (default
+0.05), --max-workers (default 10), --ranges (default short,1y,30y).
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+
+import numpy as np
+
+from py_noaa import coops
+from py_noaa.client import Client
+from py_noaa.testing import StandInServer
+
+RANGES = {
+    'short': ('20150101 00:00', '20150103 00:00'),
+    '1y': ('20150101', '20151231'),
+    '30y': ('19860101', '20151231'),
+}
+
+
+class Timed(object):
+    """
+    Replace a function of the coops module returning dataframes by a wrapper
+    timing its calls and counting the rows returned.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.times = []
+        self.rows = 0
+
+    def __enter__(self):
+        self.func = getattr(coops, self.name)
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            df = self.func(*args, **kwargs)
+            self.times.append(time.perf_counter() - start)
+            self.rows += len(df)
+            return df
+
+        setattr(coops, self.name, wrapper)
+        return self
+
+    def __exit__(self, *exc_info):
+        setattr(coops, self.name, self.func)
+
+
+def serve(latency, urls, stop):
+    with StandInServer(latency=latency, cache=True) as server:
+        urls.put(server.api_url)
+        stop.wait()
+
+
+def run(begin_date, end_date, max_workers):
+    with Client(pool_size=max_workers) as client:
+        return coops.get_data(begin_date, end_date, '9447130', 'water_level',
+                              datum='MLLW', max_workers=max_workers,
+                              client=client)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--max-workers', type=int, default=10)
+    parser.add_argument('--ranges', default='short,1y,30y')
+    args = parser.parse_args()
+
+    urls, stop = multiprocessing.Queue(), multiprocessing.Event()
+    process = multiprocessing.Process(target=serve,
+                                      args=(args.latency, urls, stop))
+    process.start()
+    coops.API_URL = urls.get()
+
+    try:
+        print('{:>6} {:>7} {:>9} {:>9} {:>10} {:>10} {:>10} {:>9} {:>10}'
+              .format('range', 'blocks', 'rows', 'wall (s)', 'rows/s',
+                      'p50 (ms)', 'p95 (ms)', 'parse (s)', 'peak (MB)'))
+        for name in args.ranges.split(','):
+            begin_date, end_date = RANGES[name]
+
+            tracemalloc.start()
+            run(begin_date, end_date, args.max_workers)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            with Timed('url2pandas') as blocks, \
+                    Timed('bytes2pandas') as parses:
+                start = time.perf_counter()
+                run(begin_date, end_date, args.max_workers)
+                wall_time = time.perf_counter() - start
+            num_blocks = len(blocks.times)
+            num_rows = blocks.rows
+
+            print('{:>6} {:>7} {:>9} {:>9.2f} {:>10.0f} {:>10.1f} {:>10.1f} '
+                  '{:>9.2f} {:>10.1f}'.format(
+                      name, num_blocks, num_rows,
+                      wall_time, num_rows / wall_time,
+                      np.percentile(blocks.times, 50) * 1000,
+                      np.percentile(blocks.times, 95) * 1000,
+                      sum(parses.times), peak / 1024. ** 2))
+    finally:
+        stop.set()
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
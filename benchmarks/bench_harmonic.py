@@ -0,0 +1,99 @@
+"""
+Benchmark local tide predictions (py_noaa.harmonic) for 6-minute, hourly
+and high/low predictions over 1 and 30 years, with the 37 NOAA
+constituents, and optionally validate them against the predictions of the
+NOAA CO-OPS API (requires network access).
+
+Without --validate, synthetic constants are used, so the benchmark runs
+offline. With --validate, the constants of the stations are fetched from the
+Metadata API, and for each station the maximum difference between local and
+API predictions (6-minute heights, high/low times and heights) is reported
+for a month of each of the given years.
+
+Run from the repository root with: python -m benchmarks.bench_harmonic
+Options: --validate 9447130,8518750 (default none), --years (default
+2015,2025), --datum (default MLLW).
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops, harmonic
+
+RANGES = {'1y': ('20150101', '20151231'), '30y': ('19900101', '20191231')}
+
+
+def synthetic_constants():
+    random = np.random.RandomState(0)
+    names = list(harmonic.CONSTITUENTS)
+    constituents = pd.DataFrame(
+        {'amplitude': random.uniform(0.001, 0.5, len(names)),
+         'phase': random.uniform(0, 360, len(names))},
+        index=pd.Index(names, name='name'))
+    return harmonic.HarmonicConstants('synthetic', constituents,
+                                      {'MSL': 2.0, 'MLLW': 0.0})
+
+
+def benchmark():
+    constants = synthetic_constants()
+    print('{:>6} {:>9} {:>9} {:>10}'.format('range', 'interval', 'rows',
+                                            'time (ms)'))
+    for name, (begin_date, end_date) in sorted(RANGES.items()):
+        for interval in (None, 'h', 'hilo'):
+            start = time.perf_counter()
+            df = constants.predictions(begin_date, end_date, 'MLLW', interval)
+            run_time = time.perf_counter() - start
+            print('{:>6} {:>9} {:>9} {:>10.1f}'.format(
+                name, interval or '6min', len(df), run_time * 1000))
+
+
+def validate(stationids, years, datum):
+    print('{:>8} {:>5} {:>12} {:>14} {:>13}'.format(
+        'station', 'year', '6min (mm)', 'hilo time (min)', 'hilo wl (mm)'))
+    for stationid in stationids:
+        constants = harmonic.HarmonicConstants.load(stationid)
+        for year in years:
+            begin_date, end_date = '%d0101' % year, '%d0131' % year
+            api = coops.get_data(begin_date, end_date, stationid,
+                                 'predictions', datum=datum)
+            local = constants.predictions(begin_date, end_date, datum)
+            heights = (local['predicted_wl'] - api['predicted_wl']).abs()
+
+            api_hilo = coops.get_data(begin_date, end_date, stationid,
+                                      'predictions', datum=datum,
+                                      interval='hilo')
+            local_hilo = constants.predictions(begin_date, end_date, datum,
+                                               'hilo')
+            if len(api_hilo) == len(local_hilo):
+                times = np.abs(local_hilo.index - api_hilo.index).max() / \
+                    pd.Timedelta('1min')
+                hilo_heights = np.abs(local_hilo['predicted_wl'].values -
+                                      api_hilo['predicted_wl'].values).max()
+                hilo = '{:>14.0f} {:>13.1f}'.format(times,
+                                                    hilo_heights * 1000)
+            else:
+                hilo = '{:>28}'.format('%d vs %d extrema' % (
+                    len(local_hilo), len(api_hilo)))
+            print('{:>8} {:>5} {:>12.1f} {}'.format(
+                stationid, year, heights.max() * 1000, hilo))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--validate', default='')
+    parser.add_argument('--years', default='2015,2025')
+    parser.add_argument('--datum', default='MLLW')
+    args = parser.parse_args()
+
+    benchmark()
+    if args.validate:
+        years = [int(year) for year in args.years.split(',')]
+        validate(args.validate.split(','), years, args.datum)
+
+
+if __name__ == '__main__':
+    main()
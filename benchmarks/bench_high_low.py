@@ -0,0 +1,129 @@
+"""
+Benchmark the daily reshaping of high_low data, as done by
+coops.reshape_high_low().
+
+Times the pivot-based coops.reshape_high_low() against the four-way split,
+per-row .date() and three outer joins implementation it replaced, on
+synthetic mixed-tide data, and checks that both produce the same output.
+
+Run from the repository root with: python -m benchmarks.bench_high_low
+"""
+from __future__ import print_function
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops
+
+
+def make_raw_high_low(num_years):
+    """Build a raw (unformatted) high_low dataframe with four tides a day."""
+    days = pd.date_range('1980-01-01', periods=int(num_years * 365), freq='D')
+    offsets = pd.to_timedelta(['03:12:00', '09:30:00', '15:48:00', '22:06:00'])
+    times = (days.values[:, None] + offsets.values[None, :]).ravel()
+    return pd.DataFrame({
+        't': pd.DatetimeIndex(times).strftime('%Y-%m-%d %H:%M'),
+        'v': np.char.mod('%.3f', np.random.randn(len(times))),
+        'ty': np.tile(['HH', 'L ', 'H ', 'LL'], len(days)),
+        'f': '0,0,0'})
+
+
+def legacy_reshape_high_low(df):
+    """
+    The four-way split and join reshape previously used by get_data().
+    """
+    # Separate to high and low dataframes
+    df_HH = df[df['high_low'] == "HH"].copy()
+    df_HH.rename(columns={'date_time': 'date_time_HH',
+                          'water_level': 'HH_water_level'},
+                 inplace=True)
+
+    df_H = df[df['high_low'] == "H "].copy()
+    df_H.rename(columns={'date_time': 'date_time_H',
+                         'water_level': 'H_water_level'},
+                inplace=True)
+
+    df_L = df[df['high_low'].str.contains("L ")].copy()
+    df_L.rename(columns={'date_time': 'date_time_L',
+                         'water_level': 'L_water_level'},
+                inplace=True)
+
+    df_LL = df[df['high_low'].str.contains("LL")].copy()
+    df_LL.rename(columns={'date_time': 'date_time_LL',
+                          'water_level': 'LL_water_level'},
+                 inplace=True)
+
+    # Extract dates (without time) for each entry
+    dates_HH = [x.date() for x in pd.to_datetime(df_HH['date_time_HH'])]
+    dates_H = [x.date() for x in pd.to_datetime(df_H['date_time_H'])]
+    dates_L = [x.date() for x in pd.to_datetime(df_L['date_time_L'])]
+    dates_LL = [x.date() for x in pd.to_datetime(df_LL['date_time_LL'])]
+
+    # Set indices to datetime
+    df_HH['date_time'] = dates_HH
+    df_HH.index = df_HH['date_time']
+    df_H['date_time'] = dates_H
+    df_H.index = df_H['date_time']
+    df_L['date_time'] = dates_L
+    df_L.index = df_L['date_time']
+    df_LL['date_time'] = dates_LL
+    df_LL.index = df_LL['date_time']
+
+    # Remove flags and combine to single dataframe
+    df_HH = df_HH.drop(
+        columns=['flags', 'high_low'])
+    df_H = df_H.drop(columns=['flags', 'high_low',
+                              'date_time'])
+    df_L = df_L.drop(columns=['flags', 'high_low',
+                              'date_time'])
+    df_LL = df_LL.drop(columns=['flags', 'high_low',
+                                'date_time'])
+
+    # Keep only one instance per date (based on max/min)
+    maxes = df_HH.groupby(df_HH.index).HH_water_level.transform(max)
+    df_HH = df_HH.loc[df_HH.HH_water_level == maxes]
+    maxes = df_H.groupby(df_H.index).H_water_level.transform(max)
+    df_H = df_H.loc[df_H.H_water_level == maxes]
+    mins = df_L.groupby(df_L.index).L_water_level.transform(max)
+    df_L = df_L.loc[df_L.L_water_level == mins]
+    mins = df_LL.groupby(df_LL.index).LL_water_level.transform(max)
+    df_LL = df_LL.loc[df_LL.LL_water_level == mins]
+
+    df = df_HH.join(df_H, how='outer')
+    df = df.join(df_L, how='outer')
+    df = df.join(df_LL, how='outer')
+
+    # Convert dates to datetime objects
+    df['date_time'] = pd.to_datetime(df.index)
+
+    return df
+
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print('{:>6} {:>8} {:>11} {:>12} {:>9}'.format(
+        'years', 'rows', 'pivot (s)', 'legacy (s)', 'speedup'))
+    for num_years in (1, 10, 40):
+        df = coops.normalize_columns(make_raw_high_low(num_years), 'high_low')
+        pivot_time, df_pivot = timed(coops.reshape_high_low, df.copy())
+        legacy_time, df_legacy = timed(legacy_reshape_high_low, df.copy())
+
+        df_legacy.index = pd.to_datetime(df_legacy.index)
+        pd.testing.assert_frame_equal(df_pivot, df_legacy, check_names=False,
+                                      check_freq=False)
+
+        print('{:>6} {:>8} {:>11.3f} {:>12.3f} {:>8.0f}x'.format(
+            num_years, len(df), pivot_time, legacy_time,
+            legacy_time / pivot_time))
+
+
+if __name__ == '__main__':
+    main()
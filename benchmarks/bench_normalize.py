@@ -0,0 +1,63 @@
+"""
+Benchmark the normalization of raw block data into typed columns, as done
+by coops.format_data().
+
+Times coops.normalize_columns() against the row-wise
+DataFrame.apply(pd.to_numeric, axis=1) conversion and format-inferring
+pd.to_datetime() call it replaced, on raw water_level frames of increasing
+size.
+
+Run from the repository root with: python -m benchmarks.bench_normalize
+"""
+from __future__ import print_function
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops
+
+
+def make_raw_water_level(num_rows):
+    """Build a raw (unformatted) water_level dataframe."""
+    times = pd.date_range('1990-01-01', periods=num_rows,
+                          freq='6min').strftime('%Y-%m-%d %H:%M')
+    return pd.DataFrame({'t': times,
+                         'v': np.char.mod('%.3f', np.random.randn(num_rows)),
+                         's': np.char.mod('%.3f', np.random.rand(num_rows)),
+                         'f': '0,0,0,0', 'q': 'v'})
+
+
+def legacy_normalize(df):
+    """The per-product conversion previously done by get_data()."""
+    df.rename(columns={'f': 'flags', 'q': 'QC', 's': 'sigma',
+                       't': 'date_time', 'v': 'water_level'},
+              inplace=True)
+    data_cols = df.columns.drop(['flags', 'QC', 'date_time'])
+    df[data_cols] = df[data_cols].apply(
+        pd.to_numeric, axis=1, errors='coerce')
+    df['date_time'] = pd.to_datetime(df['date_time'])
+    return df
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    func(df)
+    return time.perf_counter() - start
+
+
+def main():
+    print('{:>10} {:>14} {:>12} {:>9}'.format(
+        'rows', 'schema (s)', 'legacy (s)', 'speedup'))
+    for num_rows in (10000, 100000, 1000000):
+        df = make_raw_water_level(num_rows)
+        schema_time = timed(
+            lambda df: coops.normalize_columns(df, 'water_level'), df.copy())
+        legacy_time = timed(legacy_normalize, df.copy())
+        print('{:>10} {:>14.3f} {:>12.3f} {:>8.0f}x'.format(
+            num_rows, schema_time, legacy_time, legacy_time / schema_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark the parsing of API responses into dataframes, as done by
+coops.url2pandas().
+
+Times and measures the peak memory (with tracemalloc) of the 'fast'
+parser (coops.bytes2pandas()) and the 'json' parser (json decoding and
+coops.json2pandas()) on synthetic water_level responses, followed by
+coops.normalize_columns() in both cases.
+
+Run from the repository root with: python -m benchmarks.bench_parse
+"""
+from __future__ import print_function
+
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops
+
+
+def make_response(num_rows):
+    """Build the bytes of a water_level JSON response."""
+    times = pd.date_range('2015-01-01', periods=num_rows,
+                          freq='6min').strftime('%Y-%m-%d %H:%M')
+    values = np.char.mod('%.3f', np.random.randn(num_rows))
+    rows = [{'t': t, 'v': v, 's': '0.010', 'f': '0,0,0,0', 'q': 'v'}
+            for t, v in zip(times, values)]
+    return json.dumps({'metadata': {'id': '9447130'},
+                       'data': rows}).encode('utf-8')
+
+
+def parse_fast(content):
+    return coops.normalize_columns(
+        coops.bytes2pandas(content, 'water_level', 1), 'water_level')
+
+
+def parse_json(content):
+    return coops.normalize_columns(
+        coops.json2pandas(json.loads(content), 'water_level', 1),
+        'water_level')
+
+
+def measure(func, content):
+    """Return the run time (s) and peak traced memory (MB) of func."""
+    start = time.perf_counter()
+    func(content)
+    run_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return run_time, peak / 1024. ** 2
+
+
+def main():
+    print('{:>9} {:>10} {:>10} {:>10} {:>11} {:>11}'.format(
+        'rows', 'size (MB)', 'fast (s)', 'json (s)', 'fast (MB)',
+        'json (MB)'))
+    for num_rows in (7440, 87600, 876000):  # 31 days, 1 and 10 years
+        content = make_response(num_rows)
+        fast_time, fast_peak = measure(parse_fast, content)
+        json_time, json_peak = measure(parse_json, content)
+        print('{:>9} {:>10.1f} {:>10.3f} {:>10.3f} {:>11.1f} {:>11.1f}'.format(
+            num_rows, len(content) / 1024. ** 2, fast_time, json_time,
+            fast_peak, json_peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Benchmark nearest station queries of py_noaa.stations.StationCatalogue on a
+synthetic catalogue of 3500 stations (about the size of the CO-OPS station
+list), half of them offering water_level.
+
+Run from the repository root with: python -m benchmarks.bench_stations
+"""
+from __future__ import print_function
+
+import timeit
+
+import numpy as np
+
+from py_noaa.stations import StationCatalogue
+
+
+def main():
+    random = np.random.RandomState(0)
+    catalogue = StationCatalogue([
+        {'id': str(i), 'name': 'Station %d' % i,
+         'lat': random.uniform(18, 62), 'lon': random.uniform(-170, -65),
+         'state': None,
+         'products': ['water_level'] if i % 2 else ['wind'],
+         'datums': [], 'bins': []}
+        for i in range(3500)])
+
+    for name, query, number in [
+            ('nearest_ids', lambda: catalogue.nearest_ids(
+                47.5, -122.4, 5, 'water_level'), 10000),
+            ('nearest', lambda: catalogue.nearest(
+                47.5, -122.4, 5, 'water_level'), 1000)]:
+        run_time = timeit.timeit(query, number=number) / number
+        print('{:>12}: {:8.1f} us per query'.format(name, run_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
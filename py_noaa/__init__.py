@@ -1,3 +1,19 @@
-import py_noaa.coops
+import importlib
 
-__version__ = 1.0
\ No newline at end of file
+__version__ = 1.0
+
+# Submodules are imported on first use (e.g. py_noaa.coops), so that
+# importing py_noaa does not import pandas and requests
+SUBMODULES = ('aggregate', 'batch', 'cache', 'cli', 'client', 'coops',
+              'datums', 'harmonic', 'metrics', 'planner', 'spill', 'stations',
+              'store', 'tail', 'testing')
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module('py_noaa.' + name)
+    raise AttributeError("module 'py_noaa' has no attribute %r" % name)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(SUBMODULES))
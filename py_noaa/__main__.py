@@ -0,0 +1,5 @@
+import sys
+
+from py_noaa.cli import main
+
+sys.exit(main())
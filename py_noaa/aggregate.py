@@ -0,0 +1,291 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops
+from py_noaa.metrics import MemorySink, with_sink
+
+STATS = ('count', 'sum', 'min', 'max', 'mean')
+DEFAULT_STATS = ('min', 'max', 'mean', 'count')
+
+# Coarser data the API offers for a (product, interval), as the
+# (product, interval) to request instead
+COARSER_SOURCES = {('water_level', None): ('hourly_height', None),
+                   ('predictions', None): ('predictions', 'h')}
+COARSER_SOURCES.update(((product, None), (product, 'h')) for product in (
+    'air_pressure', 'air_temperature', 'water_temperature', 'conductivity',
+    'humidity', 'visibility', 'salinity', 'wind'))
+
+# Statistics that describe the distribution of the values in a bucket, and
+# can be approximated from hourly samples when the buckets span a day or
+# more. Extremes and counts depend on the sampling and cannot.
+DISTRIBUTION_STATS = ('mean',)
+
+
+class QuantileSketch(object):
+    """
+    Mergeable sketch of the distribution of a stream of values, for
+    approximate quantiles in bounded memory.
+
+    The sketch holds at most size weighted centroids. While fewer than size
+    values have been added, the values are kept as they are and quantiles
+    are exact (interpolated as pandas does). Beyond that, centroids are
+    merged in groups of equal weight, so the rank error of a quantile is
+    about 1 / size.
+
+    Arguments:
+    size -- max number of centroids kept, int (default 100)
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    @property
+    def count(self):
+        """Number of values added to the sketch."""
+        return self.weights.sum()
+
+    def add(self, values):
+        """Add an array of values (NaNs are ignored)."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self._add(values, np.ones(len(values)))
+
+    def merge(self, other):
+        """Add the values summarized by another sketch."""
+        self._add(other.means, other.weights)
+
+    def _add(self, means, weights):
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='mergesort')
+        self.means, self.weights = means[order], weights[order]
+
+        if len(self.means) > self.size:
+            # Group the centroids into size groups of equal total weight
+            cumulative = np.cumsum(self.weights)
+            groups = np.minimum(
+                ((cumulative - self.weights / 2) / cumulative[-1] *
+                 self.size).astype(int), self.size - 1)
+            weights = np.bincount(groups, self.weights)
+            means = np.bincount(groups, self.weights * self.means)
+            kept = weights > 0
+            self.means, self.weights = means[kept] / weights[kept], \
+                weights[kept]
+
+    def quantile(self, q):
+        """Return the approximate q quantile (0 <= q <= 1) of the values."""
+        if not len(self.means):
+            return np.nan
+        # Position of each centroid in the sorted values, counting from 0
+        positions = np.cumsum(self.weights) - (self.weights + 1) / 2
+        return float(np.interp(q * (self.count - 1), positions, self.means))
+
+
+class Aggregator(object):
+    """
+    Running aggregates of time series data, bucketed on a frequency and
+    updated block by block, so that only the aggregates are held in memory.
+
+    For each bucket and column, the count, sum, min and max of the values are
+    kept (from which the mean is derived), and a QuantileSketch if quantiles
+    are requested. Blocks can be added in any order, and aggregators of the
+    same frequency can be merged.
+
+    Arguments:
+    freq -- bucket frequency, a pandas offset alias (e.g. 'D', 'M', 'A'),
+            string
+    stats -- statistics to return, from count, sum, min, max and mean,
+             sequence (default min, max, mean and count)
+    quantiles -- quantiles (0 to 1) to return, sequence (default none)
+    columns -- columns to aggregate, list (default None, all numeric
+               columns except bin)
+    sketch_size -- size of the quantile sketches, int (default 100)
+    """
+
+    def __init__(self, freq, stats=DEFAULT_STATS, quantiles=(), columns=None,
+                 sketch_size=100):
+        unknown = [stat for stat in stats if stat not in STATS]
+        if unknown:
+            raise ValueError('Unknown statistics %s, use %s'
+                             % (unknown, ', '.join(STATS)))
+        self.freq = freq
+        self.stats = tuple(stats)
+        self.quantiles = tuple(quantiles)
+        self.columns = columns
+        self.sketch_size = sketch_size
+        self._parts = []  # Partial aggregates, (stat, column) columns
+        self._sketches = {}  # (column, bucket) -> QuantileSketch
+
+    def add(self, df):
+        """Add the values of a dataframe with a DatetimeIndex."""
+        if df.empty:
+            return
+        columns = self.columns
+        if columns is None:
+            columns = [column for column in df.columns if column != 'bin' and
+                       pd.api.types.is_numeric_dtype(df[column])]
+        values = df[columns].astype(float)
+
+        buckets = values.resample(self.freq)
+        part = pd.concat({'count': buckets.count(), 'sum': buckets.sum(),
+                          'min': buckets.min(), 'max': buckets.max()},
+                         axis=1)
+        self._parts.append(part[part['count'].sum(axis=1) > 0])
+
+        if self.quantiles:
+            for column in columns:
+                for bucket, group in values[column].groupby(
+                        pd.Grouper(freq=self.freq)):
+                    if group.notna().any():
+                        self._sketch(column, bucket).add(group.values)
+
+        if len(self._parts) > 32:
+            self._combine()
+
+    def merge(self, other):
+        """Add the aggregates of another Aggregator of the same frequency."""
+        self._parts.extend(other._parts)
+        for (column, bucket), sketch in other._sketches.items():
+            self._sketch(column, bucket).merge(sketch)
+        self._combine()
+
+    def _sketch(self, column, bucket):
+        key = (column, bucket)
+        if key not in self._sketches:
+            self._sketches[key] = QuantileSketch(self.sketch_size)
+        return self._sketches[key]
+
+    def _combine(self):
+        """Combine the partial aggregates into one row per bucket."""
+        if len(self._parts) <= 1:
+            return
+        part = pd.concat(self._parts)
+        self._parts = [pd.concat(
+            {stat: getattr(part[stat].groupby(level=0), method)()
+             for stat, method in [('count', 'sum'), ('sum', 'sum'),
+                                  ('min', 'min'), ('max', 'max')]},
+            axis=1)]
+
+    def result(self):
+        """
+        Return the aggregates as a dataframe indexed on the buckets (including
+        empty buckets between the first and last bucket with data), with
+        (column, statistic) columns. Quantile columns are named q<quantile>,
+        e.g. q0.5.
+        """
+        self._combine()
+        if not self._parts:
+            return pd.DataFrame()
+        part = self._parts[0].sort_index()
+        index = pd.date_range(part.index[0], part.index[-1], freq=self.freq,
+                              name='date_time')
+        part = part.reindex(index)
+        part['count'] = part['count'].fillna(0).astype(int)
+
+        results = {}
+        for column in part['count'].columns:
+            for stat in self.stats:
+                if stat == 'mean':
+                    results[(column, stat)] = (
+                        part[('sum', column)] /
+                        part[('count', column)].replace(0, np.nan))
+                else:
+                    results[(column, stat)] = part[(stat, column)]
+            for q in self.quantiles:
+                results[(column, 'q%g' % q)] = [
+                    self._sketches[(column, bucket)].quantile(q)
+                    if (column, bucket) in self._sketches else np.nan
+                    for bucket in index]
+
+        return pd.DataFrame(results, index=index)
+
+
+def spans_a_day(freq):
+    """Return True if buckets of the frequency span at least a day."""
+    offset = pd.tseries.frequencies.to_offset(freq)
+    try:
+        return pd.Timedelta(offset) >= pd.Timedelta(days=1)
+    except ValueError:  # Months, years... have no fixed length
+        return True
+
+
+def choose_source(product, interval, freq, stats, quantiles):
+    """
+    Return the (product, interval) to request to aggregate a product on a
+    frequency: the coarser data the API offers (e.g. hourly_height instead of
+    6-minute water_level, hourly instead of 6-minute met data) if interval is
+    'auto', the buckets span a day or more and only statistics of the
+    distribution of the values (mean, quantiles) are requested; the product
+    itself otherwise.
+
+    Statistics of the coarser data only approximate those of the 6-minute
+    data (hourly samples miss the values in between), and hourly_height is
+    only published once verified, so recent buckets may be missing.
+    """
+    if interval != 'auto':
+        return product, interval
+    if ((product, None) in COARSER_SOURCES and spans_a_day(freq) and
+            all(stat in DISTRIBUTION_STATS for stat in stats)):
+        return COARSER_SOURCES[(product, None)]
+    return product, None
+
+
+def aggregate_data(
+        begin_date, end_date, stationid, product, freq, stats=DEFAULT_STATS,
+        quantiles=(), columns=None, datum=None, bin_num=None, interval=None,
+        units='metric', time_zone='gmt', max_workers=None, client=None,
+        parser='fast', metrics=None, sketch_size=100):
+    """
+    Aggregate data from the NOAA CO-OPS API on a frequency (e.g. daily max
+    water level, monthly mean wind speed) without holding the raw data in
+    memory: blocks are folded into an Aggregator as they arrive and only the
+    aggregates are kept.
+
+    Unlike coops.get_data(), water_level data is not reduced to hourly values
+    first, every row returned by the API is aggregated.
+
+    The begin_date to time_zone, max_workers, client, parser and metrics
+    arguments are the same as coops.get_data(), plus:
+    freq -- bucket frequency, a pandas offset alias (e.g. 'D', 'M', 'A'),
+            string
+    stats -- statistics to return, from count, sum, min, max and mean,
+             sequence (default min, max, mean and count)
+    quantiles -- approximate quantiles (0 to 1) to return, see
+                 QuantileSketch, sequence (default none)
+    columns -- columns to aggregate, list (default None, all numeric columns)
+    interval -- interval of the data to request, 'auto' requests coarser data
+                when it approximates the statistics, with fewer requests (see
+                choose_source()), string (default None)
+    sketch_size -- size of the quantile sketches, int (default 100)
+
+    Returns a dataframe indexed on the buckets with (column, statistic)
+    columns. attrs['source'] holds the (product, interval) requested and
+    attrs['metrics'] the summary of the request, as with coops.get_data().
+    """
+    start = time.perf_counter()
+    sink = MemorySink()
+    metrics = with_sink(metrics, sink)
+
+    source_product, source_interval = choose_source(
+        product, interval, freq, stats, quantiles)
+    data_urls, num_request_blocks = coops.build_block_urls(
+        begin_date, end_date, stationid, source_product, datum, bin_num,
+        source_interval, units, time_zone)
+
+    aggregator = Aggregator(freq, stats, quantiles, columns, sketch_size)
+    for df in coops.iter_blocks(data_urls, source_product, num_request_blocks,
+                                max_workers, client, parser, metrics):
+        if df.empty:
+            continue
+        df = coops.normalize_columns(df, source_product)
+        aggregator.add(df.set_index('date_time'))
+
+    format_start = time.perf_counter()
+    df = aggregator.result()
+    df.attrs['source'] = (source_product, source_interval)
+
+    return coops.attach_summary(df, sink, start, format_start)
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from py_noaa import coops
+from py_noaa.client import Client
+from py_noaa.metrics import MemorySink, with_sink
+
+# Arguments of coops.get_data() that define a job
+JOB_ARGUMENTS = ('begin_date', 'end_date', 'stationid', 'product', 'datum',
+                 'bin_num', 'interval', 'units', 'time_zone', 'layout',
+                 'compact')
+
+JobResult = namedtuple('JobResult', ['job', 'data', 'error'])
+
+
+class RateLimiter(object):
+    """
+    Thread-safe limiter spacing calls to acquire() at least 1 / rate seconds
+    apart, i.e. at most rate calls per second across all threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1. / rate
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BatchResult(object):
+    """
+    Results of a batch of requests, as returned by get_batch().
+
+    Attributes:
+    results -- JobResult(job, data, error) for each job, in the order the jobs
+               were given, data is None for jobs that failed
+    """
+
+    def __init__(self, results):
+        self.results = results
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def errors(self):
+        """The JobResults of the jobs that failed."""
+        return [result for result in self.results if result.error is not None]
+
+    def error_report(self):
+        """
+        Return a dataframe with one row per failed job, with the job arguments
+        and the error type and message.
+        """
+        return pd.DataFrame(
+            [dict(result.job, job=index,
+                  error_type=type(result.error).__name__,
+                  error=str(result.error))
+             for index, result in enumerate(self.results)
+             if result.error is not None],
+            columns=['job'] + list(JOB_ARGUMENTS) + ['error_type', 'error'])
+
+
+def get_batch(
+        jobs, max_workers=8, requests_per_second=None, max_per_host=None,
+        client=None, parser='fast', metrics=None):
+    """
+    Fetch data for many station/product requests at once, scheduling the
+    blocks of all the requests through one shared pool of worker threads.
+
+    Each job is a dict of coops.get_data() arguments, e.g.
+    {'begin_date': '20150101', 'end_date': '20151231', 'stationid': '9447130',
+    'product': 'water_level', 'datum': 'MLLW'}. A failing job does not stop
+    the other jobs; its error is reported in the returned BatchResult.
+
+    Arguments:
+    jobs -- requests to make, list of dicts of coops.get_data() arguments
+    max_workers -- number of worker threads shared by all jobs, int
+                   (default 8)
+    requests_per_second -- max number of requests started per second across
+                           all workers, float (default None, no limit)
+    max_per_host -- max number of requests in flight to the same host, int
+                    (default None, limited by max_workers only)
+    client -- py_noaa.client.Client used to make the requests, a client with a
+              pool of max_workers connections is created for the batch if None
+              (default None)
+    parser -- how responses are parsed, see coops.get_data(), string
+              (default fast)
+    metrics -- sink or list of sinks receiving the block events of all jobs,
+               see coops.get_data(); the data of each job carries its own
+               summary in attrs['metrics'] (default None)
+    """
+    start = time.perf_counter()
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    host_semaphores = {}
+    host_lock = threading.Lock()
+
+    jobs = [dict(job) for job in jobs]
+    blocks = [None] * len(jobs)  # Block dataframes of each job
+    errors = [None] * len(jobs)
+    sinks = [MemorySink() for job in jobs]
+
+    def fetch(job_index, block_index, data_url, num_request_blocks):
+        if errors[job_index] is not None:
+            return  # Skip the remaining blocks of a failed job
+
+        host = urlparse(data_url).netloc
+        with host_lock:
+            if host not in host_semaphores:
+                host_semaphores[host] = threading.BoundedSemaphore(
+                    max_per_host or max_workers)
+
+        try:
+            with host_semaphores[host]:
+                if limiter is not None:
+                    limiter.acquire()
+                blocks[job_index][block_index] = coops.url2pandas(
+                    data_url, jobs[job_index]['product'], num_request_blocks,
+                    batch_client, parser,
+                    with_sink(metrics, sinks[job_index]))
+        except Exception as error:
+            errors[job_index] = error
+
+    batch_client = client or Client(pool_size=max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for job_index, job in enumerate(jobs):
+                try:
+                    data_urls, num_request_blocks = coops.build_block_urls(
+                        **{key: value for key, value in job.items()
+                           if key not in ('layout', 'compact')})
+                except Exception as error:
+                    errors[job_index] = error
+                    continue
+
+                blocks[job_index] = [None] * len(data_urls)
+                for block_index, data_url in enumerate(data_urls):
+                    executor.submit(fetch, job_index, block_index, data_url,
+                                    num_request_blocks)
+    finally:
+        if client is None:
+            batch_client.close()
+
+    results = []
+    for job, job_blocks, error, sink in zip(jobs, blocks, errors, sinks):
+        data = None
+        if error is None:
+            try:
+                format_start = time.perf_counter()
+                data = coops.format_data(
+                    coops.concat_blocks(job_blocks), job['product'],
+                    job.get('interval'), job.get('layout', 'wide'),
+                    job.get('compact', False), job.get('datum'),
+                    job.get('units', 'metric'))
+                coops.attach_summary(data, sink, start, format_start)
+            except Exception as format_error:
+                error = format_error
+        results.append(JobResult(job, data, error))
+
+    return BatchResult(results)
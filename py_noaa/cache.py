@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlparse
+
+from py_noaa.coops import parse_known_date_formats
+
+# Query parameters that do not change the data returned by the API
+IGNORED_PARAMETERS = ('application',)
+
+# Largest difference between the local time of a CO-OPS station and GMT
+# (American Samoa is GMT-11), dates in local time are at most this far
+# behind GMT
+LOCAL_TIME_MARGIN = timedelta(hours=12)
+
+
+def normalize_parameters(data_url):
+    """
+    Return the query parameters of a NOAA CO-OPS API URL (as built by
+    coops.build_query_url()) as a normalized dict, so that equivalent requests
+    map to the same cache entry. Dates are normalized to yyyyMMdd HH:mm.
+    """
+    parameters = {}
+    for key, value in parse_qsl(urlparse(data_url).query):
+        key = key.lower()
+        if key in IGNORED_PARAMETERS:
+            continue
+        if key in ('begin_date', 'end_date'):
+            value = parse_known_date_formats(value).strftime('%Y%m%d %H:%M')
+        elif key != 'station':
+            value = value.lower()
+        parameters[key] = value
+
+    return parameters
+
+
+def cache_key(parameters):
+    """Return the cache key for a dict of normalized query parameters."""
+    return hashlib.sha256(
+        json.dumps(parameters, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def resource(data_url):
+    """Return the scheme, host and path of a URL, without the query."""
+    url = urlparse(data_url)
+    return '%s://%s%s' % (url.scheme.lower(), url.netloc.lower(), url.path)
+
+
+def is_block(parameters):
+    """Return True if normalized query parameters are a block request."""
+    return 'begin_date' in parameters and 'end_date' in parameters
+
+
+class ResponseCache(object):
+    """
+    Persistent on-disk cache of NOAA CO-OPS API responses, keyed on the
+    normalized query parameters of each block request.
+
+    Responses are stored in a SQLite database inside directory. When the total
+    size of the stored responses exceeds max_size, the least recently used
+    entries are evicted. Blocks that end more than immutable_after days in the
+    past never expire, more recent blocks (which may still be revised by
+    CO-OPS) expire ttl seconds after being stored.
+
+    Only block requests (with a begin_date and an end_date) are cached, other
+    requests made through the client (e.g. to the Metadata API) bypass the
+    cache. Entries are keyed on the resource (scheme, host and path) and the
+    normalized query parameters.
+
+    Hits, misses, stores and evictions are counted in the stats attribute.
+    Pass the cache to a py_noaa.client.Client to use it with coops.get_data().
+
+    Arguments:
+    directory -- directory to store the cache in, created if needed, string
+    max_size -- max total size of the stored responses in bytes, int
+                (default 1 GB)
+    ttl -- lifetime of recent blocks in seconds, float (default 3600)
+    immutable_after -- age in days of a block's end_date after which the block
+                       never expires, float (default 30)
+    """
+
+    def __init__(
+            self, directory, max_size=2 ** 30, ttl=3600, immutable_after=30):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.immutable_after = immutable_after
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(
+            os.path.join(directory, 'responses.sqlite'),
+            check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, parameters TEXT, end_date TEXT, '
+            'stored_at REAL, accessed_at REAL, size INTEGER, payload BLOB)')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS responses_accessed_at '
+            'ON responses (accessed_at)')
+
+    def is_expired(self, end_date, stored_at, now=None, time_zone='gmt'):
+        """
+        Return True if an entry for a block ending at end_date (yyyyMMdd HH:mm
+        in time_zone, the time zone of the request) stored at stored_at
+        (seconds since the epoch) has expired. Blocks in local time are
+        assumed to end as late in GMT as any station's local time allows.
+        """
+        now = time.time() if now is None else now
+        end_datetime = datetime.strptime(end_date, '%Y%m%d %H:%M')
+        if time_zone != 'gmt':
+            end_datetime += LOCAL_TIME_MARGIN
+        immutable_before = (datetime(1970, 1, 1) +
+                            timedelta(seconds=now, days=-self.immutable_after))
+
+        if end_datetime < immutable_before:
+            return False
+        return now - stored_at > self.ttl
+
+    def get(self, data_url):
+        """
+        Return the cached response body (bytes) for a request URL, or None on a
+        miss (including expired entries) or a request that is not cached.
+        """
+        parameters = normalize_parameters(data_url)
+        if not is_block(parameters):
+            return None
+        key = cache_key(dict(parameters, resource=resource(data_url)))
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT end_date, stored_at, payload, parameters FROM '
+                'responses WHERE key = ?', (key,)).fetchone()
+
+            if row is None or self.is_expired(
+                    row[0], row[1], now,
+                    json.loads(row[3]).get('time_zone', 'gmt')):
+                self.stats['misses'] += 1
+                return None
+
+            self._db.execute('UPDATE responses SET accessed_at = ? '
+                             'WHERE key = ?', (now, key))
+            self.stats['hits'] += 1
+            return bytes(row[2])
+
+    def put(self, data_url, payload):
+        """
+        Store the response body (bytes) for a request URL, unless it is not a
+        block request.
+        """
+        parameters = normalize_parameters(data_url)
+        if not is_block(parameters):
+            return
+        key = cache_key(dict(parameters, resource=resource(data_url)))
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, json.dumps(parameters, sort_keys=True),
+                 parameters.get('end_date'), now, now, len(payload),
+                 sqlite3.Binary(payload)))
+            self.stats['stores'] += 1
+            self._evict()
+
+    def _evict(self):
+        """Evict least recently used entries until under max_size."""
+        total_size = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        for key, size in self._db.execute(
+                'SELECT key, size FROM responses '
+                'ORDER BY accessed_at').fetchall():
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.stats['evictions'] += 1
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def size(self):
+        """Return the total size of the stored responses in bytes."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        """Close the cache database."""
+        with self._lock:
+            self._db.close()
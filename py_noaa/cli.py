@@ -0,0 +1,176 @@
+"""
+py_noaa command line interface, installed as the py_noaa console script
+(also run with python -m py_noaa).
+
+    py_noaa export 9447130 9443090 --product water_level --datum MLLW \\
+        --begin 20150101 --end 20151231 --format csv --output-dir data
+    py_noaa import-time
+
+Only the standard library is imported when the module is loaded, pandas and
+requests are imported when data is exported, so that --help and argument
+errors are answered almost instantly.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Budget in milliseconds for importing the modules needed to start the
+# command line interface, checked by the import-time command. Modules
+# without a budget are only imported when data is requested.
+IMPORT_TIME_BUDGETS = [
+    ('py_noaa', 50),
+    ('py_noaa.cli', 50),
+    ('requests', None),
+    ('pandas', None),
+    ('py_noaa.coops', None),
+]
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+
+def build_parser():
+    """Build the argparse.ArgumentParser of the command line interface."""
+    parser = argparse.ArgumentParser(
+        prog='py_noaa',
+        description='Fetch data from the NOAA CO-OPS API.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    export = subparsers.add_parser(
+        'export', help='export station data to CSV or Parquet files',
+        description='Export data for one or more stations to one file per '
+                    'station, named <station>_<product>_<begin>_<end>.<format>.')
+    export.add_argument('stations', nargs='+', metavar='station',
+                        help='station ID')
+    export.add_argument('--product', required=True)
+    export.add_argument('--begin', required=True,
+                        help='begin date (yyyyMMdd or yyyyMMdd HH:mm)')
+    export.add_argument('--end', required=True,
+                        help='end date (yyyyMMdd or yyyyMMdd HH:mm)')
+    export.add_argument('--datum')
+    export.add_argument('--bin', type=int, dest='bin_num')
+    export.add_argument('--interval')
+    export.add_argument('--units', default='metric')
+    export.add_argument('--time-zone', default='gmt')
+    export.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    export.add_argument('--output-dir', default='.')
+    export.add_argument('--max-workers', type=int, default=4,
+                        help='blocks requested concurrently (default 4)')
+    export.add_argument('--compact', action='store_true',
+                        help='use compact data types (Parquet only keeps '
+                             'them)')
+
+    import_time = subparsers.add_parser(
+        'import-time', help='report the time taken to import py_noaa and '
+                            'its dependencies against the budget')
+    import_time.add_argument('--repeat', type=int, default=3,
+                             help='imports timed per module, the fastest '
+                                  'is reported (default 3)')
+
+    return parser
+
+
+def output_path(args, stationid):
+    """Return the path of the file exported for a station."""
+    name = '%s_%s_%s_%s.%s' % (
+        stationid, args.product, args.begin.replace(' ', 'T').replace(':', ''),
+        args.end.replace(' ', 'T').replace(':', ''), args.format)
+    return os.path.join(args.output_dir, name)
+
+
+def export_station(args, stationid, client):
+    """
+    Export the data of one station. CSV files are written block by block
+    with coops.iter_data(), so memory use does not grow with the length of
+    the request; Parquet files are written at once with coops.get_data().
+    """
+    from py_noaa import coops  # Heavy imports, only when exporting
+
+    kwargs = dict(begin_date=args.begin, end_date=args.end,
+                  stationid=stationid, product=args.product,
+                  datum=args.datum, bin_num=args.bin_num,
+                  interval=args.interval, units=args.units,
+                  time_zone=args.time_zone, max_workers=args.max_workers,
+                  client=client, compact=args.compact)
+    path = output_path(args, stationid)
+
+    if args.format == 'parquet':
+        df = coops.get_data(**kwargs)
+        df.to_parquet(path)
+        return path, len(df)
+
+    num_rows = 0
+    temporary_path = path + '.part'  # Never leave a truncated CSV behind
+    with open(temporary_path, 'w') as f:
+        for df in coops.iter_data(**kwargs):
+            df.to_csv(f, header=num_rows == 0)
+            num_rows += len(df)
+    os.replace(temporary_path, path)
+
+    return path, num_rows
+
+
+def export(args):
+    """Run the export command, return the exit status."""
+    from py_noaa.client import Client
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    status = 0
+    with Client(pool_size=args.max_workers) as client:
+        for stationid in args.stations:
+            try:
+                path, num_rows = export_station(args, stationid, client)
+            except Exception as error:
+                print('%s: failed, %s: %s' % (
+                    stationid, type(error).__name__, error), file=sys.stderr)
+                status = 1
+                continue
+            print('%s: %d rows written to %s' % (stationid, num_rows, path))
+
+    return status
+
+
+def measure_import_time(module, repeat=3):
+    """
+    Return the time in milliseconds taken to import a module in a fresh
+    interpreter (the fastest of repeat runs).
+    """
+    code = ('import time; start = time.perf_counter(); import %s; '
+            'print((time.perf_counter() - start) * 1000)' % module)
+    return min(float(subprocess.check_output([sys.executable, '-c', code]))
+               for _ in range(repeat))
+
+
+def import_time(args):
+    """Run the import-time command, return 1 if a budget is exceeded."""
+    status = 0
+    print('{:<16} {:>10} {:>12}'.format('module', 'time (ms)', 'budget (ms)'))
+    for module, budget in IMPORT_TIME_BUDGETS:
+        milliseconds = measure_import_time(module, args.repeat)
+        over = budget is not None and milliseconds > budget
+        status = status or int(over)
+        print('{:<16} {:>10.1f} {:>12}{}'.format(
+            module, milliseconds, '-' if budget is None else budget,
+            '  over budget' if over else ''))
+
+    return status
+
+
+def main(argv=None):
+    """Entry point of the py_noaa console script."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        return export(args)
+    elif args.command == 'import-time':
+        return import_time(args)
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
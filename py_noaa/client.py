@@ -0,0 +1,191 @@
+import json
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def cached_response(url, payload):
+    """Wrap a cached response body in a requests.Response."""
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = payload
+    response.from_cache = True
+    return response
+
+
+def get_json(url, client=None):
+    """
+    GET a JSON resource through client (a Client) if given, otherwise with
+    requests.get(), and return its payload. Raises requests.HTTPError if the
+    request fails.
+    """
+    if client is None:
+        response = requests.get(url)
+    else:
+        response = client.get(url)
+    response.raise_for_status()
+    return response.json()
+
+
+def load_json(path, fetch, max_age=None):
+    """
+    Return the JSON payload cached at path, calling fetch() to get it (and
+    caching it) if the file does not exist or is older than max_age. The
+    file is replaced atomically, so concurrent readers never see a partial
+    file.
+
+    Arguments:
+    path -- JSON file the payload is cached in, string
+    fetch -- function returning the payload, called without arguments
+    max_age -- age in seconds after which the payload is fetched again, None
+               to never refresh it, float (default None)
+    """
+    if os.path.exists(path) and (
+            max_age is None or
+            time.time() - os.path.getmtime(path) < max_age):
+        with open(path) as f:
+            return json.load(f)
+
+    payload = fetch()
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    temporary_path = path + '.part'
+    with open(temporary_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(temporary_path, path)
+
+    return payload
+
+
+class Client(object):
+    """
+    Reusable HTTP client for the NOAA CO-OPS API.
+
+    The client owns a pooled requests.Session, so the TCP/TLS connection is
+    kept alive and reused across all the blocks of a request (and across
+    calls to coops.get_data()). Requests that fail with a connection error,
+    a timeout or a retryable HTTP status (e.g. 429, 5xx) are retried with
+    exponential backoff and full jitter.
+
+    Arguments:
+    pool_size -- max number of pooled connections per host, should be at
+                 least the max_workers passed to coops.get_data(), int
+                 (default 10)
+    timeout -- (connect, read) timeout in seconds for each request, tuple or
+               float (default (10, 60))
+    max_retries -- max number of retries for each request, int (default 5)
+    backoff_factor -- base delay in seconds, the delay before retry n is drawn
+                      uniformly from [0, backoff_factor * 2 ** n], float
+                      (default 0.5)
+    max_backoff -- upper limit on the delay before any retry in seconds,
+                   float (default 30)
+    retry_statuses -- HTTP status codes that are retried, tuple
+                      (default (429, 500, 502, 503, 504))
+    session -- requests.Session to use, a new session is created if None
+               (default None)
+    cache -- py_noaa.cache.ResponseCache to serve repeated requests from,
+             responses have a from_cache attribute telling whether they were
+             served from the cache (default None, no caching)
+    """
+
+    def __init__(
+            self, pool_size=10, timeout=(10, 60), max_retries=5,
+            backoff_factor=0.5, max_backoff=30,
+            retry_statuses=(429, 500, 502, 503, 504), session=None,
+            cache=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.cache = cache
+
+        if session is None:
+            session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.session = session
+
+    def backoff(self, attempt, response=None):
+        """
+        Return the delay in seconds before retry number attempt (counting from
+        0), honouring a Retry-After header sent with the response if any.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass  # HTTP-date format, fall back to exponential backoff
+
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def get(self, url, store=True):
+        """
+        GET the URL, retrying transient failures. Returns the
+        requests.Response, raises requests.HTTPError if the request still
+        fails with a retryable status after max_retries retries.
+
+        If the client has a cache, cached responses are returned without
+        making a request and successful responses are stored in the cache.
+        With store=False the response is not stored, call store() once its
+        body is known to be valid (the API answers errors with status 200).
+        """
+        if self.cache is not None:
+            payload = self.cache.get(url)
+            if payload is not None:
+                return cached_response(url, payload)
+
+        response = self._get(url)
+        response.from_cache = False
+
+        if store:
+            self.store(url, response)
+
+        return response
+
+    def store(self, url, response):
+        """
+        Store a successful response that was not served from the cache in the
+        cache of the client (if any).
+        """
+        if (self.cache is not None and response.status_code == 200 and
+                not getattr(response, 'from_cache', False)):
+            self.cache.put(url, response.content)
+
+    def _get(self, url):
+        """GET the URL from the API, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            if response.status_code not in self.retry_statuses:
+                return response
+            if attempt == self.max_retries:
+                response.raise_for_status()
+                return response
+            time.sleep(self.backoff(attempt, response))
+
+    def close(self):
+        """Close the pooled connections of the underlying session."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,9 +1,100 @@
-import math
-from datetime import datetime, timedelta
-
+import asyncio
+import io
+import json
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
 import pandas as pd
 import requests
-from pandas.io.json import json_normalize
+
+from py_noaa.metrics import MemorySink, block_event, emit, with_sink
+from py_noaa.planner import RequestPlanner
+
+# NOAA CO-OPS API data endpoint, see https://tidesandcurrents.noaa.gov/api/
+API_URL = 'http://tidesandcurrents.noaa.gov/api/datagetter'
+
+# Planner splitting requests into blocks, see py_noaa.planner
+PLANNER = RequestPlanner()
+
+# Error returned by the NOAA CO-OPS API for a request without data
+NO_DATA_MESSAGE = ('No data was found. This product may not be offered at '
+                   'this station at the requested time.')
+
+# Format of the date & time strings returned by the NOAA CO-OPS API
+DATETIME_FORMAT = '%Y-%m-%d %H:%M'
+
+# Column name and data type ('datetime', 'float' or 'string') of each field
+# returned by the NOAA CO-OPS API for each product, as
+# {field: (column name, dtype)}. Fields that are not listed for a product are
+# converted to numeric values, products that are not listed use
+# DEFAULT_COLUMNS. Supporting a new product only requires a new entry here.
+DEFAULT_COLUMNS = {'t': ('date_time', 'datetime'),
+                   'v': ('value', 'float'),
+                   'f': ('flags', 'string')}
+
+PRODUCT_COLUMNS = {
+    'water_level': {'t': ('date_time', 'datetime'),
+                    'v': ('water_level', 'float'),
+                    's': ('sigma', 'float'),
+                    'f': ('flags', 'string'),
+                    'q': ('QC', 'string')},
+    'hourly_height': {'t': ('date_time', 'datetime'),
+                      'v': ('water_level', 'float'),
+                      's': ('sigma', 'float'),
+                      'f': ('flags', 'string')},
+    'high_low': {'t': ('date_time', 'datetime'),
+                 'v': ('water_level', 'float'),
+                 'ty': ('high_low', 'string'),
+                 'f': ('flags', 'string')},
+    'one_minute_water_level': {'t': ('date_time', 'datetime'),
+                               'v': ('water_level', 'float')},
+    'predictions': {'t': ('date_time', 'datetime'),
+                    'v': ('predicted_wl', 'float'),
+                    'type': ('hi_lo', 'string')},
+    'currents': {'t': ('date_time', 'datetime'),
+                 'b': ('bin', 'float'),
+                 'd': ('direction', 'float'),
+                 's': ('speed', 'float')},
+    'wind': {'t': ('date_time', 'datetime'),
+             'd': ('dir', 'float'),
+             'dr': ('compass', 'string'),
+             'f': ('flags', 'string'),
+             'g': ('gust_spd', 'float'),
+             's': ('spd', 'float')},
+    'air_pressure': {'t': ('date_time', 'datetime'),
+                     'v': ('air_press', 'float'),
+                     'f': ('flags', 'string')},
+    'air_temperature': {'t': ('date_time', 'datetime'),
+                        'v': ('air_temp', 'float'),
+                        'f': ('flags', 'string')},
+    'water_temperature': {'t': ('date_time', 'datetime'),
+                          'v': ('water_temp', 'float'),
+                          'f': ('flags', 'string')},
+    'conductivity': {'t': ('date_time', 'datetime'),
+                     'v': ('conductivity', 'float'),
+                     'f': ('flags', 'string')},
+    'humidity': {'t': ('date_time', 'datetime'),
+                 'v': ('humidity', 'float'),
+                 'f': ('flags', 'string')},
+    'visibility': {'t': ('date_time', 'datetime'),
+                   'v': ('visibility', 'float'),
+                   'f': ('flags', 'string')},
+    'salinity': {'t': ('date_time', 'datetime'),
+                 's': ('salinity', 'float'),
+                 'g': ('specific_gravity', 'float')},
+}
+
+# Integer dtypes of the columns converted to integers by compact_columns()
+COMPACT_INTEGER_COLUMNS = {'bin': 'int8', 'direction': 'int16', 'dir': 'int16'}
+
+# Types of tide in high_low data ('ty' field), mapped to the column prefixes
+# used when reshaping the data to one row per day
+HIGH_LOW_TYPES = {'HH': 'HH', 'H ': 'H', 'H': 'H',
+                  'L ': 'L', 'L': 'L', 'LL': 'LL'}
 
 
 def build_query_url(
@@ -13,8 +104,6 @@ def build_query_url(
     Build an URL to be used to fetch data from the NOAA CO-OPS API
     (see https://tidesandcurrents.noaa.gov/api/)
     """
-    base_url = 'http://tidesandcurrents.noaa.gov/api/datagetter?'
-
     # If the data product is water levels, check that a datum is specified
     if product == 'water_level':
         if datum is None:
@@ -139,25 +228,163 @@ def build_query_url(
 
     # Build URL with requests library
     query_url = requests.Request(
-        'GET', base_url, params=parameters).prepare().url
+        'GET', API_URL, params=parameters).prepare().url
 
     return query_url
 
 
-def url2pandas(data_url, product, num_request_blocks):
+def url2pandas(
+        data_url, product, num_request_blocks, client=None, parser='fast',
+        metrics=None):
     """
     Takes in a provided URL using the NOAA CO-OPS API conventions
     (see https://tidesandcurrents.noaa.gov/api/) and converts the corresponding
     JSON data into a pandas dataframe.
+
+    If a py_noaa.client.Client is given, the request is made through its
+    pooled session (with retries), otherwise with requests.get().
+
+    With parser='fast' the response bytes are parsed straight into columns
+    by bytes2pandas(), with parser='json' the response is decoded into
+    dictionaries and parsed by json2pandas().
+
+    If metrics is given, a py_noaa.metrics.BlockEvent is sent to it (a
+    callable or list of callables) once the block is parsed or has failed.
+
+    Responses are only stored in the cache of the client once they parsed,
+    or are a "No data was found" error, so error payloads and outage pages
+    are never cached.
     """
+    start = time.perf_counter()
+    if client is None:
+        response = requests.get(data_url)  # Get JSON data from URL
+    else:
+        response = client.get(data_url, store=False)
+    download_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = None
+    error = None
+    try:
+        if parser == 'fast':
+            df = bytes2pandas(response.content, product, num_request_blocks)
+        elif parser == 'json':
+            json_dict = response.json()  # Create a dictionary from JSON data
+            df = json2pandas(json_dict, product, num_request_blocks)
+        else:
+            raise ValueError("parser must be 'fast' or 'json'")
+    except Exception as block_error:
+        error = block_error
+        if client is not None and str(error).strip() == NO_DATA_MESSAGE:
+            client.store(data_url, response)  # A data gap is a valid answer
+        raise
+    else:
+        if client is not None:
+            client.store(data_url, response)
+    finally:
+        if metrics is not None:
+            # requests measures the time until the response headers arrive
+            elapsed = getattr(response, 'elapsed', None)
+            emit(metrics, block_event(
+                data_url, response.content,
+                None if elapsed is None else elapsed.total_seconds(),
+                download_time, time.perf_counter() - start, df, error,
+                getattr(response, 'from_cache', False)))
 
-    response = requests.get(data_url)  # Get JSON data from URL
-    json_dict = response.json()  # Create a dictionary from JSON data
+    return df
 
-    df = pd.DataFrame()  # Initialize a empty DataFrame
 
-    # Error when the requested begin_date and/or end_date does not have data
-    large_data_gap_error = 'No data was found. This product may not be offered at this station at the requested time.'
+def bytes2pandas(content, product, num_request_blocks):
+    """
+    Converts the raw bytes of a JSON response from the NOAA CO-OPS API into a
+    pandas dataframe, without decoding each row into a dictionary.
+
+    The array of rows is rewritten into tab separated text with
+    bytes.replace() and read by the C parser of pandas.read_csv(), with
+    numeric fields read directly as floats. Responses that are not a plain
+    array of rows with the same string fields (including API errors) are
+    handed to json2pandas(), so errors are handled in the same way.
+    """
+    key = b'"predictions"' if product == 'predictions' else b'"data"'
+
+    # Locate the array of rows and its first row
+    array_start = content.find(b'[', content.find(key) + 1)
+    array_end = content.rfind(b']')
+    row_start = content.find(b'{', array_start)
+    row_end = content.find(b'}', array_start)
+    if content.find(key) == -1 or -1 in (array_start, row_start, row_end):
+        return json2pandas(json.loads(content), product, num_request_blocks)
+
+    row = content[row_start:row_end + 1]
+    try:
+        first_row = json.loads(row)
+    except ValueError:
+        first_row = None
+    if not isinstance(first_row, dict) or not all(
+            isinstance(value, str) and '"' not in value and '\\' not in value
+            for value in first_row.values()):
+        return json2pandas(json.loads(content), product, num_request_blocks)
+
+    # Find the literal text around the values of the first row, i.e.
+    # '{"t":"', '", "v":"', ... and '"}', as well as the separator between
+    # rows. The API writes every row in the same way.
+    fields = list(first_row)
+    separators = []
+    position = 0
+    for field in fields:
+        key_end = row.find(b'"%s"' % field.encode('utf-8'), position) + 1
+        value_start = row.find(b'"', key_end + len(field) + 1) + 1
+        separators.append(row[position:value_start])
+        position = row.find(b'"', value_start)
+    separators.append(row[position:])
+    next_row_start = content.find(b'{', row_end)
+    if next_row_start != -1 and next_row_start < array_end:
+        row_separator = content[row_end + 1:next_row_start]
+    else:
+        row_separator = None
+
+    # Rewrite the rows as tab separated lines, using bytes.replace() only
+    table = content[row_start + len(separators[0]):array_end].rstrip()
+    if not table.endswith(separators[-1]):
+        return json2pandas(json.loads(content), product, num_request_blocks)
+    table = table[:-len(separators[-1])] + b'\n'
+    if row_separator is not None:
+        table = table.replace(
+            separators[-1] + row_separator + separators[0], b'\n')
+    for separator in separators[1:-1]:
+        table = table.replace(separator, b'\t')
+
+    # Rows written in any other way are left partly untouched, fall back to
+    # decoding the JSON in that case
+    num_rows = table.count(b'\n')
+    if (any(char in table for char in (b'"', b'\\', b'{', b'}')) or
+            table.count(b'\t') != num_rows * (len(fields) - 1)):
+        return json2pandas(json.loads(content), product, num_request_blocks)
+
+    columns = PRODUCT_COLUMNS.get(product, DEFAULT_COLUMNS)
+    float_fields = [field for field in fields
+                    if columns.get(field, (None, 'float'))[1] == 'float']
+    try:
+        return pd.read_csv(
+            io.BytesIO(table), sep='\t', header=None, names=fields,
+            dtype={field: (float if field in float_fields else str)
+                   for field in fields},
+            keep_default_na=False,
+            na_values={field: [''] for field in float_fields})
+    except ValueError:  # A numeric field that is not a number
+        return json2pandas(json.loads(content), product, num_request_blocks)
+
+
+def json2pandas(json_dict, product, num_request_blocks):
+    """
+    Converts a dictionary of JSON data returned by the NOAA CO-OPS API into a
+    pandas dataframe, raising a ValueError if the API returned an error.
+    """
+    # Only needed by the 'json' parser and error responses, imported here to
+    # keep importing the module fast
+    from pandas import json_normalize
+
+    df = pd.DataFrame()  # Initialize a empty DataFrame
 
     # Handle coops.get_data() request size & errors from COOPS API, cases below:
         # 1. coops.get_data() makes a large request (i.e. >1 block requests)
@@ -179,7 +406,7 @@ def url2pandas(data_url, product, num_request_blocks):
         error_message = error_message.lstrip()
         error_message = error_message.rstrip()
 
-        if error_message == large_data_gap_error:
+        if error_message == NO_DATA_MESSAGE:
             return df  # Return the empty DataFrame
         else:
             raise ValueError(
@@ -213,6 +440,110 @@ def url2pandas(data_url, product, num_request_blocks):
         return df
 
 
+async def aurl2pandas(
+        session, data_url, product, num_request_blocks, parser='fast',
+        metrics=None):
+    """
+    Asynchronous counterpart of url2pandas(), requesting the URL with an
+    aiohttp.ClientSession instead of the blocking requests library.
+    """
+    start = time.perf_counter()
+    async with session.get(data_url) as response:
+        ttfb = time.perf_counter() - start
+        content = await response.read()
+    download_time = time.perf_counter() - start
+
+    def parse():
+        if parser == 'fast':
+            return bytes2pandas(content, product, num_request_blocks)
+        elif parser == 'json':
+            json_dict = json.loads(content)  # Create a dict from JSON data
+            return json2pandas(json_dict, product, num_request_blocks)
+        raise ValueError("parser must be 'fast' or 'json'")
+
+    start = time.perf_counter()
+    df = None
+    error = None
+    try:
+        # Parse in the default executor, so the event loop keeps serving the
+        # other requests in flight
+        df = await asyncio.get_running_loop().run_in_executor(None, parse)
+    except Exception as block_error:
+        error = block_error
+        raise
+    finally:
+        if metrics is not None:
+            emit(metrics, block_event(
+                data_url, content, ttfb, download_time,
+                time.perf_counter() - start, df, error))
+
+    return df
+
+
+def iter_blocks(
+        data_urls, product, num_request_blocks, max_workers=None,
+        client=None, parser='fast', metrics=None):
+    """
+    Fetch a list of block URLs with url2pandas() and yield the resulting
+    dataframes in the same (chronological) order as the URLs.
+
+    If max_workers is greater than 1, up to max_workers blocks are requested
+    concurrently from a thread pool, ahead of the block being consumed, so at
+    most max_workers blocks are held in memory at a time. Otherwise blocks are
+    requested one after another. The requests are made through client if one
+    is given, and the event of each block is sent to metrics if given.
+    """
+    def fetch(data_url):
+        return url2pandas(
+            data_url, product, num_request_blocks, client, parser, metrics)
+
+    if max_workers is None or max_workers <= 1 or len(data_urls) <= 1:
+        for data_url in data_urls:
+            yield fetch(data_url)
+        return
+
+    with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(data_urls))) as executor:
+        remaining_urls = iter(data_urls)
+        pending = deque(executor.submit(fetch, data_url) for data_url
+                        in islice(remaining_urls, max_workers))
+
+        # Wait for the blocks in submission order, regardless of the order in
+        # which the requests complete, and request a new block for each block
+        # that is handed over
+        while pending:
+            df = pending.popleft().result()
+            for data_url in islice(remaining_urls, 1):
+                pending.append(executor.submit(fetch, data_url))
+            yield df
+
+
+def fetch_blocks(
+        data_urls, product, num_request_blocks, max_workers=None,
+        client=None, parser='fast', metrics=None):
+    """
+    Fetch a list of block URLs with url2pandas() and return the resulting
+    dataframes in the same (chronological) order as the URLs, see
+    iter_blocks().
+    """
+    return list(iter_blocks(data_urls, product, num_request_blocks,
+                            max_workers, client, parser, metrics))
+
+
+def concat_blocks(dfs):
+    """
+    Combine the dataframes of each block, in order, into a single dataframe
+    with a clean index. All blocks are concatenated in one pass, so the cost
+    is linear in the total number of rows.
+    """
+    dfs = [df for df in dfs if not df.empty]  # Skip empty (no data) blocks
+
+    if not dfs:
+        return pd.DataFrame()
+
+    return pd.concat(dfs, ignore_index=True)
+
+
 def parse_known_date_formats(dt_string):
     """Attempt to parse CO-OPS accepted date formats."""
     for fmt in ('%Y%m%d', '%Y%m%d %H:%M', '%m/%d/%Y', '%m/%d/%Y %H:%M'):
@@ -225,9 +556,208 @@ def parse_known_date_formats(dt_string):
                      "for list of accepted date formats.")
 
 
+def build_block_urls(
+        begin_date, end_date, stationid, product, datum=None, bin_num=None,
+        interval=None, units='metric', time_zone='gmt', planner=None):
+    """
+    Split a data request into blocks that respect the NOAA CO-OPS API limits
+    on request length and build the URL for each block.
+
+    Returns a tuple of the block URLs, in chronological order, and the
+    num_request_blocks value to pass to url2pandas() for each block. The
+    blocks are planned by planner, a py_noaa.planner.RequestPlanner
+    (default None, PLANNER is used).
+    """
+    data_urls = plan_request(
+        begin_date, end_date, stationid, product, datum, bin_num, interval,
+        units, time_zone, planner)['url'].tolist()
+
+    return data_urls, len(data_urls)
+
+
+def plan_request(
+        begin_date, end_date, stationid, product, datum=None, bin_num=None,
+        interval=None, units='metric', time_zone='gmt', planner=None):
+    """
+    Dry run of get_data(): return the blocks a request would be split into,
+    without requesting any data, as a dataframe with the begin_date,
+    end_date and url of each block. The arguments are the same as
+    build_block_urls().
+    """
+    # Convert dates to datetime objects so the blocks can be calculated
+    begin_datetime = parse_known_date_formats(begin_date)
+    end_datetime = parse_known_date_formats(end_date)
+    blocks = (planner or PLANNER).plan(
+        begin_datetime, end_datetime, product, interval)
+
+    return pd.DataFrame({
+        'begin_date': [block.begin for block in blocks],
+        'end_date': [block.end for block in blocks],
+        'url': [build_query_url(
+            block.begin.strftime('%Y%m%d %H:%M'),
+            block.end.strftime('%Y%m%d %H:%M'),
+            stationid, product, datum, bin_num, interval, units, time_zone)
+            for block in blocks]},
+        columns=['begin_date', 'end_date', 'url'])
+
+
+def normalize_columns(df, product):
+    """
+    Rename the columns of a raw dataframe returned by url2pandas() and
+    convert them to their data types, as defined for the requested product
+    in PRODUCT_COLUMNS. Each column is converted in a single vectorized step.
+    """
+    columns = PRODUCT_COLUMNS.get(product, DEFAULT_COLUMNS)
+
+    # Rename columns for clarity
+    df = df.rename(columns={
+        field: name for field, (name, dtype) in columns.items()})
+
+    # Convert each column to its data type, fields that are not in the
+    # product's schema are converted to numeric values
+    dtypes = dict(columns.values())
+    for column in df.columns:
+        dtype = dtypes.get(column, 'float')
+        if dtype == 'float':
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        elif dtype == 'datetime':
+            df[column] = pd.to_datetime(df[column], format=DATETIME_FORMAT)
+
+    return df
+
+
+def reshape_high_low(df):
+    """
+    Reshape normalized high_low data to one row per day, with the date_time
+    and water level of the higher high (HH), high (H), low (L) and lower low
+    (LL) water of each day. If a day has more than one entry of a type, the
+    entry with the highest water level is kept.
+    """
+    types = ['HH', 'H', 'L', 'LL']
+
+    # Keep entries with a known type and water level, tagged with their date
+    df = df.assign(high_low=df['high_low'].map(HIGH_LOW_TYPES),
+                   date=df['date_time'].dt.normalize())
+    df = df.dropna(subset=['high_low', 'water_level'])
+
+    # Keep only one instance of each type per date (based on max), the first
+    # entry is kept on ties
+    df = df.sort_values(['water_level', 'date_time'],
+                        ascending=[False, True], kind='mergesort')
+    df = df.drop_duplicates(subset=['date', 'high_low'])
+
+    # Pivot to one row per date and one column per type and variable,
+    # unstacking keeps the datetime and float dtypes of each variable
+    df = df.set_index(['date', 'high_low'])[
+        ['date_time', 'water_level']].unstack('high_low')
+
+    columns = [(variable, high_low) for high_low in types
+               for variable in ('date_time', 'water_level')]
+    df = df.reindex(columns=pd.MultiIndex.from_tuples(columns))
+    df.columns = [
+        'date_time_' + high_low if variable == 'date_time'
+        else high_low + '_water_level' for variable, high_low in columns]
+
+    # Types missing from all dates are reindexed as float columns
+    for high_low in types:
+        column = 'date_time_' + high_low
+        if not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+
+    df.insert(2, 'date_time', df.index)
+
+    return df
+
+
+def compact_columns(df):
+    """
+    Convert the columns of a formatted dataframe to compact data types:
+    string columns (flags, QC, compass, hi_lo...) to categoricals, the bin
+    and direction columns to small integers (nullable integers if they have
+    missing values) and the other float columns to float32, where the
+    values are kept to the 3 decimals returned by the API. Columns whose
+    values would change are left as they are.
+    """
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            df[column] = values.astype('category')
+        elif (column in COMPACT_INTEGER_COLUMNS and
+              values.dtype.kind in 'if'):
+            dtype = COMPACT_INTEGER_COLUMNS[column]
+            if ((values.dropna() % 1 == 0).all() and
+                    (values.dropna().abs() <= np.iinfo(dtype).max).all()):
+                if values.isna().any():
+                    dtype = dtype.capitalize()  # e.g. Int16, nullable
+                df[column] = values.astype(dtype)
+        elif values.dtype == 'float64':
+            narrow = values.astype('float32')
+            if np.allclose(narrow, values, rtol=0, atol=5e-4,
+                           equal_nan=True):
+                df[column] = narrow
+
+    return df
+
+
+def format_data(df, product, interval=None, layout='wide', compact=False,
+                datum=None, units='metric'):
+    """
+    Rename the columns of a raw dataframe returned by url2pandas() based on
+    the requested product, convert them to useable data types and set the
+    date_time column as the index.
+
+    high_low data is reshaped to one row per day if layout is 'wide', and
+    kept as one row per high/low (as returned by the API) if layout is 'long'.
+    If compact is True, the columns are converted to compact data types with
+    compact_columns(). The datum and units the data was requested in are
+    recorded in attrs['datum'] and attrs['units'], see
+    py_noaa.datums.convert().
+    """
+    df = normalize_columns(df, product)
+
+    if product == 'high_low' and layout == 'wide':
+        df = reshape_high_low(df)
+    elif layout not in ('wide', 'long'):
+        raise ValueError("layout must be 'wide' or 'long'")
+
+    # Set datetime to index (for use in resampling)
+    df.index = df['date_time']
+    df = df.drop(columns=['date_time'])
+
+    # Handle hourly requests for water_level and currents data
+    if (product == 'water_level') | (product == 'currents') & (
+            interval == 'h'):
+        df = df.resample('H').first()  # Only return the hourly data
+
+    if compact:
+        df = compact_columns(df)
+
+    df.attrs.update(datum=datum, units=units)
+    return df
+
+
+def attach_summary(df, sink, start, format_start):
+    """
+    Store the summary of the block events collected by sink (a
+    py_noaa.metrics.MemorySink) in df.attrs['metrics'], together with the
+    time spent formatting the data (since format_start) and the total time
+    of the request (since start).
+    """
+    summary = sink.summary()
+    now = time.perf_counter()
+    summary['format_time'] = now - format_start
+    summary['total_time'] = now - start
+    df.attrs['metrics'] = summary
+
+    return df
+
+
 def get_data(
         begin_date, end_date, stationid, product, datum=None, bin_num=None,
-        interval=None, units='metric', time_zone='gmt'):
+        interval=None, units='metric', time_zone='gmt', max_workers=None,
+        client=None, store=None, layout='wide', parser='fast', metrics=None,
+        dry_run=False, compact=False, spill_dir=None):
     """
     Function to get data from NOAA CO-OPS API and convert it to a pandas
     dataframe for convenient analysis.
@@ -245,302 +775,292 @@ def get_data(
     interval -- the interval you would like data returned, string
     units -- units to be used for data output, string (default metric)
     time_zone -- time zone to be used for data output, string (default gmt)
+    max_workers -- max number of blocks to request concurrently for long date
+                   ranges, int (default None, blocks are requested one by one)
+    client -- py_noaa.client.Client used to make the requests, reuse a client
+              to keep connections alive between blocks and calls and to retry
+              transient failures (default None, requests.get() is used)
+    store -- py_noaa.store.StationStore to read through, only the parts of the
+             requested range not already held in the store are requested from
+             the API (default None)
+    layout -- layout of high_low data, 'wide' for one row per day with the
+              HH, H, L and LL water levels, 'long' for one row per high/low,
+              string (default wide)
+    parser -- how responses are parsed, 'fast' to parse the response bytes
+              straight into columns, 'json' to decode the JSON into
+              dictionaries first, string (default fast)
+    metrics -- sink (a callable, e.g. py_noaa.metrics.LoggingSink or
+               MemorySink) or list of sinks that receive a
+               py_noaa.metrics.BlockEvent for each block requested
+               (default None)
+    dry_run -- return the blocks the request would be split into (see
+               plan_request()) instead of requesting the data, bool
+               (default False)
+    compact -- store the data in compact data types to save memory (see
+               compact_columns()): categorical flags, QC and compass, small
+               integer bin and direction, float32 values, bool
+               (default False)
+    spill_dir -- directory to write each completed block to, with a manifest
+                 of done, empty and failed blocks (see
+                 py_noaa.spill.SpillDirectory). If the download is interrupted
+                 or some blocks fail, calling get_data() again with the same
+                 spill_dir only fetches the remaining and failed blocks. The
+                 data is assembled from the spill files, string (default None)
+
+    A summary of the request (see py_noaa.metrics.summarize(), plus the
+    format_time and total_time in seconds) is returned in the
+    attrs['metrics'] attribute of the dataframe.
     """
-    # Convert dates to datetime objects so deltas can be calculated
-    begin_datetime = parse_known_date_formats(begin_date)
-    end_datetime = parse_known_date_formats(end_date)
-    delta = end_datetime - begin_datetime
-
-    # If the length of our data request is less or equal to 31 days,
-    # we can pull the data from API in one request
-    if delta.days <= 31:
-        data_url = build_query_url(
-            begin_datetime.strftime("%Y%m%d %H:%M"),
-            end_datetime.strftime("%Y%m%d %H:%M"),
-            stationid, product, datum, bin_num, interval, units, time_zone)
-
-        df = url2pandas(data_url, product, num_request_blocks=1)
-
-    # If the length of the user specified data request is less than 365 days
-    # AND the product is hourly_height or high_low, we can pull data directly
-    # from the API in one request
-    elif delta.days <= 365 and (
-            product == 'hourly_height' or product == 'high_low'):
-        data_url = build_query_url(
-            begin_date, end_date, stationid, product, datum, bin_num, interval,
-            units, time_zone)
-
-        df = url2pandas(data_url, product, num_request_blocks=1)
-
-    # If the length of the user specified data request is greater than 365 days
-    # AND the product is hourly_height or high_low, we need to load data from
-    # the API in365 day blocks.
-    elif product == 'hourly_height' or product == 'high_low':
-        # Find the number of 365 day blocks in our desired period,
-        # constrain the upper limit of index in the for loop to follow
-        num_365day_blocks = int(math.floor(delta.days / 365))
-
-        df = pd.DataFrame([])  # Empty dataframe for data from API requests
-
-        # Loop through in 365 day blocks,
-        # adjust the begin_datetime and end_datetime accordingly,
-        # make a request to the NOAA CO-OPS API
-        for i in range(num_365day_blocks + 1):
-            begin_datetime_loop = begin_datetime + timedelta(days=(i * 365))
-            end_datetime_loop = begin_datetime_loop + timedelta(days=365)
-
-            # If end_datetime_loop of the current 365 day block is greater
-            # than end_datetime specified by user, use end_datetime
-            if end_datetime_loop > end_datetime:
-                end_datetime_loop = end_datetime
-
-            # Build url for each API request as we proceed through the loop
-            data_url = build_query_url(
-                begin_datetime_loop.strftime('%Y%m%d'),
-                end_datetime_loop.strftime('%Y%m%d'),
-                stationid, product, datum, bin_num, interval, units, time_zone)
-            
-            df_new = url2pandas(data_url, product, num_365day_blocks)  # Get dataframe for block
-            df = df.append(df_new)  # Append to existing dataframe
-            
-    # If the length of the user specified data request is greater than 31 days
-    # for any other products, we need to load data from the API in 31 day
-    # blocks
+    if dry_run:
+        return plan_request(begin_date, end_date, stationid, product, datum,
+                            bin_num, interval, units, time_zone)
+
+    start = time.perf_counter()
+    sink = MemorySink()
+    metrics = with_sink(metrics, sink)
+
+    if store is not None:
+        df = store.get_raw(
+            begin_date, end_date, stationid, product, datum, bin_num,
+            interval, units, time_zone, max_workers, client, parser, metrics)
+    elif spill_dir is not None:
+        from py_noaa.spill import SpillDirectory
+        data_urls, num_request_blocks = build_block_urls(
+            begin_date, end_date, stationid, product, datum, bin_num,
+            interval, units, time_zone)
+        df = concat_blocks(SpillDirectory(spill_dir).fetch(
+            data_urls, product, num_request_blocks, max_workers, client,
+            parser, metrics))
     else:
-        # Find the number of 31 day blocks in our desired period,
-        # constrain the upper limit of index in the for loop to follow
-        num_31day_blocks = int(math.floor(delta.days / 31))
-
-        df = pd.DataFrame([])  # Empty dataframe for data from API requests
-
-        # Loop through in 31 day blocks,
-        # adjust the begin_datetime and end_datetime accordingly,
-        # make a request to the NOAA CO-OPS API
-        for i in range(num_31day_blocks + 1):
-            begin_datetime_loop = begin_datetime + timedelta(days=(i * 31))
-            end_datetime_loop = begin_datetime_loop + timedelta(days=31)
-
-            # If end_datetime_loop of the current 31 day block is greater
-            # than end_datetime specified by user, use end_datetime
-            if end_datetime_loop > end_datetime:
-                end_datetime_loop = end_datetime
-
-            # Build URL for each API request as we proceed through the loop
-            data_url = build_query_url(
-                begin_datetime_loop.strftime('%Y%m%d'),
-                end_datetime_loop.strftime('%Y%m%d'),
-                stationid, product, datum, bin_num, interval, units, time_zone)
-            
-            df_new = url2pandas(data_url, product, num_31day_blocks)  # Get dataframe for block
-            df = df.append(df_new)  # Append to existing dataframe
-            
-    # Rename output dataframe columns based on requested product
-    # and convert to useable data types
-    if product == 'water_level':
-        # Rename columns for clarity
-        df.rename(columns={'f': 'flags', 'q': 'QC', 's': 'sigma',
-                           't': 'date_time', 'v': 'water_level'},
-                  inplace=True)
+        data_urls, num_request_blocks = build_block_urls(
+            begin_date, end_date, stationid, product, datum, bin_num,
+            interval, units, time_zone)
 
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['flags', 'QC', 'date_time'])
-        df[data_cols] = df[data_cols].apply(
-            pd.to_numeric, axis=1, errors='coerce')
+        if len(data_urls) == 1:
+            df = url2pandas(data_urls[0], product, num_request_blocks,
+                            client, parser, metrics)
+        else:
+            # Get dataframe for each block and combine them in a single pass
+            df = concat_blocks(fetch_blocks(
+                data_urls, product, num_request_blocks, max_workers, client,
+                parser, metrics))
 
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
+    format_start = time.perf_counter()
+    df = format_data(df, product, interval, layout, compact, datum, units)
 
-    elif product == 'hourly_height':
-        # Rename columns for clarity
-        df.rename(columns={'f': 'flags', 's': 'sigma',
-                           't': 'date_time', 'v': 'water_level'},
-                  inplace=True)
+    return attach_summary(df, sink, start, format_start)
 
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['flags', 'date_time'])
-        df[data_cols] = df[data_cols].apply(
-            pd.to_numeric, axis=1, errors='coerce')
 
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
+async def aget_data(
+        begin_date, end_date, stationid, product, datum=None, bin_num=None,
+        interval=None, units='metric', time_zone='gmt', session=None,
+        semaphore=None, max_concurrency=10, layout='wide', parser='fast',
+        metrics=None, compact=False):
+    """
+    Asynchronous counterpart of get_data(), for use inside an asyncio event
+    loop. All blocks of a long request are fetched concurrently on the running
+    event loop. Requires the aiohttp package.
+
+    The begin_date to time_zone, layout, parser, metrics and compact
+    arguments are the same as get_data() (including the summary in attrs['metrics']), plus:
+    session -- aiohttp.ClientSession used for the requests, a new session is
+               created (and closed) for the call if None (default None)
+    semaphore -- asyncio.Semaphore limiting the number of requests in flight,
+                 share one semaphore between calls to apply a global limit
+                 (default None)
+    max_concurrency -- max number of requests in flight when no semaphore is
+                       given, int (default 10)
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('coops.aget_data() requires the aiohttp package '
+                          '(pip install aiohttp)')
+
+    start = time.perf_counter()
+    sink = MemorySink()
+    metrics = with_sink(metrics, sink)
+
+    data_urls, num_request_blocks = build_block_urls(
+        begin_date, end_date, stationid, product, datum, bin_num, interval,
+        units, time_zone)
+
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(client_session, data_url):
+        async with semaphore:
+            return await aurl2pandas(
+                client_session, data_url, product, num_request_blocks, parser,
+                metrics)
+
+    async def fetch_all(client_session):
+        # asyncio.gather() returns results in the order the URLs were given
+        return await asyncio.gather(
+            *[fetch(client_session, data_url) for data_url in data_urls])
+
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            dfs = await fetch_all(session)
+    else:
+        dfs = await fetch_all(session)
 
-    elif product == 'high_low':
-        # Rename columns for clarity
-        df.rename(columns={'f': 'flags', 'ty': 'high_low',
-                           't': 'date_time', 'v': 'water_level'},
-                  inplace=True)
-
-        # Separate to high and low dataframes
-        df_HH = df[df['high_low'] == "HH"].copy()
-        df_HH.rename(columns={'date_time': 'date_time_HH',
-                              'water_level': 'HH_water_level'},
-                     inplace=True)
-
-        df_H = df[df['high_low'] == "H "].copy()
-        df_H.rename(columns={'date_time': 'date_time_H',
-                             'water_level': 'H_water_level'},
-                    inplace=True)
-
-        df_L = df[df['high_low'].str.contains("L ")].copy()
-        df_L.rename(columns={'date_time': 'date_time_L',
-                             'water_level': 'L_water_level'},
-                    inplace=True)
-
-        df_LL = df[df['high_low'].str.contains("LL")].copy()
-        df_LL.rename(columns={'date_time': 'date_time_LL',
-                              'water_level': 'LL_water_level'},
-                     inplace=True)
-
-        # Extract dates (without time) for each entry
-        dates_HH = [x.date() for x in pd.to_datetime(df_HH['date_time_HH'])]
-        dates_H = [x.date() for x in pd.to_datetime(df_H['date_time_H'])]
-        dates_L = [x.date() for x in pd.to_datetime(df_L['date_time_L'])]
-        dates_LL = [x.date() for x in pd.to_datetime(df_LL['date_time_LL'])]
-
-        # Set indices to datetime
-        df_HH['date_time'] = dates_HH
-        df_HH.index = df_HH['date_time']
-        df_H['date_time'] = dates_H
-        df_H.index = df_H['date_time']
-        df_L['date_time'] = dates_L
-        df_L.index = df_L['date_time']
-        df_LL['date_time'] = dates_LL
-        df_LL.index = df_LL['date_time']
-
-        # Remove flags and combine to single dataframe
-        df_HH = df_HH.drop(
-            columns=['flags', 'high_low'])
-        df_H = df_H.drop(columns=['flags', 'high_low',
-                                  'date_time'])
-        df_L = df_L.drop(columns=['flags', 'high_low',
-                                  'date_time'])
-        df_LL = df_LL.drop(columns=['flags', 'high_low',
-                                    'date_time'])
-
-        # Keep only one instance per date (based on max/min)
-        maxes = df_HH.groupby(df_HH.index).HH_water_level.transform(max)
-        df_HH = df_HH.loc[df_HH.HH_water_level == maxes]
-        maxes = df_H.groupby(df_H.index).H_water_level.transform(max)
-        df_H = df_H.loc[df_H.H_water_level == maxes]
-        mins = df_L.groupby(df_L.index).L_water_level.transform(max)
-        df_L = df_L.loc[df_L.L_water_level == mins]
-        mins = df_LL.groupby(df_LL.index).LL_water_level.transform(max)
-        df_LL = df_LL.loc[df_LL.LL_water_level == mins]
-
-        df = df_HH.join(df_H, how='outer')
-        df = df.join(df_L, how='outer')
-        df = df.join(df_LL, how='outer')
-
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(
-            ['date_time', 'date_time_HH', 'date_time_H', 'date_time_L',
-             'date_time_LL'])
-        df[data_cols] = df[data_cols].apply(pd.to_numeric, axis=1,
-                                            errors='coerce')
-
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df.index)
-        df['date_time_HH'] = pd.to_datetime(df['date_time_HH'])
-        df['date_time_H'] = pd.to_datetime(df['date_time_H'])
-        df['date_time_L'] = pd.to_datetime(df['date_time_L'])
-        df['date_time_LL'] = pd.to_datetime(df['date_time_LL'])
+    # Combine (in a single pass) and format the blocks in the default
+    # executor, off the event loop
+    loop = asyncio.get_running_loop()
+    df = await loop.run_in_executor(None, concat_blocks, dfs)
 
-    elif product == 'predictions':
-        if interval == 'h':
-            # Rename columns for clarity
-            df.rename(columns={'t': 'date_time', 'v': 'predicted_wl'},
-                      inplace=True)
+    format_start = time.perf_counter()
+    df = await loop.run_in_executor(
+        None, format_data, df, product, interval, layout, compact, datum,
+        units)
 
-            # Convert columns to numeric values
-            data_cols = df.columns.drop(['date_time'])
+    return attach_summary(df, sink, start, format_start)
 
-        elif interval == 'hilo':
-            # Rename columns for clarity
-            df.rename(columns={'t': 'date_time', 'v': 'predicted_wl',
-                               'type': 'hi_lo'},
-                      inplace=True)
 
-            # Convert columns to numeric values
-            data_cols = df.columns.drop(['date_time', 'hi_lo'])
+def iter_data(
+        begin_date, end_date, stationid, product, datum=None, bin_num=None,
+        interval=None, units='metric', time_zone='gmt', max_workers=None,
+        client=None, layout='wide', parser='fast', metrics=None,
+        compact=False):
+    """
+    Generator counterpart of get_data(), yielding a formatted dataframe for
+    each block of the request, in chronological order, as soon as the block
+    is available. Only the blocks being downloaded and the block being
+    consumed are held in memory, regardless of the length of the request.
+
+    Rows of a block that are not later than the last row of the previous
+    block (where blocks overlap) are dropped, and blocks without data are
+    skipped. high_low data in the wide layout is reshaped by whole days: the
+    rows of the last day of a block are held back and formatted with the
+    next block, so a day split between two blocks yields a single row. The
+    arguments are the same as get_data(); with max_workers > 1, up to
+    max_workers blocks are downloaded while earlier blocks are consumed.
+    Block events are sent to metrics as with get_data(), the yielded
+    dataframes do not carry a summary.
+    """
+    data_urls, num_request_blocks = build_block_urls(
+        begin_date, end_date, stationid, product, datum, bin_num, interval,
+        units, time_zone)
+
+    by_day = product == 'high_low' and layout == 'wide'
+    last_t = None  # Latest raw date_time ('t') of the rows read so far
+    carried = None  # Raw rows of the last day read, for by_day reshaping
+    last_date_time = None
+    for df in iter_blocks(data_urls, product, num_request_blocks,
+                          max_workers, client, parser, metrics):
+        if df.empty:
+            continue
+        # Raw date_times are strings in DATETIME_FORMAT, which sort in
+        # chronological order
+        if last_t is not None:
+            df = df[df['t'] > last_t]
+        if df.empty:
+            continue
+        last_t = df['t'].max()
+
+        if by_day:
+            if carried is not None:
+                df = concat_blocks([carried, df])
+            last_day = df['t'].str[:10] == last_t[:10]
+            carried = df[last_day]
+            df = df[~last_day]
+            if df.empty:
+                continue
+
+        df = format_data(df.reset_index(drop=True), product, interval,
+                         layout, compact, datum, units)
+        if last_date_time is not None:
+            df = df[df.index > last_date_time]
+        if df.empty:
+            continue
+
+        last_date_time = df.index[-1]
+        yield df
+
+    if carried is not None:
+        yield format_data(carried.reset_index(drop=True), product, interval,
+                          layout, compact, datum, units)
+
+
+class Profile(namedtuple('Profile', ['time', 'bins', 'speed', 'direction'])):
+    """
+    Currents profile returned by get_profile(): the shared time index
+    (pandas DatetimeIndex), the bins (array of ints) and the speed and
+    direction as 2-D float arrays of shape (len(time), len(bins)), NaN where
+    a bin has no data at a time.
+    """
+    __slots__ = ()
 
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
+    def to_frame(self):
+        """Return the profile as a dataframe with (quantity, bin) columns."""
+        return pd.concat(
+            {quantity: pd.DataFrame(getattr(self, quantity), index=self.time,
+                                    columns=pd.Index(self.bins, name='bin'))
+             for quantity in ('speed', 'direction')}, axis=1)
 
-    elif product == 'currents':
-        # Rename columns for clarity
-        df.rename(columns={'b': 'bin', 'd': 'direction',
-                           's': 'speed', 't': 'date_time'},
-                  inplace=True)
-
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['date_time'])
-        df[data_cols] = df[data_cols].apply(pd.to_numeric, axis=1,
-                                            errors='coerce')
-
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
-
-    elif product == 'wind':
-        # Rename columns for clarity
-        df.rename(columns={'d': 'dir', 'dr': 'compass',
-                           'f': 'flags', 'g': 'gust_spd',
-                           's': 'spd', 't': 'date_time'},
-                  inplace=True)
-
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['date_time', 'flags', 'compass'])
-        df[data_cols] = df[data_cols].apply(pd.to_numeric, axis=1,
-                                            errors='coerce')
-
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
-
-    elif product == 'air_pressure':
-        # Rename columns for clarity
-        df.rename(columns={'f': 'flags', 't': 'date_time', 'v': 'air_press'},
-                  inplace=True)
-
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['date_time', 'flags'])
-        df[data_cols] = df[data_cols].apply(pd.to_numeric, axis=1,
-                                            errors='coerce')
-
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
-
-    elif product == 'air_temperature':
-        # Rename columns for clarity
-        df.rename(columns={'f': 'flags', 't': 'date_time', 'v': 'air_temp'},
-                  inplace=True)
-
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['date_time', 'flags'])
-        df[data_cols] = df[data_cols].apply(pd.to_numeric, axis=1,
-                                            errors='coerce')
-
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
-
-    elif product == 'water_temperature':
-        # Rename columns for clarity
-        df.rename(columns={'f': 'flags', 't': 'date_time', 'v': 'water_temp'},
-                  inplace=True)
-
-        # Convert columns to numeric values
-        data_cols = df.columns.drop(['date_time', 'flags'])
-        df[data_cols] = df[data_cols].apply(pd.to_numeric, axis=1,
-                                            errors='coerce')
-
-        # Convert date & time strings to datetime objects
-        df['date_time'] = pd.to_datetime(df['date_time'])
 
-    # Set datetime to index (for use in resampling)
-    df.index = df['date_time']
-    df = df.drop(columns=['date_time'])
+def get_profile(
+        begin_date, end_date, stationid, bins=None, units='metric',
+        time_zone='gmt', max_workers=None, client=None, parser='fast',
+        metrics=None, catalogue=None):
+    """
+    Get currents data for several bins of a station (e.g. a full ADCP
+    profile) as dense time x bin arrays, see Profile.
 
-    # Handle hourly requests for water_level and currents data
-    if (product == 'water_level') | (product == 'currents') & (
-            interval == 'h'):
-        df = df.resample('H').first()  # Only return the hourly data
+    The request is planned once, and the blocks of all bins are fetched
+    through one pool of max_workers threads. Each block is written straight
+    into the arrays at its rows of the shared time index, without joining
+    per-bin dataframes.
 
-    return df
+    Arguments:
+    begin_date, end_date, stationid, units, time_zone, max_workers, client,
+    parser, metrics -- same as get_data()
+    bins -- bin numbers, list of ints (default None, all bins of the station)
+    catalogue -- py_noaa.stations.StationCatalogue listing the bins of the
+                 station when bins is None (default None, the cached
+                 catalogue from StationCatalogue.load())
+    """
+    if bins is None:
+        if catalogue is None:
+            from py_noaa.stations import StationCatalogue
+            catalogue = StationCatalogue.load(client=client)
+        bins = catalogue.bins(stationid)
+        if not bins:
+            raise ValueError('No current bins listed for station %s'
+                             % stationid)
+    bins = np.asarray(sorted(set(int(bin_num) for bin_num in bins)))
+
+    blocks = PLANNER.plan(parse_known_date_formats(begin_date),
+                          parse_known_date_formats(end_date), 'currents')
+    columns = [position for position in range(len(bins)) for block in blocks]
+    data_urls = [build_query_url(
+        block.begin.strftime('%Y%m%d %H:%M'),
+        block.end.strftime('%Y%m%d %H:%M'), stationid, 'currents', None,
+        bin_num, None, units, time_zone)
+        for bin_num in bins for block in blocks]
+
+    # Keep only the arrays of each block until the time index is known
+    parts = []
+    for column, df in zip(columns, iter_blocks(
+            data_urls, 'currents', len(data_urls), max_workers, client,
+            parser, metrics)):
+        if df.empty:
+            continue
+        df = normalize_columns(df, 'currents')
+        parts.append((column, df['date_time'].values,
+                      df['speed'].values, df['direction'].values))
+    if not parts:
+        raise ValueError('No data was found for station %s and bins %s'
+                         % (stationid, list(bins)))
+
+    times = np.unique(np.concatenate([part[1] for part in parts]))
+    speed = np.full((len(times), len(bins)), np.nan)
+    direction = np.full((len(times), len(bins)), np.nan)
+    for column, part_times, part_speed, part_direction in parts:
+        rows = np.searchsorted(times, part_times)
+        speed[rows, column] = part_speed
+        direction[rows, column] = part_direction
+
+    return Profile(pd.DatetimeIndex(times, name='date_time'), bins, speed,
+                   direction)
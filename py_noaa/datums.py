@@ -0,0 +1,201 @@
+"""
+Local datum and unit conversion of water level data.
+
+The water levels of a station in two datums differ by a fixed offset (the
+difference of the heights of the datums), and in metric and english units
+by a fixed factor, so data fetched in one datum and unit system can be
+re-expressed in any other without requesting it again. DatumTable holds the
+datums of a station, fetched once from the Metadata API and cached locally.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from py_noaa.client import get_json, load_json
+
+# NOAA CO-OPS Metadata API resource of the datums of a station
+DATUMS_URL = ('https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/'
+              'stations/%s/datums.json?units=%s')
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'py_noaa', 'datums')
+
+# Names of the datums of the API in the datums of the Metadata API
+DATUM_NAMES = {'NAVD': 'NAVD88'}
+
+# Entries of the Metadata API datums that are ranges or time intervals, not
+# heights of a datum
+NON_DATUMS = ('GT', 'MN', 'DHQ', 'DLQ', 'HWI', 'LWI')
+
+# Metres per unit of each unit system of the API
+METRES_PER_UNIT = {'metric': 1., 'english': 0.3048}
+
+# Products whose water levels are relative to the requested datum, with the
+# formatted columns that are heights above the datum
+DATUM_PRODUCTS = ('water_level', 'hourly_height', 'high_low', 'predictions',
+                  'one_minute_water_level')
+HEIGHT_COLUMNS = ('water_level', 'predicted_wl', 'HH_water_level',
+                  'H_water_level', 'L_water_level', 'LL_water_level')
+
+# Formatted columns that are lengths, converted between units but not datums
+LENGTH_COLUMNS = ('sigma',)
+
+# Datum and units of the single copy of each station's data kept by a
+# canonical py_noaa.store.StationStore. STND (station datum) is defined at
+# every water level station; predictions are only offered in tidal datums.
+CANONICAL_DATUMS = {'predictions': 'MLLW'}
+CANONICAL_DATUM = 'STND'
+CANONICAL_UNITS = 'metric'
+
+
+def canonical_datum(product):
+    """Return the datum data of a product is held in by a canonical store."""
+    return CANONICAL_DATUMS.get(product, CANONICAL_DATUM)
+
+
+def unit_factor(from_units, to_units):
+    """Return the factor converting lengths between two unit systems."""
+    for units in (from_units, to_units):
+        if units not in METRES_PER_UNIT:
+            raise ValueError('Unknown units %s, use %s' % (
+                units, ' or '.join(sorted(METRES_PER_UNIT))))
+    return METRES_PER_UNIT[from_units] / METRES_PER_UNIT[to_units]
+
+
+class DatumTable(object):
+    """
+    Heights of the datums of a station, in metres above the station datum
+    (STND), as given by the NOAA CO-OPS Metadata API.
+
+    Arguments:
+    stationid -- station ID, string
+    datums -- height of each datum in metres above STND, dict
+    """
+
+    def __init__(self, stationid, datums):
+        self.stationid = stationid
+        self.datums = dict(datums)
+        self.datums.setdefault('STND', 0.)
+
+    @classmethod
+    def load(cls, stationid, cache_dir=DEFAULT_CACHE_DIR,
+             max_age=365 * 24 * 3600, client=None):
+        """
+        Return the datums of a station cached in cache_dir, fetching them
+        from the Metadata API (and caching them) if they are not cached or
+        the cache is older than max_age.
+
+        Arguments:
+        stationid -- station ID, string
+        cache_dir -- directory the datums are cached in, string
+                     (default ~/.cache/py_noaa/datums)
+        max_age -- age in seconds after which the cached datums are fetched
+                   again, None to never refresh them, float (default 365 days)
+        client -- py_noaa.client.Client used for the request (default None)
+        """
+        payload = load_json(
+            os.path.join(cache_dir, '%s.json' % stationid),
+            lambda: get_json(DATUMS_URL % (stationid, 'metric'), client),
+            max_age)
+        return cls(stationid, parse_datums(payload))
+
+    def height(self, datum):
+        """Return the height of a datum in metres above STND."""
+        name = DATUM_NAMES.get(datum.upper(), datum.upper())
+        if name not in self.datums:
+            raise ValueError('Datum %s is not available for station %s, use '
+                             'one of %s' % (datum, self.stationid,
+                                            ', '.join(sorted(self.datums))))
+        return self.datums[name]
+
+    def offset(self, from_datum, to_datum):
+        """
+        Return the offset in metres to add to a water level relative to
+        from_datum to make it relative to to_datum.
+        """
+        return self.height(from_datum) - self.height(to_datum)
+
+    def convert(self, df, datum=None, units=None, from_datum=None,
+                from_units=None, heights=HEIGHT_COLUMNS,
+                lengths=LENGTH_COLUMNS):
+        """
+        Return a copy of a dataframe of water levels of the station in
+        another datum and/or unit system, computed in one vectorized step per
+        column. See convert().
+        """
+        from_datum = from_datum or df.attrs.get('datum')
+        from_units = from_units or df.attrs.get('units') or 'metric'
+        datum = datum or from_datum
+        units = units or from_units
+        if from_datum is None and datum is not None:
+            raise ValueError('The datum of the data is unknown, pass '
+                             'from_datum')
+
+        offset = 0. if datum == from_datum else \
+            self.offset(from_datum, datum)
+        to_metres = unit_factor(from_units, 'metric')
+        from_metres = unit_factor('metric', units)
+
+        df = df.copy()
+        for column in df.columns:
+            if column not in heights and column not in lengths:
+                continue
+            values = df[column]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors='coerce')
+            if column in heights:
+                converted = (values * to_metres + offset) * from_metres
+            else:
+                converted = values * to_metres * from_metres
+            # The API returns water levels to the millimetre (or 1/1000 ft)
+            converted = np.round(converted, 3)
+            if pd.api.types.is_float_dtype(df[column]):
+                converted = converted.astype(df[column].dtype)
+            df[column] = converted
+
+        df.attrs['datum'] = datum
+        df.attrs['units'] = units
+        return df
+
+
+def parse_datums(payload):
+    """
+    Return the heights of the datums in a Metadata API datums.json payload,
+    as {datum: height above STND}.
+    """
+    return {datum['name']: float(datum['value'])
+            for datum in payload.get('datums') or []
+            if datum.get('value') is not None and
+            datum['name'] not in NON_DATUMS}
+
+
+def convert(df, stationid, datum=None, units=None, from_datum=None,
+            from_units=None, cache_dir=DEFAULT_CACHE_DIR, client=None):
+    """
+    Re-express water_level, hourly_height, high_low, one_minute_water_level or
+    predictions data returned by coops.get_data() in another datum and/or
+    unit system, without requesting it again. The datums of the station are
+    loaded with DatumTable.load().
+
+    Water level columns are offset to the new datum and scaled to the new
+    units, sigma is only scaled; values are rounded to 3 decimals as
+    returned by the API.
+
+    Arguments:
+    df -- data returned by coops.get_data(), dataframe
+    stationid -- station ID, string
+    datum -- datum to convert to, string (default None, the datum of df)
+    units -- metric or english, string (default None, the units of df)
+    from_datum -- datum of df, string (default None, df.attrs['datum'])
+    from_units -- units of df, string (default None, df.attrs['units'])
+    cache_dir -- directory the datums are cached in, string
+                 (default ~/.cache/py_noaa/datums)
+    client -- py_noaa.client.Client used for the request (default None)
+    """
+    from_datum = from_datum or df.attrs.get('datum')
+    if datum is None or datum == from_datum:
+        table = DatumTable(stationid, {})  # Only the units change
+    else:
+        table = DatumTable.load(stationid, cache_dir, client=client)
+    return table.convert(df, datum, units, from_datum, from_units)
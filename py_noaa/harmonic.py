@@ -0,0 +1,527 @@
+"""
+Local tide predictions from the harmonic constants of a station.
+
+The predictions of the NOAA CO-OPS API are a deterministic function of the
+harmonic constituents of each station. HarmonicConstants fetches them once
+from the Metadata API (together with the datums of the station), caches
+them locally, and computes predictions on any time grid with NumPy:
+
+    h(t) = Z0 + sum f H cos(speed (t - t0) + (V0 + u) - phase)
+
+where Z0 is MSL above the requested datum and, for each constituent, H and
+phase are its amplitude and Greenwich phase lag, and f, u and V0 its node
+factor, nodal correction and equilibrium argument (Schureman, Manual of
+Harmonic Analysis and Prediction of Tides, 1958). As in the tables used by
+NOAA, V0 is computed at the start of each year (t0), and f and u for the
+middle of the year.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import coops
+from py_noaa.client import get_json, load_json
+from py_noaa.datums import DATUM_NAMES, DatumTable, parse_datums, unit_factor
+
+# NOAA CO-OPS Metadata API resource of the harmonic constants of a station
+HARCON_URL = ('https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/'
+              'stations/%s/harcon.json?units=%s')
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'py_noaa', 'harmonics')
+
+# Rates of change in degrees per hour of the mean solar hour angle (T) and
+# the mean longitudes of the moon (s), sun (h), lunar perigee (p) and solar
+# perigee (p1)
+RATES = np.array([15., 0.5490165, 0.0410686, 0.0046418, 0.0000020])
+
+# Coefficients of (T, s, h, p, p1), constant phase in degrees and nodal
+# modulation of the 37 constituents used by NOAA. The nodal modulation is a
+# list of (base constituent, power), the node factor is the product of the
+# base node factors and the nodal correction the sum of the base nodal
+# corrections multiplied by the powers.
+CONSTITUENTS = {
+    'M2': ((2, -2, 2, 0, 0), 0, [('M2', 1)]),
+    'S2': ((2, 0, 0, 0, 0), 0, []),
+    'N2': ((2, -3, 2, 1, 0), 0, [('M2', 1)]),
+    'K1': ((1, 0, 1, 0, 0), -90, [('K1', 1)]),
+    'M4': ((4, -4, 4, 0, 0), 0, [('M2', 2)]),
+    'O1': ((1, -2, 1, 0, 0), 90, [('O1', 1)]),
+    'M6': ((6, -6, 6, 0, 0), 0, [('M2', 3)]),
+    'MK3': ((3, -2, 3, 0, 0), -90, [('M2', 1), ('K1', 1)]),
+    'S4': ((4, 0, 0, 0, 0), 0, []),
+    'MN4': ((4, -5, 4, 1, 0), 0, [('M2', 2)]),
+    'NU2': ((2, -3, 4, -1, 0), 0, [('M2', 1)]),
+    'S6': ((6, 0, 0, 0, 0), 0, []),
+    'MU2': ((2, -4, 4, 0, 0), 0, [('M2', 1)]),
+    '2N2': ((2, -4, 2, 2, 0), 0, [('M2', 1)]),
+    'OO1': ((1, 2, 1, 0, 0), -90, [('OO1', 1)]),
+    'LAM2': ((2, -1, 0, 1, 0), 180, [('M2', 1)]),
+    'S1': ((1, 0, 0, 0, 0), 180, []),
+    'M1': ((1, -1, 1, 1, 0), -90, [('M1', 1)]),
+    'J1': ((1, 1, 1, -1, 0), -90, [('J1', 1)]),
+    'MM': ((0, 1, 0, -1, 0), 0, [('MM', 1)]),
+    'SSA': ((0, 0, 2, 0, 0), 0, []),
+    'SA': ((0, 0, 1, 0, 0), 0, []),
+    'MSF': ((0, 2, -2, 0, 0), 0, [('M2', -1)]),
+    'MF': ((0, 2, 0, 0, 0), 0, [('MF', 1)]),
+    'RHO': ((1, -3, 3, -1, 0), 90, [('O1', 1)]),
+    'Q1': ((1, -3, 1, 1, 0), 90, [('O1', 1)]),
+    'T2': ((2, 0, -1, 0, 1), 0, []),
+    'R2': ((2, 0, 1, 0, -1), 180, []),
+    '2Q1': ((1, -4, 1, 2, 0), 90, [('O1', 1)]),
+    'P1': ((1, 0, -1, 0, 0), 90, []),
+    '2SM2': ((2, 2, -2, 0, 0), 0, [('M2', -1)]),
+    'M3': ((3, -3, 3, 0, 0), 0, [('M3', 1)]),
+    'L2': ((2, -1, 2, -1, 0), 180, [('L2', 1)]),
+    '2MK3': ((3, -4, 3, 0, 0), 90, [('M2', 2), ('K1', -1)]),
+    'K2': ((2, 0, 2, 0, 0), 0, [('K2', 1)]),
+    'M8': ((8, -8, 8, 0, 0), 0, [('M2', 4)]),
+    'MS4': ((4, -2, 2, 0, 0), 0, [('M2', 1)]),
+}
+
+# Obliquity of the ecliptic and inclination of the lunar orbit to the
+# ecliptic in degrees, as used in the node factor formulas of Schureman
+OBLIQUITY = 23.452
+LUNAR_INCLINATION = 5.145
+
+# Rows of times predicted at once, to bound the memory of the
+# (times x constituents) arrays
+CHUNK_SIZE = 50000
+
+# Predictions intervals of the API, in minutes
+INTERVAL_MINUTES = {None: 6, 'h': 60, '1': 1, '5': 5, '6': 6, '10': 10,
+                    '15': 15, '30': 30, '60': 60}
+
+
+def astronomical_arguments(times):
+    """
+    Return the astronomical arguments at times (datetime64 array, GMT) as a
+    dict of arrays in degrees: the mean solar hour angle T, the mean
+    longitudes s, h, p, p1 and N (moon, sun, lunar perigee, solar perigee,
+    lunar node), and the derived I, nu, xi, nu' (nup), 2 nu'' (nupp2) and
+    P of Schureman.
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    days = (times - np.datetime64('2000-01-01T12:00')) / np.timedelta64(1, 'D')
+    centuries = days / 36525.
+    hours = (times - times.astype('datetime64[D]')) / np.timedelta64(1, 'h')
+
+    polynomials = {
+        's': (218.3164591, 481267.88134236, -0.0013268, 1 / 538841.,
+              -1 / 65194000.),
+        'h': (280.46645, 36000.7697489, 0.00030322222, 0.000000020,
+              -0.00000000654),
+        'p': (83.3532430, 4069.0137111, -0.0103238, -1 / 80053.,
+              1 / 18999000.),
+        'N': (125.0445550, -1934.1361849, 0.0020762, 1 / 467410.,
+              -1 / 60616000.),
+        'p1': (282.93734, 1.71945766667, 0.00045688889, -0.0000000178, 0.),
+    }
+    arguments = {'T': 180. + 15. * hours}
+    for name, coefficients in polynomials.items():
+        arguments[name] = sum(coefficient * centuries ** power
+                              for power, coefficient
+                              in enumerate(coefficients)) % 360.
+
+    N = np.radians(arguments['N'])
+    omega = np.radians(OBLIQUITY)
+    i = np.radians(LUNAR_INCLINATION)
+    I = np.arccos(np.cos(omega) * np.cos(i) -
+                  np.sin(omega) * np.sin(i) * np.cos(N))
+    # Napier's analogies (Schureman equations 14 and 15), in the quadrant
+    # of N / 2
+    e1 = np.arctan2(np.cos((omega - i) / 2) * np.sin(N / 2),
+                    np.cos((omega + i) / 2) * np.cos(N / 2)) - N / 2
+    e2 = np.arctan2(np.sin((omega - i) / 2) * np.sin(N / 2),
+                    np.sin((omega + i) / 2) * np.cos(N / 2)) - N / 2
+    xi, nu = -(e1 + e2), e1 - e2
+
+    # Schureman equations 224 and 232
+    nup = np.arctan2(np.sin(2 * I) * np.sin(nu),
+                     np.sin(2 * I) * np.cos(nu) + 0.3347)
+    nupp2 = np.arctan2(np.sin(I) ** 2 * np.sin(2 * nu),
+                       np.sin(I) ** 2 * np.cos(2 * nu) + 0.0727)
+
+    arguments.update((name, np.degrees(value)) for name, value in [
+        ('I', I), ('xi', xi), ('nu', nu), ('nup', nup), ('nupp2', nupp2)])
+    arguments['P'] = (arguments['p'] - arguments['xi']) % 360.
+
+    return arguments
+
+
+def base_node_factors(arguments):
+    """
+    Return the node factor f and nodal correction u (degrees) of the base
+    constituents of CONSTITUENTS for astronomical arguments, as a dict of
+    (f, u) tuples of arrays.
+    """
+    I = np.radians(arguments['I'])
+    nu, xi = arguments['nu'], arguments['xi']
+    P = np.radians(arguments['P'])
+
+    f_M2 = np.cos(I / 2) ** 4 / 0.9154
+    f_O1 = np.sin(I) * np.cos(I / 2) ** 2 / 0.3800
+    # Schureman equations 203, 214 and 215, and M1 node factor as in
+    # Foreman's tables
+    Q = np.degrees(np.arctan2((5 * np.cos(I) - 1) * np.sin(P),
+                              (7 * np.cos(I) + 1) * np.cos(P)))
+    tan2 = np.tan(I / 2) ** 2
+    R = np.degrees(np.arctan2(np.sin(2 * P), 1 / (6 * tan2) - np.cos(2 * P)))
+
+    return {
+        'M2': (f_M2, 2 * xi - 2 * nu),
+        'O1': (f_O1, 2 * xi - nu),
+        'K1': (np.sqrt(0.8965 * np.sin(2 * I) ** 2 + 0.6001 * np.sin(2 * I) *
+                       np.cos(np.radians(nu)) + 0.1006), -arguments['nup']),
+        'K2': (np.sqrt(19.0444 * np.sin(I) ** 4 + 2.7702 * np.sin(I) ** 2 *
+                       np.cos(2 * np.radians(nu)) + 0.0981),
+               -arguments['nupp2']),
+        'J1': (np.sin(2 * I) / 0.7214, -nu),
+        'OO1': (np.sin(I) * np.sin(I / 2) ** 2 / 0.01640, -2 * xi - nu),
+        'MF': (np.sin(I) ** 2 / 0.1578, -2 * xi),
+        'MM': ((2 / 3. - np.sin(I) ** 2) / 0.5021, 0 * xi),
+        'M3': (np.cos(I / 2) ** 6 / 0.8758, 3 * xi - 3 * nu),
+        'L2': (f_M2 * np.sqrt(1 - 12 * tan2 * np.cos(2 * P) +
+                              36 * tan2 ** 2), 2 * xi - 2 * nu - R),
+        'M1': (f_O1 * np.sqrt(2.310 + 1.435 * np.cos(2 * P)),
+               Q - np.degrees(P) - nu),
+    }
+
+
+def constituent_arguments(names, times):
+    """
+    Return the equilibrium arguments V (degrees), node factors f and nodal
+    corrections u (degrees) of constituents at times, as three arrays of
+    shape (len(times), len(names)).
+    """
+    arguments = astronomical_arguments(times)
+    base = base_node_factors(arguments)
+    astro = np.column_stack([arguments[name] for name in
+                             ('T', 's', 'h', 'p', 'p1')])
+
+    V = np.empty((len(astro), len(names)))
+    f = np.ones((len(astro), len(names)))
+    u = np.zeros((len(astro), len(names)))
+    for column, name in enumerate(names):
+        coefficients, constant, modulation = CONSTITUENTS[name]
+        V[:, column] = astro.dot(coefficients) + constant
+        for base_name, power in modulation:
+            base_f, base_u = base[base_name]
+            f[:, column] *= base_f ** abs(power)
+            u[:, column] += power * base_u
+
+    return V % 360., f, u
+
+
+def parse_harmonic_constants(payload):
+    """
+    Parse a Metadata API harcon.json payload into a dataframe indexed on the
+    constituent names with amplitude and phase (Greenwich phase lag in
+    degrees) columns. Unknown constituents without amplitude are dropped.
+    """
+    rows = []
+    for constituent in payload.get('HarmonicConstituents') or []:
+        name = str(constituent['name']).upper()
+        amplitude = float(constituent['amplitude'])
+        if name not in CONSTITUENTS:
+            if amplitude:
+                raise ValueError('Unknown harmonic constituent %s' % name)
+            continue
+        rows.append((name, amplitude, float(constituent['phase_GMT'])))
+    if not rows:
+        raise ValueError('No harmonic constituents found, the station may '
+                         'be a subordinate station')
+
+    return pd.DataFrame([row[1:] for row in rows], columns=[
+        'amplitude', 'phase'], index=pd.Index([row[0] for row in rows],
+                                             name='name'))
+
+
+def dense_unique(values):
+    """
+    Return the sorted unique values of an array of integers spanning a small
+    range, and the index of each value in them, as np.unique() with
+    return_inverse, in linear time.
+    """
+    low = values.min()
+    counts = np.bincount(values - low)
+    unique = np.nonzero(counts)[0]
+    lookup = np.zeros(len(counts), dtype=np.int64)
+    lookup[unique] = np.arange(len(unique))
+
+    return unique + low, lookup[values - low]
+
+
+class HarmonicConstants(object):
+    """
+    Harmonic constituents and datums of a tide station, computing tide
+    predictions locally.
+
+    Use HarmonicConstants.load() to fetch the constants from the Metadata
+    API once and cache them locally.
+
+    Arguments:
+    stationid -- station the constants belong to, string
+    constituents -- amplitude and phase (Greenwich phase lag, degrees) of
+                    each constituent, indexed on the constituent names,
+                    as returned by parse_harmonic_constants(), dataframe
+    datums -- value of each datum of the station (in the units of the
+              amplitudes), dict
+    units -- units of the amplitudes and datums, metric or english, string
+             (default metric)
+    """
+
+    def __init__(self, stationid, constituents, datums, units='metric'):
+        self.stationid = str(stationid)
+        self.constituents = constituents[constituents['amplitude'] != 0]
+        self.datums = dict(datums)
+        self.units = units
+
+        names = list(self.constituents.index)
+        self._names = names
+        self._amplitudes = self.constituents['amplitude'].values
+        self._phases = self.constituents['phase'].values
+        # Speeds in radians per hour
+        self._speeds = np.radians(np.array(
+            [RATES.dot(CONSTITUENTS[name][0]) for name in names]))
+
+    @classmethod
+    def load(cls, stationid, units='metric', cache_dir=DEFAULT_CACHE_DIR,
+             max_age=365 * 24 * 3600, client=None):
+        """
+        Return the constants of a station cached in cache_dir, fetching them
+        from the Metadata API (and caching them) if they are not cached or
+        the cache is older than max_age.
+
+        Arguments:
+        stationid -- station ID, string
+        units -- metric or english, string (default metric)
+        cache_dir -- directory the constants and datums are cached in,
+                     string (default ~/.cache/py_noaa/harmonics)
+        max_age -- age in seconds after which the cached constants are
+                   fetched again, None to never refresh them, float
+                   (default 365 days)
+        client -- py_noaa.client.Client used for the requests (default None)
+        """
+        factor = unit_factor('metric', units)
+        harcon = load_json(
+            os.path.join(cache_dir, '%s_harcon_%s.json' % (stationid, units)),
+            lambda: get_json(HARCON_URL % (stationid, units), client),
+            max_age)
+        # The datums are cached in metres above STND by DatumTable
+        table = DatumTable.load(stationid, cache_dir, max_age, client)
+        datums = {name: round(height * factor, 3)
+                  for name, height in table.datums.items()}
+
+        return cls(stationid, parse_harmonic_constants(harcon), datums, units)
+
+    @classmethod
+    def from_payloads(cls, stationid, payloads, units='metric'):
+        """
+        Return the constants of a station from the Metadata API responses,
+        a dict of the harcon.json and datums.json payloads under the harcon
+        and datums keys.
+        """
+        return cls(stationid, parse_harmonic_constants(payloads['harcon']),
+                   parse_datums(payloads['datums']), units)
+
+    def datum_offset(self, datum):
+        """Return the height of MSL above a datum of the station."""
+        name = DATUM_NAMES.get(datum.upper(), datum.upper())
+        if name == 'MSL':
+            return 0.
+        if name == 'STND' and 'MSL' in self.datums:
+            return self.datums['MSL']  # Datums are relative to STND
+        if 'MSL' not in self.datums or name not in self.datums:
+            raise ValueError('Datum %s is not available for station %s, use '
+                             'one of %s' % (datum, self.stationid,
+                                            ', '.join(sorted(self.datums))))
+        return self.datums['MSL'] - self.datums[name]
+
+    def _phasors(self, days):
+        """
+        Return the complex amplitude of each constituent at the start of
+        days (datetime64[D] array, GMT), with the node factors and
+        equilibrium arguments of their years, as an array of shape
+        (len(days), number of constituents). The tide at a time of a day is
+        the real part of the sum of the phasors rotated by the speed times
+        the hours since the start of the day.
+        """
+        years = days.astype('datetime64[Y]')
+        unique_years, year_index = np.unique(years, return_inverse=True)
+        starts = unique_years.astype('datetime64[ns]')
+        middles = starts + ((unique_years + 1).astype('datetime64[ns]') -
+                            starts) // 2
+
+        V, _, _ = constituent_arguments(self._names, starts)
+        _, f, u = constituent_arguments(self._names, middles)
+        amplitudes = f * self._amplitudes
+        phases = np.radians(V + u - self._phases)
+        hours = (days.astype('datetime64[ns]') - starts[year_index]) / \
+            np.timedelta64(1, 'h')
+
+        return amplitudes[year_index] * np.exp(1j * (
+            np.outer(hours, self._speeds) + phases[year_index]))
+
+    def predict(self, times, datum='MSL', derivative=0):
+        """
+        Return the predicted tide at times (anything pandas.DatetimeIndex
+        accepts, naive times are GMT) above datum, as an array of floats. With
+        derivative=1 or 2, return the first or second time derivative (per
+        hour) instead.
+
+        Times are split into days and times of day: the tide is the real part
+        of a (days x constituents) by (constituents x times of day) matrix
+        product, so a regular grid over many years costs one exponential per
+        day and constituent rather than per time and constituent.
+        """
+        heights, = self._predict(pd.DatetimeIndex(times).values,
+                                 [derivative])
+        if derivative == 0:
+            heights += self.datum_offset(datum)
+        return heights
+
+    def _predict(self, times, derivatives):
+        """
+        Return the tide (relative to MSL) or its derivatives at times
+        (datetime64[ns] array), one array per derivative order.
+        """
+        if not len(times):
+            return [np.empty(0) for derivative in derivatives]
+        days = times.astype('datetime64[D]')
+        unique_days, day_index = dense_unique(days.astype(np.int64))
+        unique_days = unique_days.astype('datetime64[D]')
+        offsets = (times - days).astype(np.int64)
+        if (offsets % 60000000000 == 0).all():  # Whole minutes
+            unique_offsets, offset_index = dense_unique(
+                offsets // 60000000000)
+            hours = unique_offsets / 60.
+        else:
+            unique_offsets, offset_index = np.unique(offsets,
+                                                     return_inverse=True)
+            hours = unique_offsets / 3.6e12
+        phasors = self._phasors(unique_days)
+        rotations = np.exp(1j * np.outer(self._speeds, hours))
+        regular = len(unique_days) * len(unique_offsets) <= 4 * len(times)
+
+        results = []
+        for derivative in derivatives:
+            factors = (1j * self._speeds) ** derivative
+            if regular:
+                # Predict every time of day of every day
+                grid = np.empty((len(unique_days), len(unique_offsets)))
+                rows = max(1, CHUNK_SIZE * 20 // len(unique_offsets))
+                for start in range(0, len(unique_days), rows):
+                    grid[start:start + rows] = (
+                        phasors[start:start + rows] * factors).dot(
+                            rotations).real
+                results.append(grid[day_index, offset_index])
+            else:
+                heights = np.empty(len(times))
+                for start in range(0, len(times), CHUNK_SIZE):
+                    chunk = slice(start, start + CHUNK_SIZE)
+                    heights[chunk] = (
+                        phasors[day_index[chunk]] * factors *
+                        rotations.T[offset_index[chunk]]).sum(axis=1).real
+                results.append(heights)
+
+        return results
+
+    def extrema(self, begin, end, datum='MSL'):
+        """
+        Return the times (rounded to the minute) of the high and low tides
+        between begin and end (datetimes, GMT), their predicted heights above
+        datum, and whether each is a high tide, as three arrays.
+        """
+        step = pd.Timedelta(minutes=6)
+        grid = pd.date_range(pd.Timestamp(begin).floor('h') - step * 10,
+                             pd.Timestamp(end) + step * 10, freq=step)
+        slopes, = self._predict(grid.values, [1])
+
+        # Bracket the extrema between grid points where the slope changes
+        # sign, then refine them with Newton steps on the slope
+        rising = slopes > 0
+        brackets = np.nonzero(rising[:-1] != rising[1:])[0]
+        fraction = slopes[brackets] / (slopes[brackets] -
+                                       slopes[brackets + 1])
+        times = grid.values[brackets] + (fraction * step.value).astype(
+            'timedelta64[ns]')
+        for _ in range(2):
+            slope, curvature = self._predict(times, [1, 2])
+            correction = np.clip(slope / curvature, -0.1, 0.1)  # In hours
+            times = times - (correction * 3.6e12).astype('timedelta64[ns]')
+
+        times = pd.DatetimeIndex(times).round('min')
+        highs = rising[brackets]
+        inside = (times >= pd.Timestamp(begin)) & (times <= pd.Timestamp(end))
+        times, highs = times[inside], highs[inside]
+
+        return times, self.predict(times, datum), highs
+
+    def predictions(self, begin_date, end_date, datum, interval=None):
+        """
+        Return the predictions between begin_date and end_date (inclusive,
+        GMT) as a dataframe with the same layout as coops.get_data() for the
+        predictions product: a predicted_wl column (and a hi_lo column of H
+        and L for hilo predictions) indexed on date_time, rounded to the
+        millimetre like the API.
+
+        Arguments:
+        begin_date, end_date -- same formats as coops.get_data(), string or
+                                datetime
+        datum -- datum of the predicted water levels, string
+        interval -- h, hilo or a number of minutes (1, 5, 6, 10, 15, 30 or
+                    60), string (default None, 6 minutes)
+        """
+        begin, end = [
+            coops.parse_known_date_formats(date) if isinstance(date, str)
+            else pd.Timestamp(date) for date in (begin_date, end_date)]
+
+        if interval == 'hilo':
+            times, heights, highs = self.extrema(begin, end, datum)
+            df = pd.DataFrame({'predicted_wl': heights.round(3),
+                               'hi_lo': np.where(highs, 'H', 'L')},
+                              index=times)
+        else:
+            if interval not in INTERVAL_MINUTES:
+                raise ValueError('Unknown predictions interval %s, use hilo '
+                                 'or one of %s' % (interval, ', '.join(
+                                     str(key) for key in INTERVAL_MINUTES)))
+            step = pd.Timedelta(minutes=INTERVAL_MINUTES[interval])
+            times = pd.date_range(pd.Timestamp(begin).ceil(step), end,
+                                  freq=step)
+            df = pd.DataFrame(
+                {'predicted_wl': self.predict(times, datum).round(3)},
+                index=times)
+
+        df.index.name = 'date_time'
+        df.attrs.update(datum=datum, units=self.units)
+        return df
+
+
+def get_predictions(
+        begin_date, end_date, stationid, datum, interval=None,
+        units='metric', time_zone='gmt', client=None,
+        cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Local counterpart of coops.get_data() for the predictions product:
+    compute the predictions from the harmonic constants of the station
+    (fetched once and cached, see HarmonicConstants.load()) instead of
+    requesting them from the API. Only GMT times are supported.
+
+    The arguments are the same as coops.get_data(), plus:
+    cache_dir -- directory the harmonic constants are cached in, string
+                 (default ~/.cache/py_noaa/harmonics)
+    """
+    if datum is None:
+        raise ValueError('No datum specified for water level data.See'
+                         ' https://tidesandcurrents.noaa.gov/api/#datum '
+                         'for list of available datums')
+    if time_zone != 'gmt':
+        raise ValueError('Local predictions are only available in GMT')
+
+    constants = HarmonicConstants.load(stationid, units, cache_dir,
+                                       client=client)
+    return constants.predictions(begin_date, end_date, datum, interval)
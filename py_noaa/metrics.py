@@ -0,0 +1,132 @@
+import logging
+import threading
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlparse
+
+# Event emitted for each block requested by coops.url2pandas():
+# url -- the block request URL
+# parameters -- query parameters of the URL, dict
+# bytes -- size of the response body in bytes
+# ttfb -- time to first byte (response headers received) in seconds, None if
+#         unknown
+# download_time -- time to get the whole response in seconds, including
+#                  retries made by a py_noaa.client.Client
+# decode_time -- time to parse the response into a dataframe in seconds
+# rows -- number of rows in the block
+# empty -- True if the block is a gap ("No data was found" response)
+# from_cache -- True if the response came from a response cache
+# error -- the error raised for the block, None if it succeeded
+BlockEvent = namedtuple('BlockEvent', [
+    'url', 'parameters', 'bytes', 'ttfb', 'download_time', 'decode_time',
+    'rows', 'empty', 'from_cache', 'error'])
+
+
+def block_event(
+        data_url, content, ttfb, download_time, decode_time, df=None,
+        error=None, from_cache=False):
+    """Build the BlockEvent of a block request."""
+    return BlockEvent(
+        url=data_url, parameters=dict(parse_qsl(urlparse(data_url).query)),
+        bytes=len(content), ttfb=ttfb, download_time=download_time,
+        decode_time=decode_time, rows=0 if df is None else len(df),
+        empty=df is not None and df.empty, from_cache=bool(from_cache),
+        error=error)
+
+
+def emit(metrics, event):
+    """
+    Send an event to a metrics sink (any callable taking the event) or to
+    each sink in a list or tuple of sinks.
+    """
+    if isinstance(metrics, (list, tuple)):
+        for sink in metrics:
+            sink(event)
+    else:
+        metrics(event)
+
+
+def with_sink(metrics, sink):
+    """Return the sinks of metrics (None, a sink or a list) plus sink."""
+    if metrics is None:
+        return [sink]
+    if isinstance(metrics, (list, tuple)):
+        return list(metrics) + [sink]
+    return [metrics, sink]
+
+
+def summarize(events):
+    """
+    Summarize a list of BlockEvents into a dict with the number of blocks,
+    empty blocks, failed blocks and cached blocks, the total bytes and rows,
+    and the total and max time to first byte, download and decode time (in
+    seconds, summed over blocks that may have run concurrently).
+    """
+    ttfbs = [event.ttfb for event in events if event.ttfb is not None]
+    return {
+        'blocks': len(events),
+        'empty_blocks': sum(event.empty for event in events),
+        'failed_blocks': sum(event.error is not None for event in events),
+        'cached_blocks': sum(event.from_cache for event in events),
+        'bytes': sum(event.bytes for event in events),
+        'rows': sum(event.rows for event in events),
+        'ttfb': sum(ttfbs),
+        'max_ttfb': max(ttfbs) if ttfbs else None,
+        'download_time': sum(event.download_time for event in events),
+        'max_download_time': max(
+            [event.download_time for event in events] or [None]),
+        'decode_time': sum(event.decode_time for event in events),
+    }
+
+
+class MemorySink(object):
+    """
+    Metrics sink keeping every event in memory, in the events attribute.
+    Safe to use from the worker threads of coops.get_data().
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """Return the summary of the events collected, see summarize()."""
+        with self._lock:
+            return summarize(list(self.events))
+
+    def clear(self):
+        """Forget the events collected."""
+        with self._lock:
+            del self.events[:]
+
+
+class LoggingSink(object):
+    """
+    Metrics sink logging one line per event.
+
+    Arguments:
+    logger -- logging.Logger to log to (default the py_noaa.metrics logger)
+    level -- level of successful blocks, failed blocks are logged as
+             warnings, int (default logging.INFO)
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, event):
+        parameters = event.parameters
+        level = self.level if event.error is None else logging.WARNING
+        self.logger.log(
+            level, '%s %s %s-%s: %d bytes, %d rows%s%s, ttfb %s, '
+            'download %.3fs, decode %.3fs%s',
+            parameters.get('station'), parameters.get('product'),
+            parameters.get('begin_date'), parameters.get('end_date'),
+            event.bytes, event.rows, ' (empty)' if event.empty else '',
+            ' (cached)' if event.from_cache else '',
+            'n/a' if event.ttfb is None else '%.3fs' % event.ttfb,
+            event.download_time, event.decode_time,
+            '' if event.error is None else ', error: %s' % event.error)
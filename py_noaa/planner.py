@@ -0,0 +1,82 @@
+from collections import namedtuple
+from datetime import timedelta
+
+# Longest time range the NOAA CO-OPS API returns in one request, by product
+# and interval (None for the product's default interval), see "Data length
+# limitations" at https://tidesandcurrents.noaa.gov/api/. Products and
+# intervals not listed are 6-minute data, limited to DEFAULT_WINDOW.
+DEFAULT_WINDOW = timedelta(days=31)
+HOURLY_WINDOW = timedelta(days=365)
+
+MET_PRODUCTS = ('air_pressure', 'air_temperature', 'water_temperature',
+                'conductivity', 'humidity', 'visibility', 'salinity', 'wind')
+
+MAX_WINDOWS = {
+    ('one_minute_water_level', None): timedelta(days=4),
+    ('hourly_height', None): HOURLY_WINDOW,
+    ('high_low', None): HOURLY_WINDOW,
+    ('predictions', 'h'): timedelta(days=3650),
+    ('predictions', 'hilo'): timedelta(days=3650),
+}
+MAX_WINDOWS.update(((product, 'h'), HOURLY_WINDOW)
+                   for product in MET_PRODUCTS)
+
+# Time resolution of the API begin_date and end_date parameters, both of
+# which are inclusive
+RESOLUTION = timedelta(minutes=1)
+
+Block = namedtuple('Block', ['begin', 'end'])
+
+
+class RequestPlanner(object):
+    """
+    Splits a data request into the smallest number of blocks the NOAA CO-OPS
+    API accepts, based on the longest time range allowed for the requested
+    product and interval.
+
+    Blocks are exactly bounded and do not overlap: each block starts one
+    minute (the resolution of the API dates) after the end of the previous
+    one, and the last block ends at the requested end date and time.
+
+    Arguments:
+    max_windows -- longest time range (timedelta) of one request for
+                   (product, interval) keys, added to or replacing the
+                   entries of MAX_WINDOWS, dict (default None)
+    default_window -- longest time range of one request for products and
+                      intervals not in max_windows, timedelta
+                      (default 31 days)
+    """
+
+    def __init__(self, max_windows=None, default_window=DEFAULT_WINDOW):
+        self.max_windows = dict(MAX_WINDOWS)
+        self.max_windows.update(max_windows or {})
+        self.default_window = default_window
+
+    def max_window(self, product, interval=None):
+        """
+        Return the longest time range (timedelta) of one request for the
+        product and interval.
+        """
+        for key in ((product, interval), (product, None)):
+            if key in self.max_windows:
+                return self.max_windows[key]
+
+        return self.default_window
+
+    def plan(self, begin, end, product, interval=None):
+        """
+        Return the blocks, as a list of Block(begin, end) datetimes in
+        chronological order, to request the data between begin and end
+        (inclusive).
+        """
+        if end < begin:
+            raise ValueError('end_date must not be before begin_date')
+
+        window = self.max_window(product, interval)
+        blocks = []
+        while True:
+            block_end = min(begin + window, end)
+            blocks.append(Block(begin, block_end))
+            if block_end >= end:
+                return blocks
+            begin = block_end + RESOLUTION
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from py_noaa import coops
+from py_noaa.cache import cache_key, normalize_parameters
+
+MANIFEST_NAME = 'manifest.json'
+
+# Status of a block in the manifest
+DONE, EMPTY, FAILED = 'done', 'empty', 'failed'
+
+# Errors of a block that may succeed when retried: transport errors, and
+# responses that are not JSON (e.g. an outage page). Errors returned by the
+# API (e.g. a wrong datum) are raised as with coops.get_data().
+RETRYABLE_ERRORS = (requests.RequestException, IOError, json.JSONDecodeError)
+
+
+class SpillDirectory(object):
+    """
+    Local directory that the blocks of a long request are written to as
+    they complete, so that an interrupted or partly failed download can be
+    resumed without fetching the completed blocks again.
+
+    Each block with data is written to its own pickle file, named after the
+    normalized query parameters of the block. The manifest (manifest.json)
+    records the status of every block: done (with the file and row count),
+    empty (a data gap) or failed (with the error message). It is rewritten
+    after each block, so it is always consistent with the files on disk.
+
+    Arguments:
+    directory -- directory to spill the blocks to, created if needed, string
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.blocks = json.load(f)['blocks']
+        else:
+            self.blocks = {}
+
+    def status(self, data_url):
+        """Return the status of a block (done, empty, failed or None)."""
+        entry = self.blocks.get(cache_key(normalize_parameters(data_url)))
+        if entry is None:
+            return None
+        if entry['status'] == DONE and not os.path.exists(
+                os.path.join(self.directory, entry['file'])):
+            return None  # The spill file was removed, fetch it again
+        return entry['status']
+
+    def _record(self, data_url, entry):
+        entry['url'] = data_url
+        with self._lock:
+            self.blocks[cache_key(normalize_parameters(data_url))] = entry
+            temporary_path = self.manifest_path + '.part'
+            with open(temporary_path, 'w') as f:
+                json.dump({'blocks': self.blocks}, f, indent=1,
+                          sort_keys=True)
+            os.replace(temporary_path, self.manifest_path)
+
+    def fetch_block(self, data_url, product, num_request_blocks, client=None,
+                    parser='fast', metrics=None):
+        """
+        Fetch a block with coops.url2pandas(), spill it to disk and record it
+        in the manifest. Retryable errors (see RETRYABLE_ERRORS) are recorded
+        as a failed block, not raised; other errors are raised.
+        """
+        try:
+            df = coops.url2pandas(data_url, product, num_request_blocks,
+                                  client, parser, metrics)
+        except RETRYABLE_ERRORS as error:
+            self._record(data_url, {'status': FAILED, 'error': '%s: %s' % (
+                type(error).__name__, error)})
+            return
+
+        if df.empty:
+            self._record(data_url, {'status': EMPTY})
+            return
+
+        name = cache_key(normalize_parameters(data_url)) + '.pkl'
+        path = os.path.join(self.directory, name)
+        df.to_pickle(path + '.part')  # Never leave a truncated block behind
+        os.replace(path + '.part', path)
+        self._record(data_url, {'status': DONE, 'file': name,
+                                'rows': len(df)})
+
+    def fetch(self, data_urls, product, num_request_blocks, max_workers=None,
+              client=None, parser='fast', metrics=None):
+        """
+        Fetch the blocks that are not done or empty yet (new and failed
+        blocks), up to max_workers at a time, and return the raw dataframes
+        of all blocks read back from the spill files, in the order of the
+        URLs. The arguments are the same as coops.fetch_blocks().
+
+        Raises RuntimeError if some blocks failed with a retryable error,
+        after all other blocks have been spilled; call again with the same
+        arguments to retry only the failed blocks. Errors returned by the API
+        are raised as they are (a ValueError, as with coops.get_data()).
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        pending = [data_url for data_url in data_urls
+                   if self.status(data_url) not in (DONE, EMPTY)]
+
+        def fetch(data_url):
+            self.fetch_block(data_url, product, num_request_blocks, client,
+                             parser, metrics)
+
+        if max_workers is None or max_workers <= 1 or len(pending) <= 1:
+            for data_url in pending:
+                fetch(data_url)
+        else:
+            with ThreadPoolExecutor(
+                    max_workers=min(max_workers, len(pending))) as executor:
+                list(executor.map(fetch, pending))
+
+        failed = [data_url for data_url in data_urls
+                  if self.status(data_url) == FAILED]
+        if failed:
+            entry = self.blocks[cache_key(normalize_parameters(failed[0]))]
+            raise RuntimeError(
+                '%d of %d blocks failed (first error: %s), see %s. Call '
+                'again to retry the failed blocks.' % (
+                    len(failed), len(data_urls), entry['error'],
+                    self.manifest_path))
+
+        return [self.read(data_url) for data_url in data_urls]
+
+    def read(self, data_url):
+        """Return the raw dataframe of a spilled block (empty if a gap)."""
+        entry = self.blocks[cache_key(normalize_parameters(data_url))]
+        if entry['status'] == EMPTY:
+            return pd.DataFrame()
+        return pd.read_pickle(os.path.join(self.directory, entry['file']))
@@ -0,0 +1,219 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from py_noaa.client import get_json, load_json
+
+# NOAA CO-OPS Metadata API station list, see
+# https://api.tidesandcurrents.noaa.gov/mdapi/prod/
+METADATA_URL = 'https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations.json'
+
+# Metadata API station types listing the stations that offer each product
+# of coops.get_data(), and the resources to expand for each type
+PRODUCT_STATION_TYPES = {
+    'water_level': 'waterlevels',
+    'hourly_height': 'waterlevels',
+    'high_low': 'waterlevels',
+    'one_minute_water_level': '1minute',
+    'predictions': 'tidepredictions',
+    'currents': 'currents',
+    'wind': 'met',
+    'air_pressure': 'met',
+    'air_temperature': 'met',
+    'humidity': 'met',
+    'water_temperature': 'watertemp',
+    'conductivity': 'cond',
+    'salinity': 'cond',
+    'visibility': 'visibility',
+}
+STATION_TYPE_EXPAND = {'waterlevels': 'datums', 'currents': 'bins'}
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'py_noaa', 'stations.json')
+
+EARTH_RADIUS_KM = 6371.0088
+
+STATION_COLUMNS = ['name', 'lat', 'lon', 'state', 'products', 'datums',
+                   'bins']
+
+
+def parse_stations(payload, station_type):
+    """
+    Parse a Metadata API station list (decoded JSON) for a station type into
+    a list of station dicts with the id, name, lat, lon, state, products
+    offered (product names of coops.get_data()), datums and current bins.
+    """
+    products = sorted(product for product, product_type
+                      in PRODUCT_STATION_TYPES.items()
+                      if product_type == station_type)
+
+    stations = []
+    for station in payload.get('stations') or []:
+        datums = (station.get('datums') or {}).get('datums') or []
+        bins = (station.get('bins') or {}).get('bins') or []
+        stations.append({
+            'id': str(station['id']),
+            'name': station.get('name'),
+            'lat': float(station['lat']),
+            'lon': float(station['lng']),
+            'state': station.get('state'),
+            'products': products,
+            'datums': [datum['name'] for datum in datums if 'name' in datum],
+            'bins': [int(bin_info['num']) for bin_info in bins
+                     if 'num' in bin_info],
+        })
+
+    return stations
+
+
+def merge_stations(stations):
+    """
+    Merge station dicts describing the same station (listed under several
+    station types) into one dict per station id, in order of first
+    appearance.
+    """
+    merged = {}
+    for station in stations:
+        if station['id'] not in merged:
+            merged[station['id']] = dict(station)
+            continue
+        known = merged[station['id']]
+        for key in ('products', 'datums', 'bins'):
+            known[key] = sorted(set(known[key]) | set(station[key]))
+        for key in ('name', 'state'):
+            known[key] = known[key] or station[key]
+
+    return list(merged.values())
+
+
+def fetch_stations(client=None):
+    """
+    Request the list of stations offering each product from the NOAA CO-OPS
+    Metadata API (one request per station type) and return the merged list
+    of station dicts, see parse_stations(). The requests are made through
+    client (a py_noaa.client.Client) if given, otherwise with requests.get().
+    """
+    stations = []
+    for station_type in sorted(set(PRODUCT_STATION_TYPES.values())):
+        url = '%s?type=%s' % (METADATA_URL, station_type)
+        if station_type in STATION_TYPE_EXPAND:
+            url += '&expand=%s' % STATION_TYPE_EXPAND[station_type]
+
+        stations.extend(parse_stations(get_json(url, client), station_type))
+
+    return merge_stations(stations)
+
+
+class StationCatalogue(object):
+    """
+    In-memory catalogue of NOAA CO-OPS stations, with their coordinates,
+    the coops.get_data() products they offer, their datums and current bins,
+    and a spatial index answering nearest station queries without any
+    network call.
+
+    The spatial index holds the stations as unit vectors on the sphere, one
+    array per product, so a query is a single matrix-vector product followed
+    by a partial sort; great-circle distances are only computed for the
+    stations returned.
+
+    Use StationCatalogue.load() to build the catalogue from the Metadata API
+    once and cache it locally.
+
+    Arguments:
+    stations -- station dicts with id, name, lat, lon, state, products,
+                datums and bins keys, as returned by fetch_stations(), list
+    """
+
+    def __init__(self, stations):
+        self.stations = pd.DataFrame(
+            [[station.get(column) for column in STATION_COLUMNS]
+             for station in stations],
+            index=pd.Index([station['id'] for station in stations],
+                           name='id'),
+            columns=STATION_COLUMNS)
+        self._ids = self.stations.index.values
+
+        lat = np.radians(self.stations['lat'].values.astype(float))
+        lon = np.radians(self.stations['lon'].values.astype(float))
+        self._xyz = np.column_stack(
+            [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon),
+             np.sin(lat)])
+
+        # Positions and coordinates of the stations offering each product
+        self._products = {}
+        for position, products in enumerate(self.stations['products']):
+            for product in products or []:
+                self._products.setdefault(product, []).append(position)
+        self._products = {
+            product: (np.array(positions), self._xyz[positions])
+            for product, positions in self._products.items()}
+        self._products[None] = (np.arange(len(self._ids)), self._xyz)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CACHE_PATH, max_age=30 * 24 * 3600,
+             client=None):
+        """
+        Return the catalogue cached at path, fetching it from the Metadata
+        API (and caching it) if the file does not exist or is older than
+        max_age.
+
+        Arguments:
+        path -- JSON file the catalogue is cached in, string
+                (default ~/.cache/py_noaa/stations.json)
+        max_age -- age in seconds after which the cached catalogue is
+                   fetched again, None to never refresh it, float
+                   (default 30 days)
+        client -- py_noaa.client.Client used for the requests (default None)
+        """
+        return cls(load_json(path, lambda: fetch_stations(client), max_age))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def station(self, stationid):
+        """Return the metadata of a station as a pandas Series."""
+        return self.stations.loc[str(stationid)]
+
+    def bins(self, stationid):
+        """Return the current bins of a station, list of ints."""
+        return list(self.stations.at[str(stationid), 'bins'] or [])
+
+    def nearest_ids(self, lat, lon, n=5, product=None):
+        """
+        Return the n stations nearest to (lat, lon) offering product (any
+        product if None), closest first, as a list of (station id, distance
+        in km) tuples. This is the fast path for repeated queries.
+        """
+        positions, xyz = self._products.get(product, ((), None))
+        if xyz is None or n <= 0:
+            return []
+
+        lat, lon = math.radians(lat), math.radians(lon)
+        point = np.array([math.cos(lat) * math.cos(lon),
+                          math.cos(lat) * math.sin(lon), math.sin(lat)])
+        # The nearest stations have the largest dot product with the point
+        similarity = xyz.dot(point)
+        if n < len(similarity):
+            nearest = np.argpartition(-similarity, n - 1)[:n]
+        else:
+            nearest = np.arange(len(similarity))
+        nearest = nearest[np.argsort(-similarity[nearest])]
+
+        distances = EARTH_RADIUS_KM * np.arccos(
+            np.clip(similarity[nearest], -1, 1))
+        return list(zip(self._ids[positions[nearest]].tolist(),
+                        distances.tolist()))
+
+    def nearest(self, lat, lon, n=5, product=None):
+        """
+        Return the n stations nearest to (lat, lon) offering product (any
+        product if None), closest first, as a dataframe of station metadata
+        with a distance_km column.
+        """
+        nearest = self.nearest_ids(lat, lon, n, product)
+        df = self.stations.loc[[stationid for stationid, _ in nearest]].copy()
+        df['distance_km'] = [distance for _, distance in nearest]
+
+        return df
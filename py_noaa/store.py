@@ -0,0 +1,232 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from py_noaa import coops, datums
+from py_noaa.cache import LOCAL_TIME_MARGIN
+
+# Format of the raw 't' (date_time) column returned by the NOAA CO-OPS API
+API_DATETIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def merge_intervals(intervals):
+    """
+    Merge a list of (begin, end) datetime intervals into a sorted list of
+    non-overlapping intervals.
+    """
+    merged = []
+    for begin, end in sorted(intervals):
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+
+    return merged
+
+
+def missing_intervals(begin, end, intervals):
+    """
+    Return the parts of the interval (begin, end) that are not covered by the
+    sorted, non-overlapping list of intervals, as a list of (begin, end).
+    """
+    gaps = []
+    for covered_begin, covered_end in intervals:
+        if covered_end < begin:
+            continue
+        if covered_begin > end:
+            break
+        if covered_begin > begin:
+            gaps.append((begin, covered_begin))
+        begin = max(begin, covered_end)
+    if begin < end or (begin == end and not any(
+            covered_begin <= begin <= covered_end
+            for covered_begin, covered_end in intervals)):
+        gaps.append((begin, end))
+
+    return gaps
+
+
+class Partition(object):
+    """
+    Raw API data held by a StationStore for one combination of station,
+    product, datum, bin, interval, units and time zone, together with a
+    coverage index of the time intervals it holds.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, 'data.pkl')
+        self.coverage_path = os.path.join(directory, 'coverage.json')
+        self.lock = threading.Lock()  # Held while the partition is updated
+
+        if os.path.exists(self.coverage_path):
+            with open(self.coverage_path) as f:
+                self.coverage = [
+                    (datetime.strptime(begin, API_DATETIME_FORMAT),
+                     datetime.strptime(end, API_DATETIME_FORMAT))
+                    for begin, end in json.load(f)]
+        else:
+            self.coverage = []
+
+        if os.path.exists(self.data_path):
+            self.data = pd.read_pickle(self.data_path)
+        else:
+            self.data = pd.DataFrame()
+
+    def missing(self, begin, end):
+        """Return the (begin, end) intervals not held in the partition."""
+        return missing_intervals(begin, end, self.coverage)
+
+    def add(self, dfs, intervals):
+        """
+        Merge raw dataframes into the partition, dropping duplicate date_times,
+        mark the intervals as covered and save the partition to disk.
+        """
+        data = coops.concat_blocks([self.data] + list(dfs))
+        if not data.empty:
+            data = data.drop_duplicates(subset='t', keep='last')
+            data = data.sort_values('t').reset_index(drop=True)
+        self.data = data
+        self.coverage = merge_intervals(self.coverage + list(intervals))
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.data.to_pickle(self.data_path)
+        with open(self.coverage_path, 'w') as f:
+            json.dump([(begin.strftime(API_DATETIME_FORMAT),
+                        end.strftime(API_DATETIME_FORMAT))
+                       for begin, end in self.coverage], f)
+
+    def read(self, begin, end):
+        """Return a copy of the raw data between begin and end (inclusive)."""
+        if self.data.empty:
+            return self.data.copy()
+        t = self.data['t']
+        in_range = ((t >= begin.strftime(API_DATETIME_FORMAT)) &
+                    (t <= end.strftime(API_DATETIME_FORMAT)))
+        return self.data[in_range].reset_index(drop=True)
+
+
+class StationStore(object):
+    """
+    Local store of NOAA CO-OPS API data that coops.get_data() can read
+    through, so that only the time ranges not already held locally are
+    requested from the API.
+
+    Data is kept in one partition per (station, product, datum, bin, interval,
+    units, time zone), each with a coverage index of the time intervals it
+    holds. When a request partly overlaps the stored data, only the gaps are
+    split into API blocks and fetched; the results are merged into the
+    partition and deduplicated on date_time.
+
+    If canonical is True, water level products (see
+    py_noaa.datums.DATUM_PRODUCTS) are held in a single copy per station, in
+    the station datum (STND, MLLW for predictions) and metric units, and
+    converted to the requested datum and units when read, so requests in
+    other datums or units are served without requesting the data again. The
+    datums of each station are loaded with py_noaa.datums.DatumTable.load().
+
+    Arguments:
+    directory -- directory to keep the store in, created if needed, string
+    canonical -- hold one copy of water level data per station, bool
+                 (default False)
+    datum_cache_dir -- directory the datums of the stations are cached in,
+                       string (default ~/.cache/py_noaa/datums)
+    """
+
+    def __init__(self, directory, canonical=False,
+                 datum_cache_dir=datums.DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.canonical = canonical
+        self.datum_cache_dir = datum_cache_dir
+        self.stats = {'requested_intervals': 0, 'fetched_intervals': 0}
+        self.datum_tables = {}  # stationid -> py_noaa.datums.DatumTable
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def datum_table(self, stationid, client=None):
+        """Return the DatumTable of a station, loaded once per store."""
+        if stationid not in self.datum_tables:
+            self.datum_tables[stationid] = datums.DatumTable.load(
+                stationid, self.datum_cache_dir, client=client)
+        return self.datum_tables[stationid]
+
+    def partition(
+            self, stationid, product, datum=None, bin_num=None, interval=None,
+            units='metric', time_zone='gmt'):
+        """Return the Partition for a combination of request parameters."""
+        key = (stationid, product, datum, bin_num, interval, units, time_zone)
+        if key not in self._partitions:
+            name = '_'.join(re.sub(r'[^A-Za-z0-9.-]', '-', str(part))
+                            for part in key)
+            self._partitions[key] = Partition(
+                os.path.join(self.directory, name))
+
+        return self._partitions[key]
+
+    def get_raw(
+            self, begin_date, end_date, stationid, product, datum=None,
+            bin_num=None, interval=None, units='metric', time_zone='gmt',
+            max_workers=None, client=None, parser='fast', metrics=None):
+        """
+        Return the raw (unformatted) data for a request, fetching the parts of
+        the requested time range that are not yet held from the API. The
+        arguments are the same as coops.get_data().
+        """
+        begin = coops.parse_known_date_formats(begin_date)
+        end = coops.parse_known_date_formats(end_date)
+
+        requested = (datum, units)
+        if self.canonical and product in datums.DATUM_PRODUCTS:
+            if datum is None:
+                raise ValueError('A datum is required for %s data' % product)
+            datum = datums.canonical_datum(product)
+            units = datums.CANONICAL_UNITS
+
+        with self._lock:
+            partition = self.partition(stationid, product, datum, bin_num,
+                                       interval, units, time_zone)
+
+        # Only requests for the same partition wait for each other
+        with partition.lock:
+            gaps = partition.missing(begin, end)
+            with self._lock:
+                self.stats['requested_intervals'] += 1
+                self.stats['fetched_intervals'] += len(gaps)
+
+            dfs = []
+            for gap_begin, gap_end in gaps:
+                data_urls, num_request_blocks = coops.build_block_urls(
+                    gap_begin.strftime('%Y%m%d %H:%M'),
+                    gap_end.strftime('%Y%m%d %H:%M'),
+                    stationid, product, datum, bin_num, interval, units,
+                    time_zone)
+                # A gap without data is answered with a "No data was found"
+                # error, which is only returned as an empty block for
+                # multi-block requests
+                dfs.extend(coops.fetch_blocks(
+                    data_urls, product, max(num_request_blocks, 2),
+                    max_workers, client, parser, metrics))
+
+            if gaps:
+                # Never mark the future as covered, it may still be published.
+                # Local times are at most LOCAL_TIME_MARGIN behind GMT.
+                now = datetime.utcnow()
+                if time_zone != 'gmt':
+                    now -= LOCAL_TIME_MARGIN
+                partition.add(dfs, [(gap_begin, min(gap_end, now))
+                                    for gap_begin, gap_end in gaps
+                                    if gap_begin < now])
+
+            df = partition.read(begin, end)
+
+        if requested != (datum, units):
+            # Raw water levels ('v') are heights, sigma ('s') a length
+            df = self.datum_table(stationid, client).convert(
+                df, requested[0], requested[1], datum, units,
+                heights=('v',), lengths=('s',))
+        return df
@@ -0,0 +1,255 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from py_noaa import coops
+from py_noaa.client import Client
+
+# Arguments of coops.get_data() that define a stream
+STREAM_ARGUMENTS = ('stationid', 'product', 'datum', 'bin_num', 'interval',
+                    'units', 'time_zone')
+
+# Time between two observations of a product, 6 minutes if not listed
+CADENCES = {'one_minute_water_level': timedelta(minutes=1),
+            'hourly_height': timedelta(hours=1),
+            'high_low': timedelta(hours=6)}
+DEFAULT_CADENCE = timedelta(minutes=6)
+
+
+def stream_key(stream):
+    """
+    Return the key of a stream, (stationid, product), plus the bin for
+    currents streams. A follower has one stream per key.
+    """
+    key = (stream['stationid'], stream['product'])
+    if stream.get('bin_num') is not None:
+        key += (stream['bin_num'],)
+    return key
+
+
+def stream_cadence(stream):
+    """Return the time between two observations of a stream."""
+    if stream.get('interval') == 'h':
+        return timedelta(hours=1)
+    return CADENCES.get(stream['product'], DEFAULT_CADENCE)
+
+
+class StreamState(object):
+    """
+    Polling state of a stream: the latest date_time delivered, when the
+    stream is due to be polled next, and the time between the latest
+    observation and the poll that delivered it for recent polls.
+    """
+
+    def __init__(self, stream, due):
+        self.stream = stream
+        self.cadence = stream_cadence(stream)
+        self.last_seen = None
+        self.due = due
+        self.delays = deque(maxlen=8)  # Delays seen for the latest rows
+        self.misses = 0  # Polls without new data since the last new row
+        self.error = None  # Error of the last poll
+
+
+class Follower(object):
+    """
+    Follow the latest observations of many streams (station and product
+    combinations), requesting only the data newer than what was already
+    delivered.
+
+    For each stream, the latest date_time delivered is kept, and each poll
+    requests data from that date_time on; rows that were already delivered
+    are dropped, so only new rows are returned. Rows are returned as the API
+    returns them (water_level is not reduced to hourly values as in
+    coops.get_data()), indexed on date_time.
+
+    Poll intervals adapt to the cadence of each product: after new data, a
+    stream is polled again when its next observation should be published
+    (the latest date_time plus the cadence and the publication delay
+    observed so far). Polls without new data are retried after an interval
+    that doubles up to the cadence. Due streams are polled concurrently over
+    the pooled connections of one py_noaa.client.Client.
+
+    Arguments:
+    streams -- streams to follow, list of dicts of coops.get_data() arguments
+               without begin_date and end_date, e.g. {'stationid': '9447130',
+               'product': 'water_level', 'datum': 'MLLW'}, at most one per
+               station and product (and bin_num for currents)
+    lookback -- data delivered by the first poll of each stream, timedelta
+                (default 1 hour)
+    max_workers -- number of streams polled concurrently, int (default 8)
+    client -- py_noaa.client.Client used to make the requests, a client with
+              a pool of max_workers connections is created if None
+              (default None)
+    min_interval -- shortest interval between two polls of a stream,
+                    timedelta (default 30 seconds)
+    clock -- function returning the current time as a naive GMT datetime
+             (default datetime.utcnow)
+    """
+
+    def __init__(self, streams, lookback=timedelta(hours=1), max_workers=8,
+                 client=None, min_interval=timedelta(seconds=30),
+                 clock=datetime.utcnow):
+        self.lookback = lookback
+        self.max_workers = max_workers
+        self.client = client or Client(pool_size=max_workers)
+        self._own_client = client is None
+        self.min_interval = min_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        now = clock()
+        self.states = {}
+        for stream in streams:
+            unknown = set(stream) - set(STREAM_ARGUMENTS)
+            if unknown:
+                raise ValueError('Unknown stream arguments %s'
+                                 % sorted(unknown))
+            key = stream_key(stream)
+            if key in self.states:
+                raise ValueError('Duplicate stream %s, streams of a station '
+                                 'and product must differ in bin_num'
+                                 % (key,))
+            self.states[key] = StreamState(dict(stream), now)
+
+    def close(self):
+        """Close the client if it was created by the follower."""
+        if self._own_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def last_seen(self):
+        """Latest date_time delivered for each stream key."""
+        return {key: state.last_seen for key, state in self.states.items()}
+
+    @property
+    def errors(self):
+        """Error of the last poll of each stream key whose last poll failed."""
+        return {key: state.error for key, state in self.states.items()
+                if state.error is not None}
+
+    def next_due(self):
+        """Return the time at which the next stream is due to be polled."""
+        return min(state.due for state in self.states.values())
+
+    def fetch(self, state, now):
+        """Return the rows of a stream newer than its last delivered row."""
+        stream = state.stream
+        if state.last_seen is None:
+            begin = now - self.lookback
+        else:
+            begin = state.last_seen.to_pydatetime()
+        # Stations in local time zones may be ahead of GMT
+        end = now if stream.get('time_zone', 'gmt') == 'gmt' else \
+            now + timedelta(days=1)
+
+        data_urls, num_request_blocks = coops.build_block_urls(
+            begin.strftime('%Y%m%d %H:%M'), end.strftime('%Y%m%d %H:%M'),
+            **stream)
+        dfs = []
+        for data_url in data_urls:
+            # No new data is answered with a "No data was found" error,
+            # which is only returned as an empty block for multi-block
+            # requests
+            df = coops.url2pandas(data_url, stream['product'],
+                                  max(num_request_blocks, 2), self.client)
+            if not df.empty:
+                dfs.append(df)
+
+        df = coops.concat_blocks(dfs)
+        if df.empty:
+            return df
+        df = coops.normalize_columns(df, stream['product'])
+        df = df.set_index('date_time').sort_index()
+        df = df[~df.index.duplicated(keep='last')]
+        if state.last_seen is not None:
+            df = df[df.index > state.last_seen]
+        # Datum and units of the data, see py_noaa.datums.convert()
+        df.attrs.update(datum=stream.get('datum'),
+                        units=stream.get('units', 'metric'))
+
+        return df
+
+    def _schedule(self, state, df, now):
+        if df.empty:
+            state.misses += 1
+            retry = max(self.min_interval, state.cadence / 8) * \
+                2 ** (state.misses - 1)
+            state.due = now + min(retry, state.cadence)
+            return
+
+        state.misses = 0
+        state.last_seen = df.index[-1]
+        delay = timedelta(0)
+        if state.stream.get('time_zone', 'gmt') == 'gmt':
+            # Each delay overestimates the publication delay by the time
+            # between the publication and the poll, the smallest recent one
+            # is the closest
+            state.delays.append(max(now - state.last_seen.to_pydatetime(),
+                                    timedelta(0)))
+            delay = min(state.delays)
+        state.due = max(now + self.min_interval,
+                        state.last_seen + state.cadence + delay)
+
+    def poll(self, force=False):
+        """
+        Poll the streams that are due (all streams if force is True) and
+        return a list of (stream key, dataframe of new rows) for the streams
+        with new rows. A stream whose request fails is retried as after a
+        poll without new data, its error is kept in errors.
+        """
+        now = self.clock()
+        states = [state for state in self.states.values()
+                  if force or state.due <= now]
+
+        def poll_stream(state):
+            try:
+                df = self.fetch(state, now)
+                state.error = None
+            except Exception as error:
+                df = pd.DataFrame()
+                state.error = error
+            with self._lock:
+                self._schedule(state, df, now)
+            return df
+
+        if len(states) <= 1 or self.max_workers <= 1:
+            dfs = [poll_stream(state) for state in states]
+        else:
+            with ThreadPoolExecutor(
+                    max_workers=min(self.max_workers, len(states))) \
+                    as executor:
+                dfs = list(executor.map(poll_stream, states))
+
+        return [(stream_key(state.stream), df)
+                for state, df in zip(states, dfs) if not df.empty]
+
+    def follow(self, sleep=time.sleep):
+        """
+        Poll the streams forever, sleeping until the next stream is due, and
+        yield (stream key, dataframe of new rows) as new rows arrive.
+        """
+        while True:
+            for key, df in self.poll():
+                yield key, df
+            wait = (self.next_due() - self.clock()).total_seconds()
+            if wait > 0:
+                sleep(wait)
+
+    def run(self, callback, sleep=time.sleep):
+        """
+        Poll the streams forever, calling callback(stream key, dataframe of
+        new rows) as new rows arrive.
+        """
+        for key, df in self.follow(sleep):
+            callback(key, df)
@@ -0,0 +1,312 @@
+"""
+Local stand-in for the NOAA CO-OPS API datagetter endpoint, serving
+synthetic data, for testing and benchmarking code that uses py_noaa without
+network access.
+
+Example:
+    with StandInServer(latency=0.05) as server:
+        coops.API_URL = server.api_url
+        df = coops.get_data('20150101', '20151231', '9447130', 'water_level',
+                            datum='MLLW')
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from py_noaa.coops import NO_DATA_MESSAGE, parse_known_date_formats
+from py_noaa.datums import DATUM_PRODUCTS
+
+# Fields returned for each product, as (field, generator) pairs. Generators
+# take the array of times (in hours since the epoch) and return an array of
+# strings.
+
+
+def _tide(hours):
+    """Mixed semidiurnal tide-like signal."""
+    return (1.5 + 1.2 * np.cos(2 * np.pi * hours / 12.42) +
+            0.6 * np.cos(2 * np.pi * hours / 23.93))
+
+
+def _values(fmt, func):
+    return lambda hours: np.char.mod(fmt, func(hours))
+
+
+def _constant(value):
+    return lambda hours: np.full(len(hours), value)
+
+
+WATER_LEVEL = _values('%.3f', _tide)
+SIGMA = _values('%.3f', lambda hours: 0.01 + 0.005 * np.sin(hours))
+SPEED = _values('%.2f', lambda hours: 30 + 20 * np.sin(
+    2 * np.pi * hours / 12.42))
+DIRECTION = _values('%.2f', lambda hours: 180 + 90 * np.sign(np.sin(
+    2 * np.pi * hours / 12.42)))
+COMPASS = lambda hours: np.where(  # noqa: E731
+    np.sin(2 * np.pi * hours / 12.42) > 0, 'WSW', 'ENE')
+
+PRODUCT_FIELDS = {
+    'water_level': [('t', None), ('v', WATER_LEVEL), ('s', SIGMA),
+                    ('f', _constant('0,0,0,0')), ('q', _constant('v'))],
+    'hourly_height': [('t', None), ('v', WATER_LEVEL), ('s', SIGMA),
+                      ('f', _constant('0,0'))],
+    'high_low': [('t', None), ('v', WATER_LEVEL), ('ty', None),
+                 ('f', _constant('0,0'))],
+    'one_minute_water_level': [('t', None), ('v', WATER_LEVEL)],
+    'predictions': [('t', None), ('v', WATER_LEVEL)],
+    'currents': [('t', None), ('s', SPEED), ('d', DIRECTION), ('b', None)],
+    'wind': [('t', None), ('s', SPEED), ('d', DIRECTION), ('dr', COMPASS),
+             ('g', _values('%.2f', lambda hours: 40 + 20 * np.sin(hours))),
+             ('f', _constant('0,0'))],
+    'air_pressure': [('t', None),
+                     ('v', _values('%.1f', lambda hours: 1013 + 5 * np.sin(
+                         2 * np.pi * hours / 100))),
+                     ('f', _constant('0,0,0'))],
+    'air_temperature': [('t', None),
+                        ('v', _values('%.1f', lambda hours: 12 + 5 * np.sin(
+                            2 * np.pi * hours / 24))),
+                        ('f', _constant('0,0,0'))],
+    'water_temperature': [('t', None),
+                          ('v', _values('%.1f', lambda hours: 10 + np.sin(
+                              2 * np.pi * hours / 24))),
+                          ('f', _constant('0,0,0'))],
+    'conductivity': [('t', None), ('v', _values('%.2f', _tide)),
+                     ('f', _constant('0,0,0'))],
+    'humidity': [('t', None), ('v', _values('%.1f', lambda hours: 70 + 0 *
+                                            hours)),
+                 ('f', _constant('0,0,0'))],
+    'visibility': [('t', None), ('v', _values('%.1f', lambda hours: 10 + 0 *
+                                              hours)),
+                   ('f', _constant('0,0,0'))],
+    'salinity': [('t', None), ('s', _values('%.2f', _tide)),
+                 ('g', _values('%.4f', lambda hours: 1.02 + 0 * hours))],
+}
+
+# Max number of days in one request for 6-minute, hourly, high/low and
+# 1-minute data (10 years for hourly and high/low predictions). Products that
+# require a datum are py_noaa.datums.DATUM_PRODUCTS.
+MAX_DAYS = {'6min': 31, 'h': 365, 'hilo': 365, '1min': 4}
+MAX_PREDICTIONS_DAYS = 3650
+
+
+def synthetic_columns(product, times, bin_num=None, hilo=False):
+    """
+    Return the field names and the columns (arrays of strings, as returned by
+    the API) of synthetic data for a product at the given times
+    (pandas.DatetimeIndex). hilo adds the type field of high/low
+    predictions.
+    """
+    hours = (times - pd.Timestamp(0)).total_seconds().values / 3600.
+    fields = []
+    columns = []
+    for field, generator in PRODUCT_FIELDS[product]:
+        fields.append(field)
+        if field == 't':
+            columns.append(np.char.replace(
+                times.values.astype('datetime64[m]').astype(str), 'T', ' '))
+        elif field == 'ty':
+            columns.append(np.resize(['HH', 'L ', 'H ', 'LL'], len(times)))
+        elif field == 'b':
+            columns.append(np.full(len(times), str(bin_num)))
+        else:
+            columns.append(generator(hours))
+    if product == 'predictions' and hilo:
+        fields.append('type')
+        columns.append(np.resize(['H', 'L'], len(times)))
+
+    return fields, columns
+
+
+class StandInServer(object):
+    """
+    Local HTTP server answering NOAA CO-OPS API datagetter requests
+    (format=json or format=csv) with synthetic data for every product
+    supported by coops.get_data(), running in a background thread.
+
+    Like the API, the server answers with an error payload when a datum or
+    bin is missing, when the requested range is longer than the API allows,
+    or when the requested range falls in one of the configured gaps
+    ("No data was found..." error).
+
+    Arguments:
+    latency -- delay in seconds before each response, float or a callable
+               taking the dict of query parameters (default 0)
+    gaps -- list of (begin, end) datetime ranges without data (default None)
+    host -- address to listen on, string (default 127.0.0.1)
+    port -- port to listen on, 0 picks a free port, int (default 0)
+    cache -- keep the response to each distinct request in memory, so that
+             repeated requests are answered without generating the data
+             again (e.g. when benchmarking the client), bool (default False)
+
+    Attributes:
+    api_url -- URL of the datagetter endpoint, to use as coops.API_URL
+    requests -- number of requests served
+    bytes_sent -- number of response bytes served
+    """
+
+    def __init__(self, latency=0, gaps=None, host='127.0.0.1', port=0,
+                 cache=False):
+        self.latency = latency
+        self.gaps = list(gaps or [])
+        self.cache = {} if cache else None
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep connections alive
+
+            def do_GET(self):
+                query = urlparse(self.path).query
+                parameters = dict(parse_qsl(query))
+                if server.cache is None:
+                    content_type, body = server.respond(parameters)
+                elif query in server.cache:
+                    content_type, body = server.cache[query]
+                else:
+                    content_type, body = server.respond(parameters)
+                    server.cache[query] = content_type, body
+
+                latency = server.latency
+                if callable(latency):
+                    latency = latency(parameters)
+                if latency:
+                    time.sleep(latency)
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass  # Keep test and benchmark output quiet
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        host, port = self._server.server_address[:2]
+        self.api_url = 'http://%s:%d/api/datagetter' % (host, port)
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, parameters):
+        """Return the content type and body of the response to a request."""
+        csv = parameters.get('format') == 'csv'
+        try:
+            fields, columns = self.columns(parameters)
+        except ValueError as error:
+            if csv:
+                return 'text/csv', ('Error: %s\n' % error).encode('utf-8')
+            return 'application/json', json.dumps(
+                {'error': {'message': str(error)}}).encode('utf-8')
+
+        if csv:
+            # Quote values with commas, e.g. the "0,0,0" flags
+            columns = [np.char.add(np.char.add('"', column), '"')
+                       if ',' in column[0] else column for column in columns]
+            lines = [', '.join(fields)]
+            lines.extend(', '.join(row) for row in zip(*columns))
+            return 'text/csv', ('\n'.join(lines) + '\n').encode('utf-8')
+
+        # Written the way the API writes it: {"t":"...", "v":"...", ...}
+        template = '{' + ', '.join('"%s":"%%s"' % field
+                                   for field in fields) + '}'
+        body = ',\n'.join(template % row for row in zip(*columns))
+        if parameters['product'] == 'predictions':
+            prefix = '{"predictions": ['
+        else:
+            prefix = ('{"metadata": {"id":"%s", "name":"Stand-in", '
+                      '"lat":"47.6026", "lon":"-122.3393"}, "data": [' %
+                      parameters['station'])
+        return 'application/json', (prefix + body + ']}').encode('utf-8')
+
+    def columns(self, parameters):
+        """
+        Return the field names and the columns (arrays of strings) of the data
+        for a request, raise ValueError with the API error message if the
+        request is invalid or has no data.
+        """
+        product = parameters.get('product')
+        if product not in PRODUCT_FIELDS:
+            raise ValueError('Wrong Product')
+        if product in DATUM_PRODUCTS and not parameters.get('datum'):
+            raise ValueError('Wrong Datum: Datum cannot be null or empty')
+        if product == 'currents' and not parameters.get('bin'):
+            raise ValueError('Bin cannot be null or empty')
+
+        begin = parse_known_date_formats(parameters['begin_date'])
+        end = parse_known_date_formats(parameters['end_date'])
+        if ':' not in parameters['end_date']:
+            end += timedelta(hours=23, minutes=59)  # Whole end day
+
+        interval = parameters.get('interval')
+        if product == 'hourly_height' or interval == 'h':
+            step, kind = timedelta(hours=1), 'h'
+        elif product == 'high_low' or interval == 'hilo':
+            step, kind = None, 'hilo'
+        elif product == 'one_minute_water_level':
+            step, kind = timedelta(minutes=1), '1min'
+        else:
+            step, kind = timedelta(minutes=6), '6min'
+
+        max_days = MAX_DAYS[kind]
+        if product == 'predictions' and kind != '6min':
+            max_days = MAX_PREDICTIONS_DAYS
+        if (end - begin).days > max_days:
+            raise ValueError(
+                'The supported Date Range for %s data is up to %d days'
+                % (kind, max_days))
+
+        if step is None:
+            times = self.extrema_times(begin, end)
+        else:
+            first = begin + (datetime.min - begin) % step
+            times = pd.date_range(first, end, freq=step)
+        for gap_begin, gap_end in self.gaps:
+            times = times[(times < gap_begin) | (times > gap_end)]
+        if len(times) == 0:
+            raise ValueError(NO_DATA_MESSAGE)
+
+        return synthetic_columns(product, times, parameters.get('bin'),
+                                 hilo=kind == 'hilo')
+
+    @staticmethod
+    def extrema_times(begin, end):
+        """Times of the four daily high/low waters between begin and end."""
+        first_day = pd.Timestamp(begin).normalize()
+        days = pd.date_range(first_day, end, freq='D')
+        offsets = pd.to_timedelta([3.2, 9.4, 15.6, 21.8], unit='h').round(
+            'min')
+        times = pd.DatetimeIndex(
+            (days.values[:, None] + offsets.values[None, :]).ravel())
+        return times[(times >= begin) & (times <= end)]
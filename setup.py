@@ -13,11 +13,17 @@ setup(name='py_noaa',
           'Intended Audience :: Science/Research',
           'Topic :: Scientific/Engineering',
           'License :: OSI Approved :: MIT License',
-          'Programming Language :: Python :: 2.7',
-          'Programming Language :: Python :: 3.5',
-          'Programming Language :: Python :: 3.6',
+          'Programming Language :: Python :: 3',
+          'Programming Language :: Python :: 3.7',
+          'Programming Language :: Python :: 3.8',
+          'Programming Language :: Python :: 3.9',
+          'Programming Language :: Python :: 3.10',
+          'Programming Language :: Python :: 3.11',
       ],
       packages=['py_noaa'],
-      install_requires=['requests', 'numpy', 'pandas'],
+      python_requires='>=3.7',
+      install_requires=['requests', 'numpy', 'pandas>=1.0'],
+      extras_require={'parquet': ['pyarrow'], 'async': ['aiohttp']},
+      entry_points={'console_scripts': ['py_noaa=py_noaa.cli:main']},
       zip_safe=False)
       
@@ -0,0 +1,125 @@
+"""Offline stand-ins for the NOAA CO-OPS API used by the test suite."""
+from __future__ import absolute_import
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from py_noaa import coops
+from py_noaa.coops import NO_DATA_MESSAGE
+from py_noaa.testing import StandInServer
+
+
+def synthetic_rows(params, step=timedelta(minutes=6)):
+    """Build water-level style rows covering a query's begin/end dates."""
+    fmt = '%Y%m%d %H:%M' if ':' in params['begin_date'] else '%Y%m%d'
+    begin = datetime.strptime(params['begin_date'], fmt)
+    end = datetime.strptime(params['end_date'], fmt)
+    rows = []
+    t = begin + (datetime.min - begin) % step  # Aligned like the API's data
+    while t <= end:
+        rows.append({'t': t.strftime('%Y-%m-%d %H:%M'), 'v': '1.000',
+                     's': '0.010', 'f': '0,0,0,0', 'q': 'v'})
+        t += step
+    return rows
+
+
+class FakeResponse(object):
+    def __init__(self, payload, status_code=200):
+        self.content = json.dumps(payload).encode('utf-8')
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError('%d Error' % self.status_code)
+
+
+class FakeMetadataAPI(object):
+    """
+    Records requested Metadata API URLs and answers each with the payload of
+    the first route (URL substring) it contains, or with the default payload
+    (a 404 if None).
+    """
+
+    def __init__(self):
+        self.urls = []
+        self.routes = {}  # URL substring -> payload
+        self.default = None
+
+    def get(self, url, *args, **kwargs):
+        self.urls.append(url)
+        for part, payload in self.routes.items():
+            if part in url:
+                return FakeResponse(payload)
+        if self.default is None:
+            return FakeResponse({}, 404)
+        return FakeResponse(self.default)
+
+
+class FakeCoopsAPI(object):
+    """Records requested URLs and answers them with synthetic data."""
+
+    def __init__(self):
+        self.urls = []
+        self.gaps = set()  # begin_date values answered with "No data"
+        self.bad_stations = set()  # stations answered with an error
+        self.delay = None  # callable(params) -> seconds to sleep
+        self.step = timedelta(hours=1)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def params(self, url):
+        return {k: v[0] for k, v in parse_qs(urlparse(url).query).items()}
+
+    def get(self, url, *args, **kwargs):
+        params = self.params(url)
+        with self._lock:
+            self.urls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay is not None:
+                time.sleep(self.delay(params))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if params['station'] in self.bad_stations:
+            return FakeResponse({'error': {'message': 'Wrong Station ID'}})
+        if params['begin_date'] in self.gaps:
+            return FakeResponse({'error': {'message': NO_DATA_MESSAGE}})
+        return FakeResponse({'data': synthetic_rows(params, self.step)})
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    api = FakeCoopsAPI()
+    monkeypatch.setattr(requests, 'get', api.get)
+    monkeypatch.setattr(requests.Session, 'get',
+                        lambda session, url, **kwargs: api.get(url, **kwargs))
+    return api
+
+
+@pytest.fixture
+def metadata_api(monkeypatch):
+    api = FakeMetadataAPI()
+    monkeypatch.setattr(requests, 'get', api.get)
+    monkeypatch.setattr(requests.Session, 'get',
+                        lambda session, url, **kwargs: api.get(url, **kwargs))
+    return api
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandInServer() as server:
+        monkeypatch.setattr(coops, 'API_URL', server.api_url)
+        yield server
@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+
+from py_noaa import aggregate, coops
+from py_noaa.aggregate import Aggregator, QuantileSketch
+
+import pytest
+
+
+def test_quantile_sketch():
+    values = np.random.RandomState(0).normal(size=10000)
+
+    # Exact while the values fit in the sketch
+    small = QuantileSketch(size=100)
+    small.add(values[:50])
+    assert small.quantile(0.3) == pytest.approx(np.quantile(values[:50], 0.3))
+
+    # Merged sketches stay within about 1 / size in rank
+    sketches = [QuantileSketch(size=100) for _ in range(10)]
+    for sketch, chunk in zip(sketches, np.split(values, 10)):
+        sketch.add(chunk)
+    merged = QuantileSketch(size=100)
+    for sketch in sketches:
+        merged.merge(sketch)
+    assert merged.count == 10000
+    for q in (0.05, 0.5, 0.95):
+        rank = (values < merged.quantile(q)).mean()
+        assert abs(rank - q) < 0.02
+
+
+def test_aggregator_matches_resample():
+    index = pd.date_range('2015-01-01', '2015-03-31 23:54', freq='6min')
+    df = pd.DataFrame({'water_level': np.sin(np.arange(len(index)) / 20.0)},
+                      index=index)
+    df.iloc[100:200] = np.nan
+
+    # Blocks split buckets, and are added out of order
+    aggregator = Aggregator('D', stats=('min', 'max', 'mean', 'count'))
+    for block in reversed(np.array_split(df, 7)):
+        aggregator.add(block)
+    result = aggregator.result()
+
+    expected = df.resample('D')['water_level'].agg(
+        ['min', 'max', 'mean', 'count'])
+    pd.testing.assert_frame_equal(result['water_level'], expected,
+                                  check_names=False, check_freq=False)
+
+
+def test_aggregate_data(stand_in):
+    df = aggregate.aggregate_data(
+        '20150101', '20150331', '9447130', 'water_level', 'M',
+        stats=('max', 'count'), quantiles=(0.5,), columns=['water_level'],
+        datum='MLLW', max_workers=2)
+
+    raw = coops.get_data('20150101', '20150331', '9447130', 'water_level',
+                         datum='MLLW', layout='long')
+    assert df.attrs['source'] == ('water_level', None)
+    assert list(df.columns) == [('water_level', 'max'),
+                                ('water_level', 'count'),
+                                ('water_level', 'q0.5')]
+    assert len(df) == 3
+    # Every 6-minute value is aggregated, not only the hourly values
+    assert df[('water_level', 'count')].sum() > len(raw) * 5
+
+
+def test_aggregate_data_requests_coarser_data(stand_in):
+    kwargs = dict(begin_date='20150101', end_date='20151231',
+                  stationid='9447130', product='water_level', freq='M',
+                  stats=('mean',), datum='MLLW')
+    df = aggregate.aggregate_data(interval='auto', **kwargs)
+
+    assert df.attrs['source'] == ('hourly_height', None)
+    assert stand_in.requests == 1
+    assert len(df) == 12
+
+    # Coarser data is only requested on demand, and only approximates the
+    # mean of the 6-minute data
+    df_exact = aggregate.aggregate_data(**kwargs)
+    assert df_exact.attrs['source'] == ('water_level', None)
+    assert (df - df_exact).abs().max().max() < 0.01
+
+    assert aggregate.choose_source('wind', 'auto', 'D', ('mean',), ()) == \
+        ('wind', 'h')
+    assert aggregate.choose_source('wind', 'auto', 'H', ('mean',), ()) == \
+        ('wind', None)
+    assert aggregate.choose_source('wind', 'auto', 'D', ('max',), ()) == \
+        ('wind', None)
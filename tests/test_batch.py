@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+
+import time
+
+from py_noaa import batch, coops
+
+
+def test_batch_isolates_failing_jobs(fake_api):
+    fake_api.bad_stations.add('0000000')
+    fake_api.delay = lambda params: 0.02
+    jobs = [dict(begin_date='20150101', end_date='20150601',
+                 stationid=stationid, product='water_level', datum='MLLW')
+            for stationid in ('9447130', '0000000', '9443090')]
+    jobs.append(dict(begin_date='20150101', end_date='20150201',
+                     stationid='9447130', product='water_level'))  # No datum
+
+    result = batch.get_batch(jobs, max_workers=6, max_per_host=3)
+
+    assert len(result) == 4
+    assert fake_api.max_in_flight <= 3
+    assert result.results[0].data.equals(coops.get_data(**jobs[0]))
+    assert result.results[2].error is None and not result.results[2].data.empty
+    assert [r.job['stationid'] for r in result.errors] == ['0000000', '9447130']
+
+    report = result.error_report()
+    assert list(report['job']) == [1, 3]
+    assert list(report['error_type']) == ['ValueError', 'ValueError']
+    assert report['error'][0] == 'Wrong Station ID'
+
+
+def test_rate_limiter_spaces_requests(fake_api):
+    jobs = [dict(begin_date='20150101', end_date='20150102',
+                 stationid=str(stationid), product='water_level',
+                 datum='MLLW') for stationid in range(6)]
+    start = time.monotonic()
+    result = batch.get_batch(jobs, max_workers=6, requests_per_second=50)
+
+    assert not result.errors
+    assert time.monotonic() - start >= 5 / 50.
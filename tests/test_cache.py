@@ -0,0 +1,112 @@
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+from py_noaa import cache, client, coops, datums
+
+
+def block_url(begin_date, end_date, **kwargs):
+    return coops.build_query_url(begin_date, end_date, '9447130',
+                                 'water_level', datum='MLLW', **kwargs)
+
+
+def test_equivalent_queries_share_a_key():
+    a = cache.normalize_parameters(block_url('20150101', '01/31/2015'))
+    b = cache.normalize_parameters(
+        block_url('20150101 00:00', '20150131 00:00', units='METRIC'))
+    assert cache.cache_key(a) == cache.cache_key(b)
+    assert a != cache.normalize_parameters(block_url('20150101', '20150201'))
+
+
+def test_recent_blocks_expire_and_old_blocks_do_not(tmp_path):
+    response_cache = cache.ResponseCache(str(tmp_path), ttl=60,
+                                         immutable_after=30)
+    now = time.time()
+    assert not response_cache.is_expired('20150131 00:00', 0, now)
+    recent = time.strftime('%Y%m%d %H:%M', time.gmtime(now))
+    assert not response_cache.is_expired(recent, now - 30, now)
+    assert response_cache.is_expired(recent, now - 90, now)
+
+    # A block ending 30.2 days ago in local time may end less than 30 days
+    # ago in GMT
+    local = time.strftime('%Y%m%d %H:%M', time.gmtime(now - 30.2 * 86400))
+    assert not response_cache.is_expired(local, now - 90, now)
+    assert response_cache.is_expired(local, now - 90, now, 'lst_ldt')
+
+
+def test_lru_eviction(tmp_path):
+    response_cache = cache.ResponseCache(str(tmp_path), max_size=25)
+    urls = [block_url('201501%02d' % day, '201501%02d' % (day + 1))
+            for day in (1, 2, 3)]
+    response_cache.put(urls[0], b'0' * 10)
+    response_cache.put(urls[1], b'1' * 10)
+    time.sleep(0.01)
+    assert response_cache.get(urls[0]) == b'0' * 10  # urls[1] is now LRU
+    response_cache.put(urls[2], b'2' * 10)
+
+    assert response_cache.get(urls[1]) is None
+    assert response_cache.get(urls[2]) == b'2' * 10
+    assert response_cache.size() == 20
+    assert response_cache.stats == {
+        'hits': 2, 'misses': 1, 'stores': 3, 'evictions': 1}
+
+
+def test_get_data_reads_through_cache(fake_api, tmp_path):
+    response_cache = cache.ResponseCache(str(tmp_path))
+    kwargs = dict(begin_date="20150101", end_date="20150601",
+                  stationid="9447130", product="water_level", datum="MLLW")
+
+    with client.Client(cache=response_cache) as c:
+        df = coops.get_data(client=c, **kwargs)
+        df_cached = coops.get_data(client=c, **kwargs)
+
+    assert len(fake_api.urls) == 5
+    assert response_cache.stats['hits'] == 5
+    assert df_cached.equals(df)
+    assert not df.empty
+
+
+def test_errors_are_not_cached(fake_api, tmp_path):
+    response_cache = cache.ResponseCache(str(tmp_path))
+    fake_api.bad_stations.add('9447130')
+    fake_api.gaps.add('20150101 00:00')
+    kwargs = dict(begin_date="20150101", end_date="20150110",
+                  stationid="9447130", product="water_level", datum="MLLW")
+
+    with client.Client(cache=response_cache) as c:
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                coops.get_data(client=c, **kwargs)
+        assert len(fake_api.urls) == 2
+        assert response_cache.stats['stores'] == 0
+
+        # "No data" gaps are valid answers and are cached
+        fake_api.bad_stations.clear()
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                coops.get_data(client=c, **kwargs)
+        assert len(fake_api.urls) == 3
+        assert response_cache.stats['stores'] == 1
+
+
+def test_metadata_requests_bypass_the_cache(metadata_api, tmp_path):
+    for stationid, mllw in [('9447130', 1.0), ('8518750', 2.0)]:
+        metadata_api.routes['stations/%s/datums.json' % stationid] = {
+            'datums': [{'name': 'MLLW', 'value': mllw}]}
+    response_cache = cache.ResponseCache(str(tmp_path / 'responses'))
+
+    with client.Client(cache=response_cache) as c:
+        tables = [datums.DatumTable.load(stationid, str(tmp_path / 'datums'),
+                                         client=c)
+                  for stationid in ('9447130', '8518750')]
+
+    assert [table.height('MLLW') for table in tables] == [1.0, 2.0]
+    assert response_cache.stats['stores'] == 0
+
+    # Block requests to different resources do not share an entry
+    url = block_url('20150101', '20150102')
+    response_cache.put(url, b'data')
+    assert response_cache.get(url.replace('datagetter', 'other')) is None
+    assert response_cache.get(url) == b'data'
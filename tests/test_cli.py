@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+import os
+import subprocess
+import sys
+
+from py_noaa import cli, coops
+
+import pandas as pd
+
+
+def test_import_does_not_load_pandas():
+    code = ('import sys, py_noaa, py_noaa.cli; '
+            'print(sorted({"pandas", "requests"} & set(sys.modules)))')
+    assert subprocess.check_output(
+        [sys.executable, '-c', code]).decode().strip() == '[]'
+
+
+def test_export_csv(stand_in, tmp_path, capsys):
+    args = ['export', '9447130', '9443090', '--product', 'water_level',
+            '--datum', 'MLLW', '--begin', '20150101', '--end', '20150315',
+            '--output-dir', str(tmp_path)]
+    assert cli.main(args) == 0
+
+    assert sorted(os.listdir(str(tmp_path))) == [
+        '9443090_water_level_20150101_20150315.csv',
+        '9447130_water_level_20150101_20150315.csv']
+    df = pd.read_csv(
+        str(tmp_path / '9447130_water_level_20150101_20150315.csv'),
+        index_col='date_time', parse_dates=True)
+    expected = coops.get_data('20150101', '20150315', '9447130',
+                              'water_level', datum='MLLW')
+    pd.testing.assert_frame_equal(df, expected, check_freq=False)
+    assert '9447130: %d rows written' % len(df) in capsys.readouterr().out
+
+    # A failing station is reported and sets the exit status
+    assert cli.main(['export', '9447130', '--product', 'water_level',
+                     '--begin', '20150101', '--end', '20150102',
+                     '--output-dir', str(tmp_path)]) == 1
+    assert 'No datum specified' in capsys.readouterr().err
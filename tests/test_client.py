@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+
+import pytest
+import requests
+
+from py_noaa import client, coops
+
+
+def make_response(status_code, headers=None):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b'{}'
+    return response
+
+
+class ScriptedSession(requests.Session):
+    """Session answering GET requests from a list of canned outcomes."""
+
+    def __init__(self, outcomes):
+        super(ScriptedSession, self).__init__()
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+
+    def get(self, url, **kwargs):
+        self.timeouts.append(kwargs.get('timeout'))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(client.time, 'sleep', delays.append)
+    return delays
+
+
+def test_client_retries_transient_failures(sleeps):
+    session = ScriptedSession([
+        requests.ConnectionError(), make_response(503),
+        make_response(429, {'Retry-After': '2'}), make_response(200)])
+    with client.Client(session=session, timeout=5, backoff_factor=1) as c:
+        assert c.get('http://example.com').status_code == 200
+
+    assert session.timeouts == [5] * 4
+    assert len(sleeps) == 3
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+    assert sleeps[2] == 2  # Retry-After is honoured
+
+
+def test_client_gives_up_after_max_retries(sleeps):
+    session = ScriptedSession([make_response(500)] * 3)
+    c = client.Client(session=session, max_retries=2)
+    with pytest.raises(requests.HTTPError):
+        c.get('http://example.com')
+    assert len(sleeps) == 2
+
+
+def test_get_data_uses_client_session(fake_api, monkeypatch):
+    monkeypatch.setattr(requests, 'get', None)  # must not be used
+    with client.Client(pool_size=4) as c:
+        df = coops.get_data("20150101", "20150601", "9447130", "water_level",
+                            datum="MLLW", max_workers=4, client=c)
+    assert len(fake_api.urls) == 5
+    assert df.index.is_monotonic_increasing
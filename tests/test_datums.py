@@ -0,0 +1,91 @@
+from __future__ import absolute_import
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from py_noaa import batch, coops, datums, store
+
+DATUMS = {'datums': [{'name': 'STND', 'value': 0.0},
+                     {'name': 'MLLW', 'value': 1.0},
+                     {'name': 'MSL', 'value': 2.0},
+                     {'name': 'NAVD88', 'value': 1.5},
+                     {'name': 'GT', 'value': 2.5}]}
+
+
+def test_datum_table_is_cached(metadata_api, tmp_path):
+    metadata_api.routes['datums.json'] = DATUMS
+
+    table = datums.DatumTable.load('9447130', str(tmp_path))
+    assert 'stations/9447130/datums.json?units=metric' in \
+        metadata_api.urls[0]
+    assert 'GT' not in table.datums
+    assert table.offset('MLLW', 'NAVD') == pytest.approx(-0.5)
+    with pytest.raises(ValueError):
+        table.height('IGLD')
+
+    datums.DatumTable.load('9447130', str(tmp_path))
+    assert len(metadata_api.urls) == 1
+
+
+def test_convert():
+    table = datums.DatumTable('9447130', datums.parse_datums(DATUMS))
+    df = pd.DataFrame({'water_level': [0.5, 1.25], 'sigma': [0.01, 0.02],
+                       'flags': ['0,0,0,0', '0,0,0,0']},
+                      index=pd.date_range('2015-01-01', periods=2, freq='H'))
+    df.attrs.update(datum='MLLW', units='metric')
+
+    navd = table.convert(df, 'NAVD')
+    assert navd['water_level'].tolist() == [0.0, 0.75]
+    assert navd['sigma'].tolist() == [0.01, 0.02]
+    assert navd.attrs['datum'] == 'NAVD'
+    assert df['water_level'].tolist() == [0.5, 1.25]
+
+    english = table.convert(navd, units='english')
+    assert english['water_level'].tolist() == [0.0, 2.461]
+    assert english['sigma'].tolist() == [0.033, 0.066]
+
+    # Round trip back to the original datum and units
+    back = table.convert(english, 'MLLW', 'metric')
+    assert back['water_level'].tolist() == [0.5, 1.25]
+
+    # The datum of a frame without attrs must be given
+    with pytest.raises(ValueError):
+        table.convert(pd.DataFrame({'water_level': [1.0]}), 'MSL')
+
+
+def test_all_data_paths_record_datum_and_units(fake_api):
+    table = datums.DatumTable('9447130', datums.parse_datums(DATUMS))
+    kwargs = dict(begin_date="20150101", end_date="20150301",
+                  stationid="9447130", product="water_level", datum="MLLW",
+                  units="english")
+    frames = [coops.get_data(**kwargs)] + list(coops.iter_data(**kwargs)) + \
+        [batch.get_batch([kwargs]).results[0].data]
+
+    for df in frames:
+        assert (df.attrs['datum'], df.attrs['units']) == ('MLLW', 'english')
+        navd = table.convert(df, 'NAVD', 'metric')
+        # 1 ft above MLLW is 0.3048 - 0.5 m above NAVD
+        assert (navd['water_level'] == -0.195).all()
+
+
+def test_canonical_store_holds_one_copy(fake_api, tmp_path):
+    station_store = store.StationStore(str(tmp_path), canonical=True)
+    station_store.datum_tables['9447130'] = datums.DatumTable(
+        '9447130', datums.parse_datums(DATUMS))
+    kwargs = dict(stationid="9447130", product="hourly_height")
+
+    mllw = coops.get_data("20150101", "20150201", datum="MLLW",
+                          store=station_store, **kwargs)
+    assert len(fake_api.urls) == 1
+    assert 'datum=STND' in fake_api.urls[0]
+    assert mllw.attrs['datum'] == 'MLLW'
+    assert (mllw['water_level'] == 0.0).all()  # 1 m above STND
+
+    navd = coops.get_data("20150101", "20150201", datum="NAVD",
+                          units="english", store=station_store, **kwargs)
+    assert len(fake_api.urls) == 1
+    assert navd.index[-1] == datetime(2015, 2, 1)
+    assert (navd['water_level'] == -1.64).all()
+    assert (navd['sigma'] == 0.033).all()
@@ -0,0 +1,136 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from py_noaa import datums, harmonic
+
+HARCON = {'HarmonicConstituents': [
+    {'number': 1, 'name': 'M2', 'amplitude': 1.0, 'phase_GMT': 10.0,
+     'speed': 28.984104},
+    {'number': 4, 'name': 'K1', 'amplitude': 0.5, 'phase_GMT': 200.0,
+     'speed': 15.041069},
+    {'number': 6, 'name': 'O1', 'amplitude': 0.3, 'phase_GMT': 180.0,
+     'speed': 13.943035},
+    {'number': 17, 'name': 'S1', 'amplitude': 0.0, 'phase_GMT': 0.0,
+     'speed': 15.0}]}
+DATUMS = {'datums': [{'name': 'MLLW', 'value': 1.0},
+                     {'name': 'MSL', 'value': 3.0},
+                     {'name': 'NAVD88', 'value': 2.5}]}
+
+
+@pytest.fixture
+def station_metadata(metadata_api):
+    metadata_api.routes.update({'harcon.json': HARCON, 'datums.json': DATUMS})
+    return metadata_api
+
+
+def test_node_factors_stay_in_range():
+    times = pd.date_range('2000-07-02', periods=19, freq='365D').values
+    factors = harmonic.base_node_factors(
+        harmonic.astronomical_arguments(times))
+
+    # Ranges of Schureman's tables over a nodal cycle
+    for name, low, high in [('M2', 0.963, 1.038), ('O1', 0.806, 1.184),
+                            ('K1', 0.882, 1.113), ('K2', 0.748, 1.317)]:
+        f, u = factors[name]
+        assert low - 0.002 < f.min() and f.max() < high + 0.002
+
+
+# Speeds (degrees per hour) of the 37 constituents as published by NOAA
+NOAA_SPEEDS = {
+    'M2': 28.9841042, 'S2': 30.0, 'N2': 28.4397295, 'K1': 15.0410686,
+    'M4': 57.9682084, 'O1': 13.9430356, 'M6': 86.9523127, 'MK3': 44.0251729,
+    'S4': 60.0, 'MN4': 57.4238337, 'NU2': 28.5125831, 'S6': 90.0,
+    'MU2': 27.9682084, '2N2': 27.8953548, 'OO1': 16.1391017,
+    'LAM2': 29.4556253, 'S1': 15.0, 'M1': 14.4966939, 'J1': 15.5854433,
+    'MM': 0.5443747, 'SSA': 0.0821373, 'SA': 0.0410686, 'MSF': 1.0158958,
+    'MF': 1.0980331, 'RHO': 13.4715145, 'Q1': 13.3986609, 'T2': 29.9589333,
+    'R2': 30.0410667, '2Q1': 12.8542862, 'P1': 14.9589314,
+    '2SM2': 31.0158958, 'M3': 43.4761563, 'L2': 29.5284789,
+    '2MK3': 42.9271398, 'K2': 30.0821373, 'M8': 115.9364166,
+    'MS4': 58.9841042}
+
+def test_constituent_speeds_match_noaa():
+    assert sorted(NOAA_SPEEDS) == sorted(harmonic.CONSTITUENTS)
+    for name, speed in NOAA_SPEEDS.items():
+        assert harmonic.RATES.dot(harmonic.CONSTITUENTS[name][0]) == \
+            pytest.approx(speed, abs=1e-6)
+
+
+def test_nodal_terms_match_schureman():
+    times = pd.date_range('1997-01-01', '2016-12-31', freq='D').values
+    arguments = harmonic.astronomical_arguments(times)
+
+    # Ranges over a nodal cycle (Schureman, table 6)
+    assert arguments['I'].min() == pytest.approx(18.307, abs=0.001)
+    assert arguments['I'].max() == pytest.approx(28.597, abs=0.001)
+    assert arguments['nu'].max() == pytest.approx(13.02, abs=0.01)
+    assert arguments['xi'].max() == pytest.approx(11.98, abs=0.01)
+
+    # The lunar node is at 0 degrees in June 2006 and 180 degrees in October
+    # 2015, node factors are those of Schureman's table 14
+    factors = harmonic.base_node_factors(harmonic.astronomical_arguments(
+        np.array(['2006-06-20', '2015-10-10'], dtype='datetime64[ns]')))
+    for name, expected in [('M2', (0.963, 1.038)), ('O1', (1.183, 0.806)),
+                           ('K1', (1.113, 0.882)), ('K2', (1.317, 0.748))]:
+        f, u = factors[name]
+        np.testing.assert_allclose(f, expected, atol=0.002)
+        np.testing.assert_allclose(u, 0, atol=0.01)
+
+
+def test_predictions(station_metadata, tmp_path):
+    cache_dir = str(tmp_path)
+    df = harmonic.get_predictions('20150101', '20150131', '9447130', 'MLLW',
+                                  cache_dir=cache_dir)
+    hilo = harmonic.get_predictions('20150101', '20150131', '9447130',
+                                    'MLLW', interval='hilo',
+                                    cache_dir=cache_dir)
+    assert len(station_metadata.urls) == 2  # The constants are fetched once
+
+    assert list(df.columns) == ['predicted_wl']
+    assert df.index.name == 'date_time'
+    assert df.index[0] == pd.Timestamp('2015-01-01')
+    assert (df.index[1:] - df.index[:-1] == pd.Timedelta('6min')).all()
+    # Heights are centred on MSL, 2 m above MLLW
+    assert abs(df['predicted_wl'].mean() - 2.0) < 0.05
+    assert df['predicted_wl'].max() < 2.0 + 1.8
+
+    assert list(hilo.columns) == ['predicted_wl', 'hi_lo']
+    assert (hilo['hi_lo'].values[1:] != hilo['hi_lo'].values[:-1]).all()
+    # Extrema match 1-minute predictions around them
+    constants = harmonic.HarmonicConstants.load('9447130',
+                                                cache_dir=cache_dir)
+    for date_time, row in hilo.iloc[:10].iterrows():
+        around = pd.date_range(date_time - pd.Timedelta('30min'),
+                               date_time + pd.Timedelta('30min'), freq='min')
+        heights = constants.predict(around, 'MLLW')
+        extreme = around[heights.argmax() if row['hi_lo'] == 'H'
+                         else heights.argmin()]
+        assert extreme == date_time
+
+    navd = constants.predictions('20150101', '20150102', 'NAVD')
+    np.testing.assert_allclose(
+        navd['predicted_wl'].values,
+        df.loc[navd.index, 'predicted_wl'].values - 1.5, atol=1e-3)
+    with pytest.raises(ValueError, match='Datum MHHW is not available'):
+        constants.predict(navd.index, 'MHHW')
+
+
+def test_load_shares_the_datum_table(station_metadata, tmp_path):
+    cache_dir = str(tmp_path)
+    station_metadata.routes['datums.json'] = {
+        'datums': DATUMS['datums'] + [{'name': 'GT', 'value': 2.5}]}
+    datums.DatumTable.load('9447130', cache_dir)
+
+    english = harmonic.HarmonicConstants.load('9447130', 'english',
+                                              cache_dir=cache_dir)
+    assert sum('datums.json' in url for url in station_metadata.urls) == 1
+    assert 'GT' not in english.datums
+    assert english.datum_offset('MLLW') == pytest.approx(2 / 0.3048, 1e-3)
+
+    constants = harmonic.HarmonicConstants.from_payloads(
+        '9447130', {'harcon': HARCON,
+                    'datums': station_metadata.routes['datums.json']})
+    assert 'GT' not in constants.datums
@@ -0,0 +1,50 @@
+from __future__ import absolute_import
+import logging
+from datetime import datetime
+
+from py_noaa import coops
+from py_noaa.metrics import LoggingSink, MemorySink
+
+import pytest
+
+
+def test_block_events_and_summary(stand_in):
+    stand_in.gaps.append((datetime(2015, 2, 1), datetime(2015, 3, 5)))
+    sink = MemorySink()
+
+    df = coops.get_data('20150101', '20150501', '9447130', 'water_level',
+                        datum='MLLW', max_workers=2, metrics=sink)
+
+    events = sink.events
+    assert len(events) == stand_in.requests == 4
+    assert all(event.parameters['product'] == 'water_level'
+               for event in events)
+    assert [event.empty for event in events].count(True) == 1
+    for event in events:
+        assert event.ttfb is not None and event.ttfb <= event.download_time
+        assert event.decode_time > 0
+        assert event.error is None
+        assert (event.rows == 0) == event.empty
+
+    summary = df.attrs['metrics']
+    assert summary['blocks'] == 4
+    assert summary['empty_blocks'] == 1
+    assert summary['bytes'] == stand_in.bytes_sent
+    assert summary['rows'] == sum(event.rows for event in events)
+    assert summary['total_time'] >= summary['format_time'] > 0
+
+
+def test_failed_block_is_reported(stand_in, caplog):
+    stand_in.gaps.append((datetime(2015, 1, 1), datetime(2015, 1, 31)))
+    sink = MemorySink()
+
+    with caplog.at_level(logging.INFO, logger='py_noaa.metrics'):
+        with pytest.raises(ValueError, match='No data was found'):
+            coops.get_data('20150101', '20150110', '9447130', 'water_level',
+                           datum='MLLW', metrics=[sink, LoggingSink()])
+
+    assert len(sink.events) == 1
+    assert isinstance(sink.events[0].error, ValueError)
+    assert sink.summary()['failed_blocks'] == 1
+    assert caplog.records[0].levelno == logging.WARNING
+    assert '9447130 water_level' in caplog.records[0].getMessage()
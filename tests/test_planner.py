@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from datetime import datetime, timedelta
+
+from py_noaa import coops
+from py_noaa.planner import RESOLUTION, RequestPlanner
+
+import pytest
+
+
+@pytest.mark.parametrize('product, interval, window, num_blocks', [
+    ('water_level', None, timedelta(days=31), 12),
+    ('one_minute_water_level', None, timedelta(days=4), 92),
+    ('hourly_height', None, timedelta(days=365), 1),
+    ('predictions', 'hilo', timedelta(days=3650), 1),
+    ('wind', 'h', timedelta(days=365), 1),
+    ('wind', None, timedelta(days=31), 12),
+])
+def test_plan_covers_range_exactly(product, interval, window, num_blocks):
+    begin = datetime(2015, 1, 1, 6, 30)
+    end = datetime(2015, 12, 31, 18, 45)
+    blocks = RequestPlanner().plan(begin, end, product, interval)
+
+    assert len(blocks) == num_blocks
+    assert blocks[0].begin == begin
+    assert blocks[-1].end == end
+    for block, next_block in zip(blocks, blocks[1:]):
+        assert next_block.begin == block.end + RESOLUTION
+    assert all(block.end - block.begin <= window for block in blocks)
+
+
+def test_dry_run_keeps_times_and_requests_nothing(stand_in):
+    plan = coops.get_data('20150101 06:00', '20151231 18:00', '9447130',
+                          'water_level', datum='MLLW', dry_run=True)
+
+    assert stand_in.requests == 0
+    assert list(plan.columns) == ['begin_date', 'end_date', 'url']
+    assert len(plan) == 12
+    assert plan['end_date'].iloc[-1] == datetime(2015, 12, 31, 18)
+    assert 'end_date=20151231+18%3A00' in plan['url'].iloc[-1]
+
+    # The planned blocks are accepted by the API and return each row once
+    df = coops.get_data('20150101 06:00', '20151231 18:00', '9447130',
+                        'water_level', datum='MLLW', max_workers=4)
+    assert stand_in.requests == 12
+    assert df.attrs['metrics']['rows'] == (
+        (datetime(2015, 12, 31, 18) - datetime(2015, 1, 1, 6)) //
+        timedelta(minutes=6) + 1)
+
+
+def test_planner_overrides():
+    planner = RequestPlanner(max_windows={('water_level', None):
+                                          timedelta(days=7)})
+    plan = coops.plan_request('20150101', '20150131', '9447130',
+                              'water_level', datum='MLLW', planner=planner)
+    assert len(plan) == 5
+
+    with pytest.raises(ValueError):
+        planner.plan(datetime(2015, 2, 1), datetime(2015, 1, 1),
+                     'water_level')
@@ -1,7 +1,12 @@
 
 from __future__ import absolute_import
+import asyncio
+import json
+from datetime import datetime
+
 from py_noaa import coops
 
+import pandas as pd
 import pytest
 
 def test_error_handling():
@@ -14,3 +19,216 @@ def test_error_handling():
             datum="navd88", # this is an invalid datum
             units="metric",
             time_zone="gmt")
+
+
+def test_parallel_blocks_keep_chronological_order(fake_api):
+    # Make earlier blocks slower so they complete out of order
+    fake_api.delay = lambda params: 0.05 if params['begin_date'] < '20150301' else 0
+    fake_api.gaps.add('20150201 00:01')
+    kwargs = dict(begin_date="20150101", end_date="20150601",
+                  stationid="9447130", product="water_level", datum="MLLW")
+
+    df_serial = coops.get_data(**kwargs)
+    df_parallel = coops.get_data(max_workers=4, **kwargs)
+
+    assert df_parallel.index.is_monotonic_increasing
+    assert df_parallel.equals(df_serial)
+    # The "No data was found" block is skipped, not raised
+    assert df_parallel.loc['2015-02-02':'2015-03-03', 'water_level'].isna().all()
+
+
+def test_aget_data_matches_get_data(fake_api, monkeypatch):
+    aiohttp = pytest.importorskip('aiohttp')
+    from aiohttp import web
+    kwargs = dict(begin_date="20150101", end_date="20150601",
+                  stationid="9447130", product="water_level", datum="MLLW")
+    api_url = coops.API_URL
+
+    async def datagetter(request):
+        response = fake_api.get(str(request.url))
+        return web.Response(body=response.content,
+                            content_type='text/plain')
+
+    async def fetch():
+        app = web.Application()
+        app.router.add_get('/api/datagetter', datagetter)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        host, port = runner.addresses[0][:2]
+        monkeypatch.setattr(
+            coops, 'API_URL', 'http://%s:%d/api/datagetter' % (host, port))
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await coops.aget_data(
+                    session=session, max_concurrency=2, **kwargs)
+        finally:
+            await runner.cleanup()
+
+    df_async = asyncio.run(fetch())
+    monkeypatch.setattr(coops, 'API_URL', api_url)
+    assert len(fake_api.urls) == 5
+    assert df_async.equals(coops.get_data(**kwargs))
+
+
+def test_concat_blocks_skips_empty_blocks_and_resets_index():
+    blocks = [pd.DataFrame({'t': ['a', 'b']}), pd.DataFrame(),
+              pd.DataFrame({'t': ['c']})]
+    df = coops.concat_blocks(blocks)
+    assert list(df['t']) == ['a', 'b', 'c']
+    assert list(df.index) == [0, 1, 2]
+    assert coops.concat_blocks([pd.DataFrame()]).empty
+
+
+def test_format_data_converts_columns_from_schema():
+    raw = pd.DataFrame({'t': ['2015-01-01 00:00', '2015-01-01 00:06'],
+                        'd': ['255.00', '261.00'], 'dr': ['WSW', 'W'],
+                        'f': ['0,0', '0,0'], 'g': ['5.1', ''],
+                        's': ['3.2', '3.0']})
+    df = coops.format_data(raw, 'wind')
+
+    assert sorted(df.columns) == ['compass', 'dir', 'flags', 'gust_spd', 'spd']
+    assert pd.api.types.is_datetime64_any_dtype(df.index)
+    assert df['dir'].dtype == 'float64' and df['compass'].dtype == object
+    assert pd.isna(df['gust_spd'].iloc[1])
+
+
+def test_high_low_layouts():
+    raw = pd.DataFrame({
+        't': ['2015-01-01 03:00', '2015-01-01 09:00', '2015-01-01 15:00',
+              '2015-01-01 21:00', '2015-01-02 04:00', '2015-01-02 10:00'],
+        'v': ['2.5', '-0.5', '1.5', '0.3', '2.4', '-0.1'],
+        'ty': ['HH', 'LL', 'H ', 'L ', 'HH', 'L '],
+        'f': '0,0,0'})
+
+    df_long = coops.format_data(raw.copy(), 'high_low', layout='long')
+    assert list(df_long['water_level']) == [2.5, -0.5, 1.5, 0.3, 2.4, -0.1]
+
+    df = coops.format_data(raw.copy(), 'high_low')
+    assert list(df.columns) == [
+        'date_time_HH', 'HH_water_level', 'date_time_H', 'H_water_level',
+        'date_time_L', 'L_water_level', 'date_time_LL', 'LL_water_level']
+    assert list(df.index) == [pd.Timestamp('2015-01-01'),
+                              pd.Timestamp('2015-01-02')]
+    assert list(df['HH_water_level']) == [2.5, 2.4]
+    assert df.loc['2015-01-02', 'date_time_L'] == pd.Timestamp(
+        '2015-01-02 10:00')
+    assert pd.isna(df.loc['2015-01-02', 'date_time_LL'])
+    assert pd.api.types.is_datetime64_any_dtype(df['date_time_LL'])
+
+
+@pytest.mark.parametrize('product, rows', [
+    ('water_level', [
+        {'t': '2015-01-01 00:00', 'v': '1.799', 's': '0.023',
+         'f': '0,0,0,0', 'q': 'v'},
+        {'t': '2015-01-01 00:06', 'v': '', 's': '', 'f': '1,0,0,0', 'q': 'p'},
+        {'t': '2015-01-01 00:12', 'v': '-0.126', 's': '0.010',
+         'f': '0,0,0,0', 'q': 'v'}]),
+    ('predictions', [
+        {'t': '2012-11-15 06:57', 'v': '-1.046', 'type': 'L'},
+        {'t': '2012-11-15 14:11', 'v': '3.813', 'type': 'H'}]),
+    ('wind', [
+        {'t': '2015-01-01 00:00', 's': '3.2', 'd': '255.00', 'dr': 'WSW',
+         'g': '5.1', 'f': '0,0'}]),
+    # Rows with different fields fall back to decoding the JSON
+    ('water_level', [
+        {'t': '2015-01-01 00:00', 'v': '1.799', 'f': '0,0,0,0'},
+        {'t': '2015-01-01 00:06', 'f': '0,0,0,0'}]),
+    ('water_level', []),
+])
+def test_fast_parser_matches_json_parser(product, rows):
+    key = 'predictions' if product == 'predictions' else 'data'
+    for separators in ((',', ':'), (', ', ': ')):
+        content = json.dumps({'metadata': {'id': '9447130'}, key: rows},
+                             separators=separators).encode('utf-8')
+        df_fast = coops.bytes2pandas(content, product, 2)
+        df_json = coops.json2pandas(json.loads(content), product, 2)
+        if rows:
+            df_fast = coops.normalize_columns(df_fast, product)
+            df_json = coops.normalize_columns(df_json, product)
+        pd.testing.assert_frame_equal(df_fast, df_json)
+
+
+def test_fast_parser_detects_api_errors():
+    content = json.dumps({'error': {'message': (
+        'No data was found. This product may not be offered at this station '
+        'at the requested time.')}}).encode('utf-8')
+    assert coops.bytes2pandas(content, 'water_level', 2).empty
+    with pytest.raises(ValueError):
+        coops.bytes2pandas(content, 'water_level', 1)
+
+
+def test_iter_data_yields_blocks_in_order(fake_api):
+    fake_api.gaps.add('20150201 00:01')
+    kwargs = dict(begin_date="20150101", end_date="20150601",
+                  stationid="9447130", product="water_level", datum="MLLW")
+    blocks = coops.iter_data(max_workers=2, **kwargs)
+
+    df_first = next(blocks)
+    assert len(fake_api.urls) <= 3  # Later blocks are not all fetched yet
+    dfs = [df_first] + list(blocks)
+
+    assert len(dfs) == 4  # The empty block is skipped
+    df = pd.concat(dfs)
+    assert df.index.is_monotonic_increasing and df.index.is_unique
+    assert df.dropna().equals(coops.get_data(**kwargs).dropna())
+
+
+def test_iter_data_keeps_high_low_days_split_between_blocks(stand_in):
+    # Later blocks begin at noon on 2016-01-01 and 2016-12-31
+    kwargs = dict(begin_date="20150101 12:00", end_date="20170101",
+                  stationid="9447130", product="high_low", datum="MLLW")
+    df = pd.concat(coops.iter_data(**kwargs))
+    expected = coops.get_data(**kwargs)
+
+    assert df.index.is_unique
+    assert df.equals(expected)
+    assert df.loc['2016-01-01', 'HH_water_level'] == \
+        expected.loc['2016-01-01', 'HH_water_level']
+
+
+def test_compact_mode_keeps_values(stand_in):
+    stand_in.gaps.append((pd.Timestamp('2015-01-02'),
+                          pd.Timestamp('2015-01-02 11:59')))
+    kwargs = dict(begin_date="20150101", end_date="20150105",
+                  stationid="9447130")
+
+    wind = coops.get_data(product="wind", **kwargs)
+    wind_compact = coops.get_data(product="wind", compact=True, **kwargs)
+    assert wind_compact.dtypes.to_dict() == {
+        'spd': 'float32', 'dir': 'int16', 'compass': 'category',
+        'gust_spd': 'float32', 'flags': 'category'}
+    pd.testing.assert_frame_equal(wind_compact, wind, check_dtype=False,
+                                  check_categorical=False, atol=5e-4)
+    assert (wind_compact.memory_usage(deep=True).sum() <
+            wind.memory_usage(deep=True).sum() / 3)
+
+    currents = coops.get_data(product="currents", bin_num=1, interval="h",
+                              compact=True, **kwargs)
+    assert currents['bin'].dtype == 'Int8'  # Hours of the gap are missing
+    assert currents['direction'].dtype == 'Int16'
+    assert currents['bin'].isna().sum() == 12
+
+
+def test_get_profile_matches_get_data(stand_in):
+    from py_noaa.stations import StationCatalogue
+    catalogue = StationCatalogue([
+        {'id': 'PUG1515', 'name': 'Test', 'lat': 47.6, 'lon': -122.4,
+         'state': None, 'products': ['currents'], 'datums': [],
+         'bins': [3, 1, 2]}])
+    stand_in.gaps.append((datetime(2015, 1, 10), datetime(2015, 1, 12)))
+
+    profile = coops.get_profile('20150101', '20150301', 'PUG1515',
+                                max_workers=4, catalogue=catalogue)
+
+    assert list(profile.bins) == [1, 2, 3]
+    assert profile.speed.shape == profile.direction.shape == (
+        len(profile.time), 3)
+    assert stand_in.requests == 3 * 2  # Planned once, 2 blocks per bin
+    df = coops.get_data('20150101', '20150301', 'PUG1515', 'currents',
+                        bin_num=2)
+    frame = profile.to_frame()
+    pd.testing.assert_series_equal(
+        frame[('speed', 2)].dropna(), df['speed'].dropna(),
+        check_names=False, check_freq=False)
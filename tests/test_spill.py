@@ -0,0 +1,61 @@
+from __future__ import absolute_import
+
+import json
+import os
+
+from py_noaa import coops
+
+import pandas as pd
+import pytest
+
+
+def test_spill_dir_resumes_failed_blocks(stand_in, monkeypatch, tmpdir):
+    spill_dir = str(tmpdir.join('spill'))
+    url2pandas = coops.url2pandas
+    failing = ['begin_date=20150304']
+
+    def flaky_url2pandas(data_url, *args, **kwargs):
+        if any(date in data_url for date in failing):
+            raise IOError('connection reset')
+        return url2pandas(data_url, *args, **kwargs)
+
+    monkeypatch.setattr(coops, 'url2pandas', flaky_url2pandas)
+
+    with pytest.raises(RuntimeError, match='1 of 6 blocks failed'):
+        coops.get_data('20150101', '20150630', '9447130', 'water_level',
+                       datum='MLLW', max_workers=3, spill_dir=spill_dir)
+    with open(os.path.join(spill_dir, 'manifest.json')) as f:
+        blocks = json.load(f)['blocks'].values()
+    assert sorted(block['status'] for block in blocks) == ['done'] * 5 + [
+        'failed']
+    assert stand_in.requests == 5
+
+    # Only the failed block is requested again
+    del failing[:]
+    df = coops.get_data('20150101', '20150630', '9447130', 'water_level',
+                        datum='MLLW', max_workers=3, spill_dir=spill_dir)
+    assert stand_in.requests == 6
+    expected = coops.get_data('20150101', '20150630', '9447130',
+                              'water_level', datum='MLLW')
+    pd.testing.assert_frame_equal(df, expected)
+
+    # A completed download is read back from the spill files
+    num_requests = stand_in.requests
+    coops.get_data('20150101', '20150630', '9447130', 'water_level',
+                   datum='MLLW', spill_dir=spill_dir)
+    assert stand_in.requests == num_requests
+
+
+def test_spill_dir_raises_api_errors(fake_api, tmpdir):
+    spill_dir = str(tmpdir.join('spill'))
+    fake_api.gaps.add('20150101 00:00')
+    kwargs = dict(begin_date='20150101', end_date='20150110',
+                  stationid='9447130', product='water_level', datum='MLLW',
+                  spill_dir=spill_dir)
+
+    # A single-block gap raises ValueError as without spill_dir, and is not
+    # recorded as a block to retry
+    for _ in range(2):
+        with pytest.raises(ValueError, match='No data was found'):
+            coops.get_data(**kwargs)
+    assert not os.path.exists(os.path.join(spill_dir, 'manifest.json'))
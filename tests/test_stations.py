@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+import json
+
+import numpy as np
+import pytest
+
+from py_noaa import stations
+
+STATION_LISTS = {
+    'waterlevels': {'stations': [
+        {'id': '9447130', 'name': 'Seattle', 'lat': 47.6026, 'lng': -122.3393,
+         'state': 'WA', 'datums': {'datums': [{'name': 'MLLW'},
+                                             {'name': 'NAVD88'}]}},
+        {'id': '9444900', 'name': 'Port Townsend', 'lat': 48.1129,
+         'lng': -122.7595, 'state': 'WA', 'datums': {'datums': []}},
+        {'id': '8518750', 'name': 'The Battery', 'lat': 40.7006,
+         'lng': -74.0142, 'state': 'NY'}]},
+    'met': {'stations': [
+        {'id': '9447130', 'name': 'Seattle', 'lat': 47.6026, 'lng': -122.3393,
+         'state': 'WA'}]},
+    'currents': {'stations': [
+        {'id': 'PUG1515', 'name': 'Tacoma Narrows', 'lat': 47.27,
+         'lng': -122.55, 'bins': {'bins': [{'num': 1}, {'num': 2}]}}]},
+}
+
+
+@pytest.fixture
+def station_lists(metadata_api):
+    metadata_api.routes.update(
+        ('type=' + station_type, payload)
+        for station_type, payload in STATION_LISTS.items())
+    metadata_api.default = {'stations': []}
+    return metadata_api
+
+
+def test_load_fetches_once_and_caches(station_lists, tmp_path):
+    path = str(tmp_path / 'stations.json')
+    catalogue = stations.StationCatalogue.load(path)
+
+    assert len(station_lists.urls) == len(set(
+        stations.PRODUCT_STATION_TYPES.values()))
+    assert len(catalogue) == 4
+    seattle = catalogue.station('9447130')
+    assert 'wind' in seattle['products'] and 'high_low' in seattle['products']
+    assert seattle['datums'] == ['MLLW', 'NAVD88']
+    assert catalogue.bins('PUG1515') == [1, 2]
+
+    station_lists.urls[:] = []
+    cached = stations.StationCatalogue.load(path)
+    assert station_lists.urls == []
+    assert cached.stations.equals(catalogue.stations)
+    with open(path) as f:
+        assert len(json.load(f)) == 4
+
+
+def test_nearest_matches_haversine(station_lists, tmp_path):
+    catalogue = stations.StationCatalogue.load(str(tmp_path / 's.json'))
+
+    nearest = catalogue.nearest(47.5, -122.4, n=2, product='water_level')
+    assert list(nearest.index) == ['9447130', '9444900']
+
+    lat, lon = np.radians(47.5), np.radians(-122.4)
+    lat2, lon2 = np.radians(47.6026), np.radians(-122.3393)
+    haversine = 2 * stations.EARTH_RADIUS_KM * np.arcsin(np.sqrt(
+        np.sin((lat2 - lat) / 2) ** 2 +
+        np.cos(lat) * np.cos(lat2) * np.sin((lon2 - lon) / 2) ** 2))
+    assert nearest['distance_km'].iloc[0] == pytest.approx(haversine)
+
+    assert [stationid for stationid, _ in catalogue.nearest_ids(
+        47.5, -122.4, n=5, product='currents')] == ['PUG1515']
+    assert len(catalogue.nearest_ids(47.5, -122.4, n=10)) == 4
+    assert catalogue.nearest_ids(47.5, -122.4, product='unknown') == []
@@ -0,0 +1,73 @@
+from __future__ import absolute_import
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from py_noaa import coops, store
+
+
+def test_missing_intervals():
+    covered = store.merge_intervals([
+        (datetime(2015, 3, 1), datetime(2015, 4, 1)),
+        (datetime(2015, 1, 1), datetime(2015, 2, 1)),
+        (datetime(2015, 1, 15), datetime(2015, 2, 10))])
+    assert covered == [(datetime(2015, 1, 1), datetime(2015, 2, 10)),
+                       (datetime(2015, 3, 1), datetime(2015, 4, 1))]
+
+    assert store.missing_intervals(
+        datetime(2014, 12, 1), datetime(2015, 5, 1), covered) == [
+            (datetime(2014, 12, 1), datetime(2015, 1, 1)),
+            (datetime(2015, 2, 10), datetime(2015, 3, 1)),
+            (datetime(2015, 4, 1), datetime(2015, 5, 1))]
+    assert store.missing_intervals(
+        datetime(2015, 1, 5), datetime(2015, 2, 1), covered) == []
+
+
+def test_store_only_fetches_missing_ranges(fake_api, tmp_path):
+    station_store = store.StationStore(str(tmp_path))
+    kwargs = dict(stationid="9447130", product="water_level", datum="MLLW")
+
+    coops.get_data("20150101", "20150601", store=station_store, **kwargs)
+    assert len(fake_api.urls) == 5
+
+    # Extending the range by a week only requests that week
+    df = coops.get_data("20150101", "20150608",
+                        store=store.StationStore(str(tmp_path)), **kwargs)
+    assert len(fake_api.urls) == 6
+    assert 'begin_date=20150601+00%3A00' in fake_api.urls[-1]
+    assert not df.index.duplicated().any()
+    assert df.index[0] == datetime(2015, 1, 1)
+    assert df.index[-1] == datetime(2015, 6, 8)
+
+    fake_api.urls = []
+    df_stored = coops.get_data("20150301", "20150401", store=station_store,
+                               **kwargs)
+    assert fake_api.urls == []
+    assert df_stored.equals(df['2015-03-01':'2015-04-01 00:00'])
+
+
+def test_store_fetches_partitions_concurrently(fake_api, tmp_path):
+    station_store = store.StationStore(str(tmp_path))
+    fake_api.delay = lambda params: 0.2
+
+    def get(stationid):
+        return coops.get_data("20150101", "20150110", stationid,
+                              "water_level", datum="MLLW",
+                              store=station_store)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(get, ["9447130", "9443090"]))
+    assert fake_api.max_in_flight == 2
+
+
+def test_store_treats_gaps_without_data_as_empty(fake_api, tmp_path):
+    station_store = store.StationStore(str(tmp_path))
+    kwargs = dict(stationid="9447130", product="water_level", datum="MLLW",
+                  store=station_store)
+    coops.get_data("20150101", "20150301", **kwargs)
+
+    # The one-block gap of the extended range has no data
+    fake_api.gaps.add('20150301 00:00')
+    df = coops.get_data("20150101", "20150308", **kwargs)
+    assert len(fake_api.urls) == 3
+    assert df.index[-1] == datetime(2015, 3, 1)
@@ -0,0 +1,51 @@
+from __future__ import absolute_import
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from py_noaa.tail import Follower
+
+
+def test_follower_delivers_only_new_rows(stand_in):
+    now = [datetime(2015, 6, 1, 12, 3)]
+    streams = [{'stationid': '9447130', 'product': 'water_level',
+                'datum': 'MLLW'},
+               {'stationid': '9447130', 'product': 'hourly_height',
+                'datum': 'MLLW'}]
+
+    with Follower(streams, clock=lambda: now[0]) as follower:
+        first = dict(follower.poll())
+        assert len(first[('9447130', 'water_level')]) == 10
+        assert first[('9447130', 'water_level')].index[-1] == datetime(
+            2015, 6, 1, 12)
+
+        # Streams are polled again when their next row should be published
+        assert follower.next_due() == datetime(2015, 6, 1, 12, 9)
+        assert follower.poll() == []
+        now[0] = datetime(2015, 6, 1, 12, 10)
+        second = follower.poll()
+        assert [key for key, df in second] == [('9447130', 'water_level')]
+        df = second[0][1]
+        assert list(df.index) == [datetime(2015, 6, 1, 12, 6)]
+        assert follower.last_seen[('9447130', 'hourly_height')] == datetime(
+            2015, 6, 1, 12)
+
+        # Polls without new data back off up to the cadence
+        now[0] += timedelta(minutes=1)
+        assert follower.poll(force=True) == []
+        state = follower.states[('9447130', 'water_level')]
+        assert state.due == now[0] + timedelta(seconds=45)
+        assert follower.errors == {}
+
+
+def test_follower_rejects_streams_with_the_same_key():
+    streams = [{'stationid': '9447130', 'product': 'water_level',
+                'datum': datum} for datum in ('MLLW', 'NAVD')]
+    with pytest.raises(ValueError, match='Duplicate stream'):
+        Follower(streams, client=object())
+
+    # Currents streams of different bins are distinct
+    streams = [{'stationid': 'PUG1515', 'product': 'currents',
+                'bin_num': bin_num} for bin_num in (1, 2)]
+    assert len(Follower(streams, client=object()).states) == 2
@@ -0,0 +1,38 @@
+from __future__ import absolute_import
+from datetime import datetime
+
+from py_noaa import coops
+
+import pytest
+
+
+@pytest.mark.parametrize('product, kwargs, columns', [
+    ('water_level', {'datum': 'MLLW'}, ['water_level', 'sigma', 'flags', 'QC']),
+    ('hourly_height', {'datum': 'MLLW'}, ['water_level', 'sigma', 'flags']),
+    ('predictions', {'datum': 'MLLW', 'interval': 'hilo'},
+     ['predicted_wl', 'hi_lo']),
+    ('currents', {'bin_num': 1}, ['speed', 'direction', 'bin']),
+    ('wind', {}, ['spd', 'dir', 'compass', 'gust_spd', 'flags']),
+    ('salinity', {}, ['salinity', 'specific_gravity']),
+])
+def test_stand_in_serves_products(stand_in, product, kwargs, columns):
+    df = coops.get_data('20150101', '20150103', '9447130', product, **kwargs)
+
+    assert list(df.columns) == columns
+    assert len(df) > 0
+    assert df.index.is_monotonic_increasing
+
+
+def test_stand_in_gaps(stand_in):
+    stand_in.gaps.append((datetime(2015, 2, 1), datetime(2015, 2, 28, 23, 59)))
+
+    with pytest.raises(ValueError, match='No data was found'):
+        coops.get_data('20150201', '20150210', '9447130', 'water_level',
+                       datum='MLLW')
+
+    # A gap inside a multi-block request is skipped, not raised
+    df = coops.get_data('20150101', '20150501', '9447130', 'water_level',
+                        datum='MLLW')
+    assert df.loc['2015-02-02':'2015-02-27', 'water_level'].isna().all()
+    assert df.loc['2015-03-02':, 'water_level'].notna().all()
+    assert stand_in.requests == 1 + 4